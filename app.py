@@ -2,19 +2,29 @@
 # CyberCampus CTF - Application principale avec système de hints
 # ------------------------------
 
-from flask import Flask, render_template, url_for, redirect, request, flash, session, jsonify, Response
+from flask import Flask, render_template, url_for, redirect, request, flash, session, jsonify, Response, make_response, abort, g, stream_with_context
 from flask_login import login_required, current_user
 from datetime import datetime, timezone
 import feedparser
 import time
 import re
 
-from core import init_app, db
-from core.models import User, Challenge, Submission, Scoreboard
+from core import init_app, db, versions, live, querystats
+from core.models import User, Challenge, Submission, Scoreboard, HintReveal
 from core.auth import auth_bp
 from core.admin import admin_bp
 from core.oauth import google_bp
 from core.security import SecurityEvent, detect_flag_spam
+from core.ranking import get_rank_index
+from core.leaderboard import scoreboard_around, board_page, top_json
+from core.groups import GROUP_KINDS, group_leaderboard, user_groups
+from core.catalog import get_catalog, get_challenge, cards_fragment
+from core.content import get_challenge_content
+from core.progress import get_progress, mark_submitted
+from core.identity import banned_ips
+from core.history import history_page, history_stats, export_csv, export_ndjson, FILTRES as HISTORY_FILTRES
+from core.flags import per_user_enabled, derive_flag
+from core.timeline import get_timeline_payload
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 import os
@@ -44,19 +54,21 @@ app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 # Initialisation des extensions (SQLAlchemy, LoginManager, etc.)
 init_app(app)
 
+# Compteur de requêtes SQL par requête HTTP (détection des N+1)
+querystats.init_app(app)
+
 @app.template_filter('security_extra')
 def security_extra_filter(event):
     return SecurityEvent.get_extra(event)
 
 @app.before_request
 def check_banned_ip():
-    from core.security import BannedIP
     from flask import abort, request
     ip = request.remote_addr
     # Ne pas bloquer les routes admin (pour que l'admin puisse débannir)
     if request.path.startswith('/admin'):
         return
-    if BannedIP.is_banned(ip):
+    if ip in banned_ips():
         abort(403)
 
 print("DB URI =", app.config["SQLALCHEMY_DATABASE_URI"])
@@ -82,187 +94,63 @@ def page_not_found(e):
     """, 404
 
 # ------------------------------
-# SYSTÈME DE HINTS EN MÉMOIRE
+# SYSTÈME DE HINTS (bundle de contenu)
 # ------------------------------
-HINTS_DATABASE = {
-    1: {  # Challenge SQLi
-        "hints": [
-            {
-                "text": "💡 Les identifiants sont vérifiés avec une requête SQL. Que se passe-t-il si vous entrez des caractères spéciaux dans le champ username ?",
-                "penalty_percent": 10
-            },
-            {
-                "text": "🎯 Essayez d'utiliser le caractère guillemet simple (') dans le champ username pour 'casser' la requête SQL. Vous pouvez ajouter des conditions logiques comme OR.",
-                "penalty_percent": 20
-            },
-            {
-                "text": "🔑 Utilisez un payload en SQL dans le champ username.",
-                "penalty_percent": 50
-            }
-        ]
-    },
-    2: {  # Challenge XSS
-        "hints": [
-            {
-                "text": "💡 Les commentaires ne sont pas filtrés. Que se passe-t-il si vous injectez du code HTML dans le champ commentaire ?",
-                "penalty_percent": 10
-            },
-            {
-                "text": "🎯 Le filtre |safe désactive l'échappement HTML. Essayez d'insérer une balise <script> dans votre commentaire pour exécuter du JavaScript.",
-                "penalty_percent": 20
-            },
-            {
-                "text": "🔑 Tapez exactement ceci dans le champ commentaire : <script>alert('XSS')</script>\n\nVous pouvez aussi essayer avec des attributs comme : <img src=x onerror=alert('XSS')>",
-                "penalty_percent": 50
-            }
-        ]
-    },
-    3: {  # Challenge Bruteforce
-        "hints": [
-            {
-                "text": "💡 Le code est composé de 4 chiffres (0000 à 9999). Tester manuellement prendrait trop de temps... Pensez à automatiser avec un script !",
-                "penalty_percent": 10
-            },
-            {
-                "text": "🎯 Utilisez la bibliothèque requests de Python pour envoyer des requêtes POST automatiquement. Parcourez tous les codes de 0000 à 9999 avec une boucle for.",
-                "penalty_percent": 20
-            },
-            {
-                "text": "🔑 Voici un squelette de script Python :\n\nimport requests\nfor code in range(10000):\n    code_str = str(code).zfill(4)\n    response = requests.post('http://localhost:5004', data={'code': code_str})\n    if 'FLAG' in response.text or 'déverrouillé' in response.text:\n        print(f'Code trouvé: {code_str}')\n        break",
-                "penalty_percent": 50
-            }
-        ]
-    },
-    4: {  # Challenge Crypto
-        "hints": [
-            {
-                "text": "💡 Les mots de passe sont hashés avec MD5 sans sel. Les rainbow tables peuvent être utilisées pour craquer ces hash rapidement.",
-                "penalty_percent": 10
-            },
-            {
-                "text": "🎯 Utilisez des outils comme 'hashcat' ou des services en ligne pour rechercher les hash MD5. Vous pouvez aussi écrire un script Python pour automatiser la recherche.",
-                "penalty_percent": 20
-            },
-            {
-                "text": "🔑 Par exemple, le hash '5f4dcc3b5aa765d61d8327deb882cf99' correspond au mot de passe 'password'. Essayez de craquer les autres hash de la même manière.",
-                "penalty_percent": 50
-            }
-        ]
-    },
-    5: {  # Challenge OSINT
-        "hints": [
-            {
-                "text": "💡 Certaines informations ne sont pas visibles à l'écran mais restent accessibles publiquement.",
-                "penalty_percent": 10
-            },
-            {
-                "text": "🎯 Tous les onglets ne sont pas forcément visibles dans le menu principal.",
-                "penalty_percent": 20
-            },
-            {
-                "text": "🔑 Examinez attentivement le code source de l'une des villes. Certains chemins ou liens peuvent y apparaître sans être affichés à l'écran",
-                "penalty_percent": 50
-            }
-        ]
-    },
-    6: {  # Challenge Upload
-        "hints": [
-            {
-                "text": "💡 Ce que tu vois côté interface n'est pas toujours représentatif de ce qui se passe côté serveur.",
-                "penalty_percent": 10
-            },
-            {
-                "text": "🎯 Intéresse-toi à la manière dont les fichiers sont acceptés et enregistrés.",
-                "penalty_percent": 20
-            },
-            {
-                "text": "🔑 Les fichiers uploadés sont accessibles via /uploads/. Réfléchis à ce qui pourrait se passer si un fichier particulier était exécuté au lieu d'être simplement affiché.",
-                "penalty_percent": 50
-            }
-        ]
-    },
-    7: {  # Challenge Stégano
-        "hints": [
-            {
-                "text": "💡 Les données sont cachées dans des pixels précis. La formule : le i-ème caractère se trouve au pixel (i×37 mod W, i×53 mod H). L'index 0 indique la longueur.",
-                "penalty_percent": 10
-            },
-            {
-                "text": "🎯 Chaque pixel cache un caractère dans son canal Rouge (R). char = chr(pixel[x, y][0]). Extrayez le message, mais ne croyez pas encore vos yeux…",
-                "penalty_percent": 20
-            },
-            {
-                "text": "🔑 Le message extrait est chiffré ROT13. python3 -c \"import codecs; print(codecs.decode('MESSAGE', 'rot13'))\"",
-                "penalty_percent": 50
-            }
-        ]
-    },
-    8: {  # Challenge Reverse
-        "hints": [
-            {
-                "text": "💡 Le binaire est compilé avec PyInstaller. L'outil pyinstxtractor.py permet d'en extraire le bytecode Python.",
-                "penalty_percent": 10
-            },
-            {
-                "text": "🎯 Une fois le .pyc extrait, utilise pycdc ou uncompyle6 pour décompiler le bytecode en Python lisible. Cherche les fonctions de vérification.",
-                "penalty_percent": 20
-            },
-            {
-                "text": "🔑 Chaque vérification peut s'inverser mathématiquement. Écris un script Python qui recalcule chaque bloc dans l'ordre et concatène les résultats au format XXXX-XXXX-XXXX-XXXX.",
-                "penalty_percent": 50
-            }
-        ]
-    }
-    
-}
 def get_hints_for_challenge(challenge_id):
-    """Récupère les hints d'un challenge"""
-    return HINTS_DATABASE.get(challenge_id, {"hints": []})
+    """Récupère les hints d'un challenge depuis le bundle de contenu"""
+    content = get_challenge_content(challenge_id)
+    return content.hints if content is not None else ()
+
+def _hint_memo():
+    """Mémo par requête : {challenge_id: indices révélés} (une requête par challenge)."""
+    if 'revealed_hints' not in g:
+        g.revealed_hints = {}
+    return g.revealed_hints
 
 def get_revealed_hints(challenge_id):
     """Récupère les indices déjà révélés par l'utilisateur pour ce challenge"""
-    if 'revealed_hints' not in session:
-        session['revealed_hints'] = {}
-    
-    user_hints = session['revealed_hints']
-    key = f"{current_user.id}_{challenge_id}"
-    return user_hints.get(key, [])
+    memo = _hint_memo()
+    if challenge_id not in memo:
+        memo[challenge_id] = HintReveal.indices(current_user.id, challenge_id)
+    return memo[challenge_id]
 
 def reveal_hint(challenge_id, hint_index):
     """Marque un indice comme révélé pour l'utilisateur"""
-    if 'revealed_hints' not in session:
-        session['revealed_hints'] = {}
-    
-    key = f"{current_user.id}_{challenge_id}"
-    if key not in session['revealed_hints']:
-        session['revealed_hints'][key] = []
-    
-    if hint_index not in session['revealed_hints'][key]:
-        session['revealed_hints'][key].append(hint_index)
-    
-    session.modified = True
+    penalty = get_hints_for_challenge(challenge_id)[hint_index].penalty_percent
+    revealed = HintReveal.reveler(current_user.id, challenge_id, hint_index, penalty)
+    db.session.commit()
+    _hint_memo().pop(challenge_id, None)
+    return revealed
 
 def calculate_hint_penalty(challenge_id):
-    """Calcule la pénalité totale basée sur les indices révélés"""
-    revealed = get_revealed_hints(challenge_id)
-    hints_data = get_hints_for_challenge(challenge_id)
-    
-    total_penalty = 0
-    for idx in revealed:
-        if idx < len(hints_data["hints"]):
-            total_penalty += hints_data["hints"][idx]["penalty_percent"]
-    
-    return total_penalty
+    """Calcule la pénalité totale basée sur les indices révélés (un seul SUM)"""
+    return HintReveal.penalite(current_user.id, challenge_id)
+
+@app.before_request
+def import_session_hints():
+    """Reprend les indices des anciens cookies de session dans la table hint_reveal."""
+    legacy = session.get('revealed_hints')
+    if legacy is None or not current_user.is_authenticated:
+        return
+    prefix = f"{current_user.id}_"
+    for key, indices in legacy.items():
+        if not key.startswith(prefix) or not key[len(prefix):].isdigit():
+            continue
+        challenge_id = int(key[len(prefix):])
+        hints = get_hints_for_challenge(challenge_id)
+        if get_challenge(challenge_id) is None:
+            continue
+        for idx in indices:
+            if isinstance(idx, int) and 0 <= idx < len(hints):
+                HintReveal.reveler(current_user.id, challenge_id, idx, hints[idx].penalty_percent)
+    db.session.commit()
+    session.pop('revealed_hints')
 
 # ------------------------------
-# Création automatique de la base de données
+# Schéma de la base de données
 # ------------------------------
-with app.app_context():
-    try:
-        db.create_all()
-        print("✅ Base de données initialisée avec succès.")
-    except Exception as e:
-        print("⚠️ Erreur lors de la création des tables :", e)
+# Tables, index et backfills sont appliqués par `python migrate.py`
+# (core.migrations) avant le démarrage de gunicorn.
 
 # ------------------------------
 # INJECTION GLOBALE
@@ -274,7 +162,8 @@ def inject_globals():
         'now': datetime.now,
         'Challenge': Challenge,
         'Submission': Submission,
-        'User': User
+        'User': User,
+        'get_challenge_content': get_challenge_content
     }
 
 
@@ -389,38 +278,157 @@ def cgu():
 @login_required
 def dashboard():
     """Page du tableau de bord (protégée)"""
-    return render_template("dashboard.html", user=current_user)
+    return render_template("dashboard.html", user=current_user, progress=get_progress(current_user.id))
 
 @app.route('/history')
 @login_required
 def history():
-    all_submissions = current_user.submissions\
-        .order_by(Submission.timestamp.desc()).all()
-    return render_template('history.html', submissions=all_submissions)
+    """Historique paginé par clé, compteurs agrégés en SQL"""
+    filtre = request.args.get('filtre')
+    rows, next_cursor = history_page(current_user.id, after=request.args.get('after'), filtre=filtre)
+    return render_template(
+        'history.html',
+        submissions=rows,
+        stats=history_stats(current_user.id),
+        filtre=filtre if filtre in HISTORY_FILTRES else None,
+        first_page=not request.args.get('after'),
+        next_cursor=next_cursor,
+    )
+
+@app.route('/history/export.<fmt>')
+@login_required
+def history_export(fmt):
+    """Export complet de l'historique (CSV ou NDJSON), envoyé en flux"""
+    if fmt == 'csv':
+        body, mimetype = export_csv(current_user.id), 'text/csv'
+    elif fmt == 'ndjson':
+        body, mimetype = export_ndjson(current_user.id), 'application/x-ndjson'
+    else:
+        abort(404)
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename=historique_{datetime.now().strftime("%Y%m%d")}.{fmt}'
+    )
+    return response
 
 @app.route('/scoreboard')
 def scoreboard():
-    """Page du classement général (Top 100)"""
-    # Récupérer le classement général (Top 100)
-    classement = Scoreboard.afficherClassement(limit=100)
-    
-    # Si l'utilisateur est connecté, trouver sa position
+    """Page du classement général (Top 100, pages suivantes par curseur)"""
+    after = request.args.get('after')
+    around_me = request.args.get('around') == 'me' and current_user.is_authenticated
+    first_page = not after and not around_me
+    version = versions.current(versions.SCOREBOARD)
+
+    # La page ne change qu'avec la version du scoreboard (et le visiteur)
+    viewer = current_user.id if current_user.is_authenticated else 0
+    etag = f"sb-{version}-{viewer}-{after or ''}-{int(around_me)}"
+    if '_flashes' not in session and request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    def render_board(rows, next_cursor):
+        return render_template(
+            "scoreboard_board.html",
+            classement=rows,
+            first_page=first_page,
+            next_cursor=next_cursor,
+            total_challenges=len(get_catalog().actifs),
+        )
+
+    # Podium + tableau : fragment en cache par version, sauf la fenêtre "ma position"
+    if around_me:
+        board = render_board(*scoreboard_around(current_user.id))
+    else:
+        board = board_page(after=after, render=render_board)["html"]
+
+    # Seul l'encart "ma position" dépend du visiteur (index en mémoire)
     user_rank = None
     user_score = None
+    user_percentile = None
     if current_user.is_authenticated:
-        user_score = current_user.score
-        # Compter combien d'utilisateurs ont plus de points
-        user_rank = Scoreboard.query.filter(
-            Scoreboard.points_total > user_score
-        ).count() + 1
-    
-    return render_template(
+        index = get_rank_index()
+        key = index.key(current_user.id)
+        user_score = key[0] if key else current_user.score
+        standing = index.standing(current_user.id, user_score)
+        user_rank = standing["rank"]
+        user_percentile = standing["percentile"]
+
+    response = make_response(render_template(
         "scoreboard.html",
-        classement=classement,
+        board=board,
+        version=version,
+        first_page=first_page,
         user_rank=user_rank,
-        user_score=user_score
+        user_score=user_score,
+        user_percentile=user_percentile
+    ))
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['Vary'] = 'Cookie'
+    return response
+
+@app.route('/scoreboard/top.json')
+def scoreboard_json():
+    """Top 100 en JSON (cache par version, ETag / 304)"""
+    payload = top_json()
+    etag = f"sb-{payload['version']}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(payload['json'], mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+@app.route('/scoreboard/groups')
+def scoreboard_groups():
+    """Classement par pays, école ou équipe (agrégats pré-calculés)"""
+    kind = request.args.get('kind', 'country')
+    if kind not in GROUP_KINDS:
+        kind = 'country'
+    my_group = None
+    if current_user.is_authenticated:
+        my_group = user_groups(current_user.id).get(kind)
+    return render_template(
+        'scoreboard_groups.html',
+        kind=kind,
+        kinds=GROUP_KINDS,
+        rows=group_leaderboard(kind),
+        my_group=my_group,
     )
 
+@app.route('/scoreboard/stream')
+def scoreboard_stream():
+    """Flux SSE du classement : solves, rangs et first bloods"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_id')
+    stream = live.open_stream(last_event_id)
+    if stream is None:
+        response = Response("Trop de connexions en direct, réessayez plus tard.\n", status=503)
+        response.headers['Retry-After'] = '30'
+        return response
+    response = Response(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # pas de mise en tampon par Nginx
+    return response
+
+@app.route('/scoreboard/timeline.json')
+def scoreboard_timeline():
+    """Évolution des scores du top 10 (JSON mis en cache, gzip si accepté)"""
+    payload = get_timeline_payload()
+    etag = f"tl-{payload['version']}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = Response(payload['gzip'], mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(payload['json'], mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'public, max-age=10'
+    return response
+
 @app.route('/actualites')
 def actualites():
     """Page des actualités cyber via flux RSS."""
@@ -506,33 +514,55 @@ def learn_reverse():
 
 @app.route('/auth/check')
 def auth_check():
-    if current_user.is_authenticated:
-        return '', 200
-    return '', 401
+    if not current_user.is_authenticated:
+        return '', 401
+    # Instantané en cache : aucune requête en base
+    if current_user.role == "banned":
+        return '', 403
+    response = make_response('', 200)
+    # Flag personnalisé transmis par Nginx au service du challenge
+    challenge_id = request.headers.get('X-Challenge-Id', '')
+    if challenge_id.isdigit() and per_user_enabled(int(challenge_id)):
+        response.headers['X-CTF-Flag'] = derive_flag(int(challenge_id), current_user.id)
+    return response
 
 @app.route('/challenges')
 def challenges_list():
     """Page listant tous les challenges disponibles"""
-    challenges = Challenge.query.filter_by(actif=True).all()
-    return render_template("challenges_list.html", challenges=challenges)
+    def render_cards(cards, solved_count):
+        return {
+            "html": render_template("challenges_cards.html", cards=cards),
+            "challenges": cards,
+            "solved_count": solved_count,
+        }
+
+    viewer = current_user.id if current_user.is_authenticated else None
+    page = cards_fragment(viewer, render_cards)
+    return render_template(
+        "challenges_list.html",
+        challenges=page["challenges"],
+        cards_html=page["html"],
+        solved_count=page["solved_count"],
+    )
 
 @app.route('/challenge/<int:challenge_id>')
 @login_required
 def challenge_view(challenge_id):
-    challenge = Challenge.query.get_or_404(challenge_id)
+    challenge = get_challenge(challenge_id) or abort(404)
     if not challenge.actif:
         flash("Ce challenge n'est pas encore disponible.", "warning")
         return redirect(url_for('dashboard'))
     
-    # Récupérer les hints et ceux déjà révélés
-    hints_data = get_hints_for_challenge(challenge_id)
+    # Récupérer le contenu (hints, service, page Apprendre) et les hints révélés
+    content = get_challenge_content(challenge_id)
     revealed_indices = get_revealed_hints(challenge_id)
     current_penalty = calculate_hint_penalty(challenge_id)
     
     return render_template(
         "challenge.html", 
         challenge=challenge,
-        hints=hints_data["hints"],
+        content=content,
+        hints=content.hints if content is not None else (),
         revealed_hints=revealed_indices,
         current_penalty=current_penalty
     )
@@ -541,100 +571,77 @@ def challenge_view(challenge_id):
 @login_required
 def reveal_hint_route(challenge_id, hint_index):
     """Révèle un indice pour l'utilisateur"""
-    challenge = Challenge.query.get_or_404(challenge_id)
-    hints_data = get_hints_for_challenge(challenge_id)
+    get_challenge(challenge_id) or abort(404)
+    hints = get_hints_for_challenge(challenge_id)
     
     # Vérifier que l'indice existe
-    if hint_index >= len(hints_data["hints"]):
+    if hint_index >= len(hints):
         return jsonify({"error": "Indice invalide"}), 400
     
-    # Vérifier que l'indice n'a pas déjà été révélé
-    revealed = get_revealed_hints(challenge_id)
-    if hint_index in revealed:
+    # Révéler l'indice (la contrainte unique écarte un double clic)
+    if not reveal_hint(challenge_id, hint_index):
         return jsonify({"error": "Indice déjà révélé"}), 400
     
-    # Révéler l'indice
-    reveal_hint(challenge_id, hint_index)
-    
-    hint = hints_data["hints"][hint_index]
+    hint = hints[hint_index]
     new_penalty = calculate_hint_penalty(challenge_id)
     
     return jsonify({
         "success": True,
-        "hint_text": hint["text"],
-        "penalty": hint["penalty_percent"],
+        "hint_text": hint.text,
+        "penalty": hint.penalty_percent,
         "total_penalty": new_penalty
     })
 
-@app.route('/challenge/<int:challenge_id>/submit', methods=['POST'])
-@login_required
-def submit_flag(challenge_id):
-    challenge = Challenge.query.get_or_404(challenge_id)
-    flag_soumis = request.form.get('flag', '').strip()
+def handle_flag_submission(challenge, flag_soumis: str) -> dict:
+    """
+    Enregistre une soumission (scoring, hints, logs sécurité) et retourne le
+    résultat, partagé par le formulaire et l'API JSON.
+    """
+    challenge_id = challenge.id
+    user_id = current_user.id
+    challenge_titre = challenge.titre
+    base_points = challenge.points or 0
+    final_points = 0
     
     # Calculer la pénalité AVANT soumission
     penalty_percent = calculate_hint_penalty(challenge_id)
     
     submission = Submission(
-        user_id=current_user.id,
+        user_id=user_id,
         challenge_id=challenge_id,
-        flag_soumis=flag_soumis
+        flag_soumis=flag_soumis,
+        ip_address=request.remote_addr
     )
     
-    if submission.enregistrer():
-        # Calculer les points avec pénalité
-        base_points = challenge.points
-        penalty_points = int(base_points * penalty_percent / 100)
-        final_points = base_points - penalty_points
-        
-        # Récupérer ou créer le scoreboard
-        sb = Scoreboard.query.filter_by(user_id=current_user.id).first()
-        if not sb:
-            sb = Scoreboard(user_id=current_user.id, points_total=0)
-            db.session.add(sb)
-            db.session.flush()
+    # Une seule transaction : soumission + solve unique + incrément du score
+    solved = submission.enregistrer(penalty_percent)
+    mark_submitted()
+    if solved:
+        final_points = submission.points_obtenus
+        penalty_points = base_points - final_points
         
-        # Vérifier si c'est la première validation de ce challenge
-        previous_correct = Submission.query.filter_by(
-            user_id=current_user.id,
-            challenge_id=challenge_id,
-            correct=True
-        ).count()
-        
-        # Si c'est la première fois, ajuster avec la pénalité
-        if previous_correct == 1:  # === 1 car on vient juste d'enregistrer
-            # Retirer les points de base déjà ajoutés par Submission.enregistrer()
-            sb.points_total = sb.points_total - base_points + final_points
-            submission.points_obtenus = final_points
-            db.session.commit()
-        
-        # Message personnalisé selon la pénalité
-        if penalty_percent > 0:
-            flash(
+        if not submission.premier_solve:
+            message, category = "✅ Flag correct ! Challenge déjà résolu, aucun point supplémentaire.", "info"
+        elif penalty_percent > 0:
+            message, category = (
                 f"✅ Bravo ! Flag correct ! +{final_points} points "
                 f"({base_points} - {penalty_points} de pénalité)",
                 "success"
             )
         else:
-            flash(f"✅ Bravo ! Flag correct ! +{final_points} points", "success")
-        
-        # Réinitialiser les hints pour ce challenge
-        key = f"{current_user.id}_{challenge_id}"
-        if 'revealed_hints' in session and key in session['revealed_hints']:
-            del session['revealed_hints'][key]
-            session.modified = True
+            message, category = f"✅ Bravo ! Flag correct ! +{final_points} points", "success"
     else:
-        flash("❌ Flag incorrect. Réessayez !", "danger")
+        message, category = "❌ Flag incorrect. Réessayez !", "danger"
 
     # Logging sécurité
     if submission.correct:
         SecurityEvent.log(
             SecurityEvent.FLAG_OK,
             ip=request.remote_addr,
-            user_id=current_user.id,
+            user_id=user_id,
             extra={
                 "challenge_id": challenge_id,
-                "challenge": challenge.titre,
+                "challenge": challenge_titre,
                 "points": final_points,
             }
         )
@@ -642,23 +649,72 @@ def submit_flag(challenge_id):
         SecurityEvent.log(
             SecurityEvent.FLAG_FAIL,
             ip=request.remote_addr,
-            user_id=current_user.id,
+            user_id=user_id,
             extra={
                 "challenge_id": challenge_id,
-                "challenge": challenge.titre,
+                "challenge": challenge_titre,
                 "flag_tried": flag_soumis[:40],
             }
         )
+        if submission.flag_partage:
+            # Flag dérivé valide, mais celui d'un autre joueur
+            SecurityEvent.log(
+                SecurityEvent.FLAG_SHARED,
+                ip=request.remote_addr,
+                user_id=user_id,
+                extra={
+                    "challenge_id": challenge_id,
+                    "challenge": challenge_titre,
+                    "flag_owner_id": submission.flag_owner_id,
+                }
+            )
         if detect_flag_spam(request.remote_addr):
             SecurityEvent.log(
                 SecurityEvent.BRUTE_SUSPECT,
                 ip=request.remote_addr,
-                user_id=current_user.id,
+                user_id=user_id,
                 extra={"reason": "Flag spam detected"}
             )
-    
+
+    result = {
+        "correct": bool(submission.correct),
+        "first_solve": submission.premier_solve,
+        "points": final_points,
+        "base_points": base_points,
+        "penalty_percent": penalty_percent if submission.premier_solve else 0,
+        "message": message,
+        "category": category,
+    }
+    if submission.correct:
+        # Score et rang lus dans l'index en mémoire, sans re-rendre la page
+        score = submission.score_total if submission.premier_solve else current_user.score
+        result["score"] = score
+        result["rank"] = get_rank_index().standing(user_id, score)["rank"]
+    return result
+
+@app.route('/challenge/<int:challenge_id>/submit', methods=['POST'])
+@login_required
+def submit_flag(challenge_id):
+    challenge = get_challenge(challenge_id) or abort(404)
+    result = handle_flag_submission(challenge, request.form.get('flag', '').strip())
+    flash(result["message"], result["category"])
     return redirect(url_for('challenge_view', challenge_id=challenge_id))
 
+@app.route('/api/challenge/<int:challenge_id>/submit', methods=['POST'])
+def api_submit_flag(challenge_id):
+    """Soumission de flag en JSON (appelée en fetch par la page du challenge)"""
+    # Pas de @login_required : un appel fetch attend du JSON, pas la redirection vers /login
+    if not current_user.is_authenticated:
+        return jsonify({"error": "Connexion requise"}), 401
+    challenge = get_challenge(challenge_id)
+    if challenge is None:
+        return jsonify({"error": "Challenge introuvable"}), 404
+    data = request.get_json(silent=True) or request.form
+    flag_soumis = str(data.get('flag') or '').strip()
+    if not flag_soumis:
+        return jsonify({"error": "Flag manquant"}), 400
+    return jsonify(handle_flag_submission(challenge, flag_soumis))
+
 @app.route('/sitemap.xml')
 def sitemap():
     """Génère le sitemap XML pour les moteurs de recherche"""
@@ -747,4 +803,8 @@ Sitemap: https://cybercampus-ctf.fr/sitemap.xml
 # Point d'entrée du programme (mode local)
 # ------------------------------
 if __name__ == "__main__":
+    # Serveur de développement : un seul processus, on migre au lancement
+    from core import migrations
+    with app.app_context():
+        migrations.migrate()
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Script de rétention des événements de sécurité de CyberCampus CTF
+
+Fonctionnalités :
+- Afficher le nombre d'événements plus vieux que la rétention (par défaut)
+- Les déplacer dans des archives gzip et les supprimer de la base (--apply)
+- Réimporter des fichiers d'archive (--import)
+- Recalculer les agrégats des heures encore en base (--rebuild-rollups)
+
+À lancer chaque nuit (cron), par exemple :
+    python archive_security_events.py --apply
+"""
+
+import sys
+import argparse
+
+from app import app
+from core import retention
+from core.security import rebuild_rollups
+
+
+# =========================
+# Main
+# =========================
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Rétention des événements de sécurité")
+
+    parser.add_argument('--apply', action='store_true', help='Archiver et supprimer')
+    parser.add_argument('--days', type=int, default=None,
+                        help='Rétention en jours (défaut : SECURITY_EVENT_RETENTION_DAYS)')
+    parser.add_argument('--dir', default=None, help="Dossier des archives")
+    parser.add_argument('--batch-size', type=int, default=retention.ARCHIVE_BATCH_SIZE,
+                        help='Nombre de lignes par lot')
+    parser.add_argument('--import', dest='import_files', nargs='+', metavar='FICHIER',
+                        help="Réimporter des fichiers d'archive")
+    parser.add_argument('--with-rollups', action='store_true',
+                        help="À l'import, incrémenter aussi les agrégats")
+    parser.add_argument('--rebuild-rollups', action='store_true',
+                        help='Recalculer les agrégats des heures encore en base (archives conservées)')
+
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.import_files:
+            for path in args.import_files:
+                n = retention.import_archive(path, batch_size=args.batch_size,
+                                             rollups=args.with_rollups)
+                print(f"✅ {path} : {n} événement(s) réimporté(s)")
+            return
+
+        if args.rebuild_rollups:
+            n = rebuild_rollups(batch_size=args.batch_size)
+            print(f"✅ Agrégats recalculés depuis {n} événement(s)")
+            return
+
+        cutoff = retention.cutoff_date(args.days)
+        pending = retention.pending_count(cutoff)
+        print("\n" + "=" * 60)
+        print("   RÉTENTION DES ÉVÉNEMENTS DE SÉCURITÉ")
+        print("=" * 60)
+        print(f"Avant le      : {cutoff:%d/%m/%Y %H:%M} (UTC)")
+        print(f"À archiver    : {pending}")
+        print(f"Dossier       : {args.dir or retention.archive_dir()}")
+        print("=" * 60)
+
+        if not pending:
+            print("\n✅ Rien à archiver")
+            return
+
+        if not args.apply:
+            print("\nℹ️  Simulation uniquement. Relancez avec --apply pour archiver.")
+            return
+
+        report = retention.archive_events(args.days, directory=args.dir,
+                                          batch_size=args.batch_size)
+        print(f"\n✅ {report.archived} événement(s) archivé(s) dans {len(report.files)} fichier(s)")
+        print(f"   {report.pruned_rollups} agrégat(s) par IP purgé(s)")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n❌ Opération annulée.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Erreur inattendue : {e}")
+        sys.exit(1)
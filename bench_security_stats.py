@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Benchmark du dashboard sécurité de CyberCampus CTF
+
+Fonctionnalités :
+- Remplir une base de test avec N événements de sécurité (1 million par défaut)
+- Mesurer l'ancien calcul (un COUNT par compteur et par heure) et la
+  lecture des agrégats horaires de core.security, nombre de requêtes compris
+- Mesurer une lecture servie par le cache
+
+La base est choisie par --database (SQLite locale par défaut), jamais
+celle de DATABASE_URL, pour ne pas remplir la base de production.
+"""
+
+import sys
+import os
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+
+# =========================
+# Remplissage
+# =========================
+
+def seed(total, ips, days, batch_size=10000):
+    """Ajoute des événements jusqu'à en avoir `total` dans la table"""
+    from core import db
+    from core.security import SecurityEvent, rebuild_rollups
+
+    existing = SecurityEvent.query.count()
+    if existing >= total:
+        print(f"📦 {existing} événements déjà présents")
+        return
+
+    types = [SecurityEvent.LOGIN_OK, SecurityEvent.LOGIN_FAIL, SecurityEvent.REGISTER,
+             SecurityEvent.FLAG_OK, SecurityEvent.FLAG_FAIL, SecurityEvent.BRUTE_SUSPECT,
+             SecurityEvent.BANNED_ATTEMPT]
+    weights = [10, 25, 2, 8, 50, 3, 2]
+    addresses = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(ips)]
+    now = datetime.utcnow()
+    span = days * 86400
+    rng = random.Random(42)
+
+    print(f"📦 Ajout de {total - existing} événements...")
+    started = time.perf_counter()
+    for done in range(existing, total, batch_size):
+        rows = [
+            {
+                "event_type": rng.choices(types, weights)[0],
+                "ip_address": rng.choice(addresses),
+                "user_id": None,
+                "user_agent": "bench",
+                "path": "/bench",
+                "extra": None,
+                "timestamp": now - timedelta(seconds=rng.random() * span),
+            }
+            for _ in range(min(batch_size, total - done))
+        ]
+        db.session.execute(SecurityEvent.__table__.insert(), rows)
+        db.session.commit()
+    rebuild_rollups()
+    print(f"   {time.perf_counter() - started:.1f} s (agrégats compris)")
+
+
+# =========================
+# Ancien calcul
+# =========================
+
+def legacy_stats():
+    """Requêtes de l'ancien get_dashboard_stats (compteurs et activité horaire)"""
+    from core import db
+    from core.security import SecurityEvent
+
+    now, q = datetime.utcnow(), SecurityEvent.query
+    h24, h1, min5 = now - timedelta(hours=24), now - timedelta(hours=1), now - timedelta(minutes=5)
+    q.count()
+    q.filter(SecurityEvent.timestamp >= h24).count()
+    q.filter(SecurityEvent.timestamp >= h1).count()
+    for event_type in (SecurityEvent.LOGIN_OK, SecurityEvent.LOGIN_FAIL, SecurityEvent.REGISTER,
+                       SecurityEvent.FLAG_OK, SecurityEvent.FLAG_FAIL):
+        q.filter(SecurityEvent.event_type == event_type, SecurityEvent.timestamp >= h24).count()
+    count = db.func.count(SecurityEvent.id)
+    (db.session.query(SecurityEvent.ip_address, count)
+     .filter(SecurityEvent.event_type == SecurityEvent.LOGIN_FAIL, SecurityEvent.timestamp >= min5)
+     .group_by(SecurityEvent.ip_address).having(count >= 5).all())
+    (db.session.query(SecurityEvent.ip_address, count.label("count"))
+     .filter(SecurityEvent.timestamp >= h24).group_by(SecurityEvent.ip_address)
+     .order_by(db.desc("count")).limit(10).all())
+    q.order_by(SecurityEvent.timestamp.desc()).limit(50).all()
+    (db.session.query(SecurityEvent.event_type, count)
+     .filter(SecurityEvent.timestamp >= h24).group_by(SecurityEvent.event_type).all())
+    for i in range(23, -1, -1):
+        q.filter(SecurityEvent.timestamp >= now - timedelta(hours=i + 1),
+                 SecurityEvent.timestamp < now - timedelta(hours=i)).count()
+    (q.filter(SecurityEvent.event_type == SecurityEvent.BANNED_ATTEMPT)
+     .order_by(SecurityEvent.timestamp.desc()).limit(20).all())
+
+
+# =========================
+# Mesure
+# =========================
+
+def measure(label, fn, runs):
+    """Affiche le temps médian / min et le nombre de requêtes d'un appel"""
+    from sqlalchemy import event
+    from core import db
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    timings = []
+    for _ in range(runs):
+        statements.clear()
+        event.listen(db.engine, "before_cursor_execute", listener)
+        started = time.perf_counter()
+        try:
+            fn()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        timings.append((time.perf_counter() - started) * 1000)
+        db.session.rollback()
+    print(f"   {label:<28} médiane {statistics.median(timings):9.1f} ms"
+          f"   min {min(timings):9.1f} ms   {len(statements):3d} requête(s)")
+
+
+# =========================
+# Main
+# =========================
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark du dashboard sécurité")
+
+    parser.add_argument('--database', default="sqlite:///bench_security.db",
+                        help="URL de la base de test")
+    parser.add_argument('--events', type=int, default=1_000_000, help="Nombre d'événements")
+    parser.add_argument('--ips', type=int, default=5000, help="Nombre d'IP distinctes")
+    parser.add_argument('--days', type=int, default=10, help="Période couverte (jours)")
+    parser.add_argument('--runs', type=int, default=5, help="Mesures par variante")
+
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database
+    from app import app
+    from core import db
+    from core.security import compute_dashboard_stats, get_dashboard_stats
+
+    with app.app_context():
+        db.create_all()
+        seed(args.events, args.ips, args.days)
+
+        print("\n" + "=" * 60)
+        print(f"   DASHBOARD SÉCURITÉ ({args.events} événements)")
+        print("=" * 60)
+        measure("Ancien calcul (COUNT)", legacy_stats, args.runs)
+        measure("Agrégats horaires", compute_dashboard_stats, args.runs)
+        get_dashboard_stats()
+        measure("Lecture en cache", get_dashboard_stats, args.runs)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n❌ Opération annulée.")
+        sys.exit(1)
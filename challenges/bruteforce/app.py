@@ -21,7 +21,8 @@ def vault():
         
         # Vérification du code
         if user_code == SECRET_CODE:
-            flag = "CTF{Brut3F0rc3_M4st3r_7394}"
+            # Flag personnalisé injecté par Nginx (X-CTF-Flag), sinon flag commun
+            flag = request.headers.get('X-CTF-Flag', "CTF{Brut3F0rc3_M4st3r_7394}")
             message = f"🎉 Coffre-fort déverrouillé ! Vous avez trouvé le code en {attempts} tentative(s)."
             # Reset des tentatives
             session['attempts'] = 0
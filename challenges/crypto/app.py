@@ -4,6 +4,13 @@ import hashlib
 app = Flask(__name__)
 app.secret_key = 'rainbow_tables_crypto_challenge_secret'
 
+FLAG = 'CTF{r41nb0w_t4bl3s_pwn3d}'
+
+
+def current_flag():
+    """Flag personnalisé injecté par Nginx (X-CTF-Flag), sinon flag commun"""
+    return request.headers.get('X-CTF-Flag', FLAG)
+
 # Base de données compromise avec hash MD5
 USERS_DATABASE = [
     {
@@ -94,7 +101,7 @@ def index():
             
             # Si c'est le niveau 5, afficher directement le flag
             if user_id_int == 5:
-                flag = 'CTF{r41nb0w_t4bl3s_pwn3d}'
+                flag = current_flag()
                 message = f'🎉 Bravo ! Vous avez cracké tous les hash en {session["attempts"]} tentatives ! Voici le flag :'
             
             crack_result = {
@@ -114,8 +121,8 @@ def index():
         flag_input = request.form.get('flag', '').strip()
         
         # Vérifier si c'est le bon flag
-        if flag_input == 'CTF{r41nb0w_t4bl3s_pwn3d}':
-            flag = 'CTF{r41nb0w_t4bl3s_pwn3d}'
+        if flag_input == current_flag():
+            flag = current_flag()
             message = f'🎉 Bravo ! Vous avez cracké tous les hash en {session["attempts"]} tentatives !'
             session['attempts'] = 0
         else:
@@ -38,7 +38,8 @@ def login():
             
             if user:
                 if user[1] == 'admin':
-                    flag = "CTF{SQL_1nj3ct10n_m4st3r}"
+                    # Flag personnalisé injecté par Nginx (X-CTF-Flag), sinon flag commun
+                    flag = request.headers.get('X-CTF-Flag', "CTF{SQL_1nj3ct10n_m4st3r}")
                     message = f"Connexion réussie en tant que {user[1]} ! Voici le flag : {flag}"
                 else:
                     message = f"Connecté en tant que {user[1]}, mais vous devez être admin pour obtenir le flag."
@@ -139,7 +139,8 @@ def start_challenge():
             detach=True,
             remove=False,  # On gère manuellement la suppression
             environment={
-                'FLAG': 'CTF{Upl04d_PHP_Sh3ll_M4st3r}'
+                # Flag personnalisé injecté par Nginx (X-CTF-Flag), sinon flag commun
+                'FLAG': request.headers.get('X-CTF-Flag', 'CTF{Upl04d_PHP_Sh3ll_M4st3r}')
             },
             mem_limit='256m',
             cpu_period=100000,
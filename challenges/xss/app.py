@@ -21,7 +21,8 @@ def index():
         
         # Détection du XSS (inchangé)
         if '<script>' in comment.lower() or 'onerror' in comment.lower():
-            flag = "CTF{XSS_r3fl3ct3d_pwn3d}"
+            # Flag personnalisé injecté par Nginx (X-CTF-Flag), sinon flag commun
+            flag = request.headers.get('X-CTF-Flag', "CTF{XSS_r3fl3ct3d_pwn3d}")
         
         # On ajoute le commentaire UNIQUEMENT à la session de l'utilisateur actuel
         new_comment = {
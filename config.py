@@ -38,4 +38,63 @@ class Config:
 
     # Configuration de Google OAuth
     GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
-    GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
\ No newline at end of file
+    GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
+    # Classement en mémoire : durée (s) avant reconstruction depuis la base,
+    # pour intégrer les solves traités par les autres workers
+    RANK_INDEX_TTL = int(os.getenv("RANK_INDEX_TTL", 60))
+    # Compteurs de version (cache du scoreboard) : durée (s) pendant laquelle un
+    # worker réutilise la dernière version lue sans interroger la base
+    VERSION_POLL_TTL = float(os.getenv("VERSION_POLL_TTL", 2))
+    # Gunicorn (gunicorn.conf.py) : workers et threads par worker
+    WEB_WORKERS = int(os.getenv("WEB_WORKERS", 1))
+    WEB_THREADS = int(os.getenv("WEB_THREADS", 32))
+    # Scoreboard en direct (SSE) : flux ouverts max par worker, plafonnés à
+    # WEB_THREADS - LIVE_THREAD_RESERVE (chaque flux occupe un thread, la réserve
+    # garde les logins, flags et /auth/check servis), ping (s), durée max d'un
+    # flux (s) avant reconnexion, sockets de diffusion inter-workers
+    LIVE_THREAD_RESERVE = int(os.getenv("LIVE_THREAD_RESERVE", 8))
+    LIVE_MAX_CLIENTS = int(os.getenv("LIVE_MAX_CLIENTS", WEB_THREADS - LIVE_THREAD_RESERVE))
+    LIVE_HEARTBEAT = int(os.getenv("LIVE_HEARTBEAT", 15))
+    LIVE_MAX_DURATION = int(os.getenv("LIVE_MAX_DURATION", 600))
+    LIVE_SOCKET_DIR = os.getenv("LIVE_SOCKET_DIR", "/tmp/cybercampus-live")
+    # Flags personnalisés (HMAC par joueur) : secret de dérivation et liste des
+    # challenges concernés, ex. "1,2,5" (désactivé sans secret)
+    FLAG_HMAC_SECRET = os.getenv("FLAG_HMAC_SECRET")
+    PER_USER_FLAG_CHALLENGES = frozenset(
+        int(cid) for cid in os.getenv("PER_USER_FLAG_CHALLENGES", "").split(",") if cid.strip()
+    )
+    # Bundle de contenu (indices, liens des services, pages Apprendre) : chemin
+    # du fichier et intervalle (s) de vérification de sa date de modification
+    CONTENT_BUNDLE_PATH = os.getenv("CONTENT_BUNDLE_PATH")
+    CONTENT_CHECK_INTERVAL = float(os.getenv("CONTENT_CHECK_INTERVAL", 5))
+    # Progression du dashboard : durée (s) max avant de reprendre les
+    # modifications faites par un admin (les soumissions invalident aussitôt)
+    PROGRESS_CACHE_TTL = int(os.getenv("PROGRESS_CACHE_TTL", 300))
+    # Instrumentation SQL : activation, nombre de répétitions d'une même forme
+    # de requête signalé comme N+1, en-tête X-Query-Stats hors debug
+    QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "1") == "1"
+    QUERY_N1_THRESHOLD = int(os.getenv("QUERY_N1_THRESHOLD", 5))
+    QUERY_STATS_HEADER = os.getenv("QUERY_STATS_HEADER", "0") == "1"
+    # Identité en cache (Flask-Login) : durée (s) max d'un instantané utilisateur
+    # ou de la liste des IP bannies (invalidés aussi par la version "identity")
+    IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", 30))
+    # Événements de sécurité écrits par lots hors requête : taille de la file,
+    # intervalle (ms) et taille max d'un lot, dossier des fichiers de
+    # débordement ; SECURITY_EVENTS_SYNC=1 pour écrire immédiatement
+    SECURITY_EVENT_QUEUE_SIZE = int(os.getenv("SECURITY_EVENT_QUEUE_SIZE", 10000))
+    SECURITY_EVENT_FLUSH_MS = int(os.getenv("SECURITY_EVENT_FLUSH_MS", 200))
+    SECURITY_EVENT_BATCH = int(os.getenv("SECURITY_EVENT_BATCH", 500))
+    SECURITY_EVENT_SPILL_DIR = os.getenv("SECURITY_EVENT_SPILL_DIR")
+    SECURITY_EVENTS_SYNC = os.getenv("SECURITY_EVENTS_SYNC", "0") == "1"
+    # Compteurs brute-force / spam de flags : fichier partagé entre workers
+    # (vide = mémoire du processus), nombre de cases, anneau de tranches
+    RATE_COUNTER_PATH = os.getenv("RATE_COUNTER_PATH")
+    RATE_COUNTER_SLOTS = int(os.getenv("RATE_COUNTER_SLOTS", 8192))
+    RATE_COUNTER_BUCKETS = int(os.getenv("RATE_COUNTER_BUCKETS", 60))
+    RATE_COUNTER_BUCKET_SECONDS = int(os.getenv("RATE_COUNTER_BUCKET_SECONDS", 10))
+    # Dashboard sécurité : durée (s) de cache des statistiques (0 = sans cache)
+    SECURITY_STATS_TTL = int(os.getenv("SECURITY_STATS_TTL", 10))
+    # Rétention de security_event : durée (jours) avant archivage et dossier
+    # des archives gzip (par défaut instance/security-archives)
+    SECURITY_EVENT_RETENTION_DAYS = int(os.getenv("SECURITY_EVENT_RETENTION_DAYS", 90))
+    SECURITY_ARCHIVE_DIR = os.getenv("SECURITY_ARCHIVE_DIR")
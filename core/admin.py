@@ -2,12 +2,17 @@
 # CyberCampus CTF - Panel Admin
 # ------------------------------
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, send_file, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, send_file, jsonify, current_app
 from flask_login import login_required, current_user
 from functools import wraps
 from core import db
-from core.models import User, Challenge, Submission, Scoreboard, Flag, RssFeed
+from core.models import (User, Challenge, Submission, Scoreboard, Flag, RssFeed, Solve, ScoreEvent,
+                         ChallengeScoring, GroupMembership, GroupScore, HintReveal)
 from core.security import SecurityEvent, get_dashboard_stats
+from core.ranking import get_rank_index, record_score, refresh_scores
+from core import reconcile, versions, progress, querystats, identity
+from core.groups import GROUP_KINDS, user_groups
+from core.content import get_bundle, reload_bundle
 from layer1_reader import get_layer1_stats
 from datetime import datetime, timedelta
 import csv
@@ -46,15 +51,13 @@ def dashboard():
     total_users = User.query.count()
     total_challenges = Challenge.query.count()
     total_submissions = Submission.query.count()
-    total_flags_valides = Submission.query.filter_by(correct=True).count()
+    total_flags_valides = Solve.query.count()
     
     # Challenge le plus réussi
     challenge_stats = db.session.query(
         Challenge.titre,
-        db.func.count(Submission.id).label('validations')
-    ).join(Submission).filter(
-        Submission.correct == True
-    ).group_by(Challenge.id).order_by(
+        db.func.count(Solve.id).label('validations')
+    ).join(Solve).group_by(Challenge.id).order_by(
         db.desc('validations')
     ).first()
     
@@ -124,6 +127,7 @@ def ban_user(user_id):
         user.role = "banned"
         flash(f"🔨 {user.pseudo} a été banni.", "warning")
 
+    identity.invalidate()
     db.session.commit()
     return redirect(url_for('admin.users'))
 
@@ -139,15 +143,23 @@ def reset_user_score(user_id):
         flash("❌ Vous ne pouvez pas réinitialiser le score d'un autre administrateur.", "danger")
         return redirect(url_for('admin.users'))
 
-    # Supprimer toutes ses soumissions
+    # Supprimer ses solves, ses indices révélés et toutes ses soumissions
+    Solve.query.filter_by(user_id=user.id).delete()
+    HintReveal.query.filter_by(user_id=user.id).delete()
+    ScoreEvent.query.filter_by(user_id=user.id).delete()
     Submission.query.filter_by(user_id=user.id).delete()
 
     # Reset son scoreboard
     scoreboard = Scoreboard.query.filter_by(user_id=user.id).first()
     if scoreboard:
         scoreboard.points_total = 0
+    GroupScore.recalculer(GroupMembership.groupes_de([user.id]))
 
+    version = versions.bump(versions.SCOREBOARD)
     db.session.commit()
+    progress.invalidate(user.id)
+    if scoreboard:
+        record_score(user.id, 0, version=version)
     flash(f"🔄 Score de {user.pseudo} réinitialisé.", "info")
     return redirect(url_for('admin.users'))
 
@@ -167,10 +179,9 @@ def user_profile(user_id):
     solved_challenges = profile_user.get_solved_challenges()
     in_progress = profile_user.get_in_progress_challenges()
     
-    # Classement
-    rank = Scoreboard.query.filter(
-        Scoreboard.points_total > profile_user.score
-    ).count() + 1
+    # Classement (index en mémoire)
+    standing = get_rank_index().standing(profile_user.id, profile_user.score)
+    rank = standing["rank"]
     
     # Toutes les soumissions
     submissions = Submission.query.filter_by(user_id=user_id)\
@@ -184,9 +195,27 @@ def user_profile(user_id):
         solved_challenges=solved_challenges,
         in_progress=in_progress,
         rank=rank,
-        submissions=submissions
+        standing=standing,
+        submissions=submissions,
+        groups=user_groups(profile_user.id),
+        group_kinds=GROUP_KINDS
     )
 
+@admin_bp.route('/users/<int:user_id>/groups', methods=['POST'])
+@login_required
+@admin_required
+def set_user_groups(user_id):
+    """Affecter un joueur à une école / une équipe"""
+    user = User.query.get_or_404(user_id)
+    changed = [
+        kind for kind in ("school", "team")
+        if GroupMembership.definir(user.id, kind, request.form.get(kind))
+    ]
+    db.session.commit()
+    if changed:
+        flash(f"✅ Groupes de {user.pseudo} mis à jour.", "success")
+    return redirect(url_for('admin.user_profile', user_id=user.id))
+
 # ------------------------------
 # GESTION DES CHALLENGES
 # ------------------------------
@@ -201,7 +230,7 @@ def challenges():
     stats = []
     for challenge in all_challenges:
         total_attempts = Submission.query.filter_by(challenge_id=challenge.id).count()
-        total_solved = Submission.query.filter_by(challenge_id=challenge.id, correct=True).count()
+        total_solved = challenge.solves.count()
         success_rate = (total_solved / total_attempts * 100) if total_attempts > 0 else 0
         
         stats.append({
@@ -211,7 +240,20 @@ def challenges():
             'success_rate': round(success_rate, 1)
         })
     
-    return render_template('admin/challenges.html', stats=stats)
+    return render_template('admin/challenges.html', stats=stats, content=get_bundle())
+
+@admin_bp.route('/challenges/content/reload', methods=['POST'])
+@login_required
+@admin_required
+def reload_content():
+    """Recharger le bundle de contenu (indices, services) sans redémarrage"""
+    try:
+        bundle = reload_bundle()
+    except (OSError, ValueError) as e:
+        flash(f"❌ Contenu non rechargé, l'ancienne version reste active : {e}", "danger")
+    else:
+        flash(f"✅ Contenu v{bundle.version} rechargé ({len(bundle)} challenges).", "success")
+    return redirect(url_for('admin.challenges'))
 
 @admin_bp.route('/challenges/<int:challenge_id>/toggle', methods=['POST'])
 @login_required
@@ -220,6 +262,8 @@ def toggle_challenge(challenge_id):
     """Activer/désactiver un challenge"""
     challenge = Challenge.query.get_or_404(challenge_id)
     challenge.actif = not challenge.actif
+    versions.bump(versions.SCOREBOARD)  # nombre de challenges actifs affiché au classement
+    versions.bump(versions.CATALOG)
     db.session.commit()
     
     status = "activé" if challenge.actif else "désactivé"
@@ -234,9 +278,26 @@ def edit_challenge(challenge_id):
     challenge = Challenge.query.get_or_404(challenge_id)
     
     if request.method == 'POST':
+        if request.form.get('dynamique'):
+            # Même verrou que le pipeline de soumission pendant le recalcul
+            db.session.refresh(challenge, with_for_update=True)
         challenge.titre = request.form.get('titre')
         challenge.description = request.form.get('description')
+        anciens_points = challenge.points
         challenge.points = int(request.form.get('points'))
+
+        # Score dynamique : la valeur est recalculée pour les seuls solveurs du challenge
+        rescored = []
+        if request.form.get('dynamique'):
+            scoring = challenge.scoring or ChallengeScoring(challenge_id=challenge.id)
+            scoring.initial = int(request.form.get('initial') or challenge.points)
+            scoring.minimum = int(request.form.get('minimum') or 0)
+            scoring.decay = int(request.form.get('decay') or 1)
+            challenge.scoring = scoring
+            rescored = scoring.recalculer(challenge)
+            GroupScore.recalculer(GroupMembership.groupes_de(rescored))
+        elif challenge.scoring:
+            challenge.scoring = None
         
         # Modifier le flag si fourni
         new_flag = request.form.get('flag')
@@ -248,12 +309,44 @@ def edit_challenge(challenge_id):
                 flag.setFlag(new_flag)
                 db.session.add(flag)
         
+        version = versions.bump(versions.SCOREBOARD)
+        versions.bump(versions.CATALOG)
         db.session.commit()
+        refresh_scores(rescored, version)
         flash(f"✅ Challenge '{challenge.titre}' modifié.", "success")
+        if rescored:
+            flash(f"🔄 Score dynamique : {len(rescored)} solveur(s) recalculé(s).", "info")
+        elif not challenge.scoring and challenge.points != anciens_points and challenge.solves.count():
+            flash("ℹ️ Les points ont changé : lancez le recalcul des scores pour les appliquer aux solves existants.", "info")
         return redirect(url_for('admin.challenges'))
     
     return render_template('admin/edit_challenge.html', challenge=challenge)
 
+@admin_bp.route('/challenges/reconcile', methods=['POST'])
+@login_required
+@admin_required
+def reconcile_scores():
+    """Recalculer tous les scores (simulation ou application)"""
+    report = reconcile.plan()
+
+    if not report.solve_diffs and not report.score_diffs:
+        flash("✅ Tous les scores sont à jour.", "success")
+        return redirect(url_for('admin.challenges'))
+
+    apercu = ", ".join(
+        f"{d.pseudo} {d.current or 0} → {d.expected}" for d in report.score_diffs[:5]
+    )
+    if len(report.score_diffs) > 5:
+        apercu += f", … (+{len(report.score_diffs) - 5})"
+
+    if request.form.get('apply'):
+        reconcile.apply(report)
+        flash(f"🔄 {len(report.score_diffs)} score(s) recalculé(s) : {apercu}", "success")
+    else:
+        flash(f"🔍 {len(report.solve_diffs)} solve(s) et {len(report.score_diffs)} score(s) "
+              f"à corriger : {apercu}", "info")
+    return redirect(url_for('admin.challenges'))
+
 # ------------------------------
 # HISTORIQUE DES SOUMISSIONS
 # ------------------------------
@@ -348,6 +441,30 @@ def rss_delete(feed_id):
     return redirect(url_for('admin.rss_feeds'))
 
 
+# ------------------------------
+# REQUÊTES SQL PAR ENDPOINT
+# ------------------------------
+@admin_bp.route('/queries')
+@login_required
+@admin_required
+def queries():
+    """Endpoints qui font le plus de requêtes SQL (N+1 probables)"""
+    return render_template(
+        'admin/queries.html',
+        endpoints=querystats.endpoint_report(),
+        threshold=current_app.config.get('QUERY_N1_THRESHOLD', 5),
+    )
+
+@admin_bp.route('/queries/reset', methods=['POST'])
+@login_required
+@admin_required
+def reset_queries():
+    """Remet à zéro les statistiques du worker"""
+    querystats.reset()
+    flash("✅ Statistiques SQL remises à zéro.", "success")
+    return redirect(url_for('admin.queries'))
+
+
 # ------------------------------
 # EXPORT SCOREBOARD
 # ------------------------------
@@ -419,6 +536,7 @@ def ban_ip():
     # Ban en base Flask
     ban = BannedIP(ip_address=ip, reason=reason, banned_by=current_user.id)
     db.session.add(ban)
+    identity.invalidate()
     db.session.commit()
 
     # Ban au niveau réseau via Fail2ban
@@ -445,6 +563,7 @@ def unban_ip(ban_id):
     ban = BannedIP.query.get_or_404(ban_id)
     ip  = ban.ip_address
     db.session.delete(ban)
+    identity.invalidate()
     db.session.commit()
 
     # Débannir aussi au niveau réseau
@@ -589,10 +708,14 @@ def security_live_filters():
     return jsonify(results) 
 
 @admin_bp.route('/security/live-stats')
-@login_required  
+@login_required
+@admin_required
 def security_live_stats():
     from layer1_reader import get_layer1_stats
-    return jsonify(get_layer1_stats())
+    from core import eventsink
+    stats = get_layer1_stats()
+    stats["event_sink"] = eventsink.metrics()
+    return jsonify(stats)
 
 # ── Export Word ──────────────────────────────────────────────────────
 @admin_bp.route('/security/export/word', methods=['POST'])
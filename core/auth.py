@@ -7,12 +7,15 @@ from flask_login import login_user, logout_user, login_required, current_user
 from flask_mail import Message
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 from core.forms import RegisterForm, LoginForm
-from core.models import User, EmailVerification
-from core import db, mail
+from core.models import User, EmailVerification, GroupMembership
+from core import db, mail, versions, identity
 from datetime import datetime
 import random
 import requests as http_requests
 from core.security import SecurityEvent, detect_bruteforce
+from core.ranking import rank_index
+from core.groups import user_groups
+from core.progress import get_progress
 
 # Création du blueprint d'authentification
 auth_bp = Blueprint('auth', __name__)
@@ -226,6 +229,7 @@ def verify_email_page():
                 # Code correct → activer le compte
                 verification.used = True
                 user.email_verified = True
+                identity.invalidate()
                 db.session.commit()
 
                 # Nettoyer la session
@@ -331,7 +335,7 @@ def logout():
 @auth_bp.route("/dashboard")
 @login_required
 def dashboard():
-    return render_template("dashboard.html", user=current_user)
+    return render_template("dashboard.html", user=current_user, progress=get_progress(current_user.id))
 
 # Note: Le décorateur @login_required protège cette route pour que seuls les utilisateurs connectés puissent y accéder.
 
@@ -441,15 +445,36 @@ def confirm_delete_account(token):
         logout_user()
  
         # Supprimer les données liées
-        from core.models import Submission, Scoreboard, EmailVerification
+        from core.models import (Submission, Scoreboard, EmailVerification, Solve, ScoreEvent,
+                                 GroupMembership, GroupScore, HintReveal)
+        from core.security import SecurityEvent, BannedIP
+        groupes = GroupMembership.groupes_de([user_id])
+        GroupMembership.query.filter_by(user_id=user_id).delete()
+        Solve.query.filter_by(user_id=user_id).delete()
+        HintReveal.query.filter_by(user_id=user_id).delete()
+        ScoreEvent.query.filter_by(user_id=user_id).delete()
         Submission.query.filter_by(user_id=user_id).delete()
         Scoreboard.query.filter_by(user_id=user_id).delete()
         EmailVerification.query.filter_by(user_id=user_id).delete()
- 
+
+        # Plus aucune référence au compte avant le DELETE (clés étrangères
+        # vérifiées par Postgres) : meilleur membre des groupes recalculé,
+        # journaux de sécurité conservés sans auteur
+        GroupScore.recalculer(groupes)
+        GroupScore.query.filter_by(top_user_id=user_id).update(
+            {GroupScore.top_user_id: None, GroupScore.top_points: None}, synchronize_session=False)
+        SecurityEvent.query.filter_by(user_id=user_id).update(
+            {SecurityEvent.user_id: None}, synchronize_session=False)
+        BannedIP.query.filter_by(banned_by=user_id).update(
+            {BannedIP.banned_by: None}, synchronize_session=False)
+
         # Supprimer l'utilisateur
         user = User.query.get(user_id)
         db.session.delete(user)
+        versions.bump(versions.SCOREBOARD)
+        identity.invalidate()
         db.session.commit()
+        rank_index.remove(user_id)
  
         # Envoyer email de confirmation de suppression
         try:
@@ -532,10 +557,27 @@ def edit_profile():
 
             current_user.country = country if country else None
             current_user.gender = gender if gender else None
+            GroupMembership.definir(current_user.id, "country", current_user.country)
             db.session.commit()
             flash("✅ Informations personnelles mises à jour.", "success")
             return redirect(url_for("auth.edit_profile"))
 
+        # ------------------------------
+        # Action : École et équipe (classements par groupe)
+        # ------------------------------
+        if action == "groups":
+            changed = False
+            for kind in ("school", "team"):
+                name = request.form.get(kind, "").strip()
+                if len(name) > 100:
+                    flash("❌ Le nom d'école ou d'équipe est limité à 100 caractères.", "danger")
+                    return redirect(url_for("auth.edit_profile"))
+                changed |= GroupMembership.definir(current_user.id, kind, name)
+            db.session.commit()
+            if changed:
+                flash("✅ École et équipe mises à jour.", "success")
+            return redirect(url_for("auth.edit_profile"))
+
         # ------------------------------
         # Action : Changer le pseudo
         # ------------------------------
@@ -560,6 +602,8 @@ def edit_profile():
                 return redirect(url_for("auth.edit_profile"))
 
             current_user.pseudo = new_pseudo
+            versions.bump(versions.SCOREBOARD)  # pseudo affiché au classement
+            identity.invalidate()
             db.session.commit()
             flash("✅ Pseudo mis à jour avec succès.", "success")
             return redirect(url_for("auth.edit_profile"))
@@ -668,7 +712,7 @@ def edit_profile():
             flash("✅ Mot de passe mis à jour avec succès.", "success")
             return redirect(url_for("auth.edit_profile"))
 
-    return render_template("edit_profile.html", user=current_user)
+    return render_template("edit_profile.html", user=current_user, groups=user_groups(current_user.id))
 
 
 @auth_bp.route("/profile/email/confirm/<token>")
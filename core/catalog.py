@@ -0,0 +1,147 @@
+# ------------------------------
+# CyberCampus CTF - Catalogue des challenges en mémoire
+# ------------------------------
+#
+# Catalogue immuable des challenges (métadonnées, points, statut, hash du
+# flag) gardé par worker et reconstruit quand la version "catalog" change.
+# Vérifier un flag est une lecture de dictionnaire et une comparaison en
+# temps constant.
+
+from collections import namedtuple
+import hmac
+from types import MappingProxyType
+
+from core import db, versions
+
+
+CatalogEntry = namedtuple(
+    "CatalogEntry",
+    "id titre description points actif flag_hash dynamique",
+)
+
+
+class Catalog:
+    """Instantané immuable des challenges, pour une version donnée."""
+
+    __slots__ = ("version", "entries", "actifs")
+
+    def __init__(self, version: int, entries):
+        entries = sorted(entries, key=lambda e: e.id)
+        self.version = version
+        self.entries = MappingProxyType({e.id: e for e in entries})
+        self.actifs = tuple(e for e in entries if e.actif)
+
+    def get(self, challenge_id):
+        return self.entries.get(challenge_id)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+_cache = versions.VersionedCache(max_entries=1)
+
+
+def _build(version: int) -> Catalog:
+    """Charge tous les challenges et leurs flags en une requête."""
+    from core.models import Challenge, Flag, ChallengeScoring
+
+    rows = (
+        db.session.query(
+            Challenge.id, Challenge.titre, Challenge.description,
+            db.func.coalesce(Challenge.points, 0), Challenge.actif,
+            Flag.flag_hash, ChallengeScoring.challenge_id.isnot(None),
+        )
+        .outerjoin(Flag, Flag.challenge_id == Challenge.id)
+        .outerjoin(ChallengeScoring, ChallengeScoring.challenge_id == Challenge.id)
+        .all()
+    )
+    return Catalog(version, (
+        CatalogEntry(challenge_id, titre, description, points, bool(actif), flag_hash, bool(dynamique))
+        for challenge_id, titre, description, points, actif, flag_hash, dynamique in rows
+    ))
+
+
+def get_catalog() -> Catalog:
+    """Catalogue du worker, reconstruit si la version a changé."""
+    version = versions.current(versions.CATALOG)
+    return _cache.get("catalog", version, lambda: _build(version))
+
+
+def get_challenge(challenge_id: int):
+    """Entrée du catalogue, ou None si le challenge n'existe pas."""
+    return get_catalog().get(challenge_id)
+
+
+def verify_flag(challenge_id: int, flag_soumis: str) -> bool:
+    """Compare le hash du flag soumis à celui du catalogue en temps constant."""
+    from core.models import Flag
+
+    entry = get_challenge(challenge_id)
+    if entry is None or not entry.flag_hash:
+        return False
+    return hmac.compare_digest(entry.flag_hash, Flag._hash(flag_soumis))
+
+
+def clear_catalog():
+    _cache.clear()
+    _solve_counts.clear()
+    _cards.clear()
+
+
+# ------------------------------
+# Liste des challenges
+# ------------------------------
+#
+# Cartes calculées une fois par vue : solves du joueur (core.progress) et
+# nombre de solves par challenge (une requête groupée par version du
+# scoreboard). Le fragment HTML est en cache par joueur et par versions du
+# catalogue, du scoreboard, de la progression et du contenu.
+
+ChallengeCard = namedtuple("ChallengeCard", "id titre description points icon solved solves")
+
+_solve_counts = versions.VersionedCache(max_entries=1)
+_cards = versions.VersionedCache(max_entries=1024)
+
+
+def solve_counts():
+    """Nombre de solves par challenge, relu quand le scoreboard change."""
+    from core.models import Solve
+
+    version = versions.current(versions.SCOREBOARD)
+    return _solve_counts.get("counts", version, lambda: MappingProxyType(dict(
+        db.session.query(Solve.challenge_id, db.func.count()).group_by(Solve.challenge_id).all()
+    )))
+
+
+def challenge_cards(user_id=None):
+    """Cartes des challenges actifs et nombre de challenges résolus par le joueur."""
+    from core.content import get_challenge_content
+    from core.progress import get_progress
+
+    solved = get_progress(user_id).solved_ids if user_id else frozenset()
+    counts = solve_counts()
+    cards = []
+    for entry in get_catalog().actifs:
+        content = get_challenge_content(entry.id)
+        cards.append(ChallengeCard(
+            entry.id, entry.titre, entry.description, entry.points,
+            content.icon if content else "🎯", entry.id in solved, counts.get(entry.id, 0),
+        ))
+    return tuple(cards), sum(1 for card in cards if card.solved)
+
+
+def cards_fragment(user_id, render):
+    """
+    Résultat de render(cards, solved_count) (fragment HTML et compteurs),
+    mis en cache pour le joueur.
+    """
+    from core.content import get_bundle
+    from core.progress import progress_version
+
+    version = (
+        versions.current(versions.CATALOG),
+        versions.current(versions.SCOREBOARD),
+        progress_version(user_id) if user_id else None,
+        get_bundle().mtime,
+    )
+    return _cards.get(user_id or 0, version, lambda: render(*challenge_cards(user_id)))
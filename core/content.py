@@ -0,0 +1,162 @@
+# ------------------------------
+# CyberCampus CTF - Bundle de contenu des challenges
+# ------------------------------
+#
+# Indices, pénalités, liens de service, icône et page "Apprendre" de chaque
+# challenge, lus dans content/challenges.json et compilés en structures
+# immuables. Le fichier est revérifié au plus toutes les
+# CONTENT_CHECK_INTERVAL secondes ; un fichier invalide laisse l'ancien
+# bundle en service. Le flag en clair n'est pas conservé.
+
+from collections import namedtuple
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from flask import current_app
+
+
+Hint = namedtuple("Hint", "text penalty_percent")
+ServiceLink = namedtuple("ServiceLink", "url label description mobile")
+ChallengeContent = namedtuple(
+    "ChallengeContent",
+    "id slug titre description points actif icon service learn hints",
+)
+
+DEFAULT_BUNDLE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "content", "challenges.json"
+)
+
+
+class ContentError(ValueError):
+    """Fichier de contenu invalide."""
+
+
+class ContentBundle:
+    """Contenu compilé d'une version du fichier."""
+
+    __slots__ = ("version", "mtime", "challenges")
+
+    def __init__(self, version: int, mtime: float, challenges):
+        self.version = version
+        self.mtime = mtime
+        self.challenges = MappingProxyType({c.id: c for c in challenges})
+
+    def get(self, challenge_id):
+        return self.challenges.get(challenge_id)
+
+    def __len__(self):
+        return len(self.challenges)
+
+
+EMPTY_BUNDLE = ContentBundle(0, 0.0, ())
+
+_bundle = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def bundle_path() -> str:
+    return current_app.config.get("CONTENT_BUNDLE_PATH") or DEFAULT_BUNDLE_PATH
+
+
+def read_bundle_file(path: str = None) -> dict:
+    """Contenu brut du fichier (flags compris), pour init_challenges.py."""
+    with open(path or DEFAULT_BUNDLE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _compile_challenge(raw: dict) -> ChallengeContent:
+    service = raw.get("service")
+    if service is not None:
+        service = ServiceLink(
+            str(service["url"]), str(service["label"]),
+            str(service.get("description", "")), bool(service.get("mobile", False)),
+        )
+    hints = tuple(
+        Hint(str(h["text"]), int(h["penalty_percent"])) for h in raw.get("hints", ())
+    )
+    for hint in hints:
+        if not 0 <= hint.penalty_percent <= 100:
+            raise ContentError(f"challenge {raw['id']} : pénalité hors limites")
+    return ChallengeContent(
+        int(raw["id"]), str(raw["slug"]), str(raw["titre"]), str(raw.get("description", "")),
+        int(raw.get("points", 0)), bool(raw.get("actif", True)), raw.get("icon") or "🚩",
+        service, raw.get("learn"), hints,
+    )
+
+
+def compile_bundle(data: dict, mtime: float = 0.0) -> ContentBundle:
+    """Valide et compile le contenu brut ; lève ContentError si invalide."""
+    try:
+        challenges = [_compile_challenge(raw) for raw in data["challenges"]]
+        version = int(data.get("version", 0))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ContentError(f"bundle de contenu invalide : {e!r}") from e
+    if len({c.id for c in challenges}) != len(challenges):
+        raise ContentError("bundle de contenu invalide : id de challenge en double")
+    return ContentBundle(version, mtime, challenges)
+
+
+def _load(path: str, mtime: float) -> ContentBundle:
+    try:
+        return compile_bundle(read_bundle_file(path), mtime)
+    except (OSError, ValueError) as e:
+        current_app.logger.error("Contenu non rechargé (%s) : %s", path, e)
+        return None
+
+
+def get_bundle() -> ContentBundle:
+    """Bundle courant, recompilé si le fichier a été modifié."""
+    global _bundle, _checked_at
+    now = time.monotonic()
+    interval = current_app.config.get("CONTENT_CHECK_INTERVAL", 5)
+    if _bundle is not None and now - _checked_at < interval:
+        return _bundle
+    with _lock:
+        if _bundle is not None and now - _checked_at < interval:
+            return _bundle
+        path = bundle_path()
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime is not None and (_bundle is None or mtime != _bundle.mtime):
+            fresh = _load(path, mtime)
+            if fresh is not None:
+                _bundle = fresh
+        if _bundle is None:
+            _bundle = EMPTY_BUNDLE
+        _checked_at = now
+        return _bundle
+
+
+def reload_bundle() -> ContentBundle:
+    """
+    Relit le fichier immédiatement (action admin). Lève ContentError si le
+    fichier est invalide ; sinon le touche pour que les autres workers le
+    rechargent à leur prochaine vérification.
+    """
+    global _bundle, _checked_at
+    path = bundle_path()
+    with _lock:
+        fresh = compile_bundle(read_bundle_file(path))
+        # Touché seulement une fois compilé : un fichier invalide ne déclenche
+        # pas de rechargement (ni d'erreur) dans les autres workers
+        os.utime(path)
+        fresh.mtime = os.stat(path).st_mtime
+        _bundle, _checked_at = fresh, time.monotonic()
+        return fresh
+
+
+def get_challenge_content(challenge_id: int):
+    """Contenu du challenge, ou None s'il n'est pas dans le bundle."""
+    return get_bundle().get(challenge_id)
+
+
+def clear_content():
+    global _bundle, _checked_at
+    with _lock:
+        _bundle, _checked_at = None, 0.0
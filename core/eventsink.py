@@ -0,0 +1,225 @@
+# ------------------------------
+# CyberCampus CTF - Écriture différée des événements de sécurité
+# ------------------------------
+#
+# Les événements de sécurité passent par une file bornée en mémoire ; un
+# thread par worker les insère par lots sur sa propre connexion, hors session
+# de requête, et incrémente les agrégats horaires (core.security) dans la
+# même transaction. Ce qui ne peut pas être inséré (file pleine, base
+# indisponible, arrêt du worker) est ajouté au fichier de débordement
+# (SECURITY_EVENT_SPILL_DIR) puis réinséré. metrics() alimente
+# /admin/security/live-stats.
+
+import atexit
+from datetime import datetime
+from glob import glob
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+
+from flask import current_app
+
+from core import db
+
+
+class EventSink:
+    """File bornée + flusher en arrière-plan pour un worker."""
+
+    def __init__(self):
+        self._queue = None
+        self._thread = None
+        self._engine = None
+        self._table = None
+        self._spill_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.spill_dir = None
+        self.flush_interval = 0.2
+        self.batch_size = 500
+        self._metrics = dict(enqueued=0, written=0, batches=0, spilled=0, replayed=0,
+                             failures=0, max_depth=0, last_flush_ms=0.0, last_error=None)
+
+    # ── Démarrage ────────────────────────────────────────────────────
+    def start(self, app, engine=None):
+        """Démarre le flusher du worker (une seule fois, au premier événement)."""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            from core.security import SecurityEvent
+
+            cfg = app.config
+            self._queue = queue.Queue(maxsize=cfg.get("SECURITY_EVENT_QUEUE_SIZE", 10000))
+            self.flush_interval = cfg.get("SECURITY_EVENT_FLUSH_MS", 200) / 1000
+            self.batch_size = cfg.get("SECURITY_EVENT_BATCH", 500)
+            self.spill_dir = cfg.get("SECURITY_EVENT_SPILL_DIR") or os.path.join(
+                tempfile.gettempdir(), "cybercampus-events")
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._engine = engine or db.engine
+            self._table = SecurityEvent.__table__
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="security-events", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Arrêt du worker : dernier lot, le reste part dans le fichier de débordement."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        rows = self._drain(self._queue.qsize())
+        if rows:
+            self._spill(rows)
+
+    # ── Écriture ─────────────────────────────────────────────────────
+    def put(self, row: dict):
+        """Ajoute un événement sans bloquer ; file pleine : fichier de débordement."""
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._spill([row])
+            return
+        self._metrics["enqueued"] += 1
+        depth = self._queue.qsize()
+        if depth > self._metrics["max_depth"]:
+            self._metrics["max_depth"] = depth
+
+    def _drain(self, limit: int) -> list:
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _insert(self, rows: list) -> bool:
+        from core.security import rollup_statements
+
+        started = time.perf_counter()
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(self._table.insert(), rows)
+                # Agrégats horaires dans la même transaction que le lot
+                for stmt, params in rollup_statements(conn.dialect.name, rows):
+                    conn.execute(stmt, params)
+        except Exception as e:
+            self._metrics["failures"] += 1
+            # Type seul : le message peut contenir la requête et ses valeurs
+            self._metrics["last_error"] = type(e).__name__
+            return False
+        self._metrics["written"] += len(rows)
+        self._metrics["batches"] += 1
+        self._metrics["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return True
+
+    def _run(self):
+        self._replay(orphans=True)
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._replay()
+                continue
+            # Laisse le lot se remplir jusqu'à l'échéance ou la taille max
+            deadline = time.monotonic() + self.flush_interval
+            rows = [first]
+            while len(rows) < self.batch_size and time.monotonic() < deadline:
+                rows.extend(self._drain(self.batch_size - len(rows)))
+                if len(rows) < self.batch_size:
+                    self._stop.wait(0.01)
+            if not self._insert(rows):
+                self._spill(rows)
+        rows = self._drain(self.batch_size)
+        while rows:
+            if not self._insert(rows):
+                self._spill(rows)
+            rows = self._drain(self.batch_size)
+
+    # ── Fichier de débordement ───────────────────────────────────────
+    def _spill_path(self, pid=None) -> str:
+        return os.path.join(self.spill_dir, f"events-{pid or os.getpid()}.jsonl")
+
+    def _spill(self, rows: list):
+        with self._spill_lock:
+            with open(self._spill_path(), "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({**row, "timestamp": row["timestamp"].isoformat()}) + "\n")
+        self._metrics["spilled"] += len(rows)
+
+    def _replay(self, orphans=False):
+        """Réinsère le fichier du processus (et ceux des processus disparus au démarrage)."""
+        paths = [self._spill_path()]
+        if orphans:
+            paths = glob(os.path.join(self.spill_dir, "events-*.jsonl"))
+        for path in paths:
+            pid = os.path.basename(path)[len("events-"):-len(".jsonl")]
+            if path != self._spill_path() and (not pid.isdigit() or _alive(int(pid))):
+                continue
+            self._replay_file(path)
+
+    def _replay_file(self, path: str):
+        with self._spill_lock:
+            claimed = f"{path}.{os.getpid()}.replay"
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                return   # repris par un autre worker
+        rows = []
+        with open(claimed, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                    row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+                    rows.append(row)
+                except (ValueError, KeyError):
+                    continue   # ligne tronquée par un arrêt brutal
+        for start in range(0, len(rows), self.batch_size):
+            if not self._insert(rows[start:start + self.batch_size]):
+                # Base indisponible : on remet le reste dans le fichier
+                self._spill(rows[start:])
+                break
+            self._metrics["replayed"] += len(rows[start:start + self.batch_size])
+        os.remove(claimed)
+
+    # ── Métriques ────────────────────────────────────────────────────
+    def metrics(self) -> dict:
+        spill_size = 0
+        if self.spill_dir and os.path.exists(self._spill_path()):
+            spill_size = os.path.getsize(self._spill_path())
+        return {
+            **self._metrics,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": self._queue.maxsize if self._queue else 0,
+            "spill_bytes": spill_size,
+            "running": self._thread is not None and self._thread.is_alive(),
+        }
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+sink = EventSink()
+
+
+def record(row: dict):
+    """Événement à écrire ; hors SECURITY_EVENTS_SYNC, sans toucher la session."""
+    app = current_app._get_current_object()
+    if sink._thread is None:
+        sink.start(app)
+    sink.put(row)
+
+
+def metrics() -> dict:
+    return sink.metrics()
@@ -0,0 +1,58 @@
+# ------------------------------
+# CyberCampus CTF - Flags personnalisés par joueur (HMAC)
+# ------------------------------
+#
+# Pour les challenges de PER_USER_FLAG_CHALLENGES, le flag est dérivé du
+# joueur : CTF{u<user_id>_<HMAC-SHA256(FLAG_HMAC_SECRET, "challenge_id:user_id")[:24]>}.
+# Le user_id en clair permet de reconnaître un flag partagé. Nginx reçoit le
+# flag dans l'en-tête X-CTF-Flag de /auth/check et doit toujours l'écraser
+# avant de le transmettre au service.
+
+from collections import namedtuple
+import hashlib
+import hmac
+import re
+
+from flask import current_app
+
+
+FLAG_PATTERN = re.compile(r"^CTF\{u(\d+)_([0-9a-f]{24})\}$")
+
+FlagCheck = namedtuple("FlagCheck", "valid owner_id")
+
+
+def _secret():
+    secret = current_app.config.get("FLAG_HMAC_SECRET")
+    return secret.encode("utf-8") if secret else None
+
+
+def per_user_enabled(challenge_id: int) -> bool:
+    """Le challenge utilise-t-il des flags dérivés du joueur ?"""
+    return _secret() is not None and int(challenge_id) in current_app.config.get(
+        "PER_USER_FLAG_CHALLENGES", ()
+    )
+
+
+def _mac(secret: bytes, challenge_id: int, user_id: int) -> str:
+    message = f"{int(challenge_id)}:{int(user_id)}".encode("utf-8")
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()[:24]
+
+
+def derive_flag(challenge_id: int, user_id: int) -> str:
+    """Flag du joueur pour ce challenge."""
+    return f"CTF{{u{int(user_id)}_{_mac(_secret(), challenge_id, user_id)}}}"
+
+
+def check_flag(challenge_id: int, user_id: int, flag_soumis: str) -> FlagCheck:
+    """
+    Vérifie un flag dérivé. valid indique s'il appartient au joueur ;
+    owner_id est le joueur à qui il appartient (un autre en cas de partage),
+    None si ce n'est le flag de personne.
+    """
+    match = FLAG_PATTERN.match(flag_soumis or "")
+    if not match:
+        return FlagCheck(False, None)
+    owner_id = int(match.group(1))
+    if not hmac.compare_digest(match.group(2), _mac(_secret(), challenge_id, owner_id)):
+        return FlagCheck(False, None)
+    return FlagCheck(owner_id == int(user_id), owner_id)
@@ -0,0 +1,68 @@
+# ------------------------------
+# CyberCampus CTF - Classements par groupe (pays, école, équipe)
+# ------------------------------
+#
+# Agrégats par groupe (pays, école, équipe) stockés dans group_score : mis à
+# jour par incrément au solve et à l'arrivée d'un membre, recalculés pour les
+# seuls groupes concernés dans les autres cas (GroupScore.recalculer). Le
+# classement est en cache par version du scoreboard.
+
+from collections import namedtuple
+
+from core import db, versions
+
+
+GROUP_KINDS = {
+    "country": "Pays",
+    "school": "École",
+    "team": "Équipe",
+}
+
+GroupRow = namedtuple(
+    "GroupRow",
+    "rank group_id name points solve_count member_count top_pseudo top_points",
+)
+
+GROUP_BOARD_LIMIT = 100
+
+_boards = versions.VersionedCache(max_entries=16)
+
+
+def group_leaderboard(kind: str, limit: int = GROUP_BOARD_LIMIT) -> list:
+    """Classement des groupes d'un type, lu depuis les agrégats (une requête)."""
+    from core.models import UserGroup, GroupScore, User
+
+    def build():
+        rows = (
+            db.session.query(
+                UserGroup.id, UserGroup.name,
+                GroupScore.points_total, GroupScore.solve_count, GroupScore.member_count,
+                User.pseudo, GroupScore.top_points,
+            )
+            .join(GroupScore, GroupScore.group_id == UserGroup.id)
+            .outerjoin(User, User.id == GroupScore.top_user_id)
+            .filter(UserGroup.kind == kind, GroupScore.member_count > 0)
+            .order_by(GroupScore.points_total.desc(), GroupScore.solve_count.desc(), UserGroup.name)
+            .limit(limit)
+            .all()
+        )
+        return [GroupRow(rank, *row) for rank, row in enumerate(rows, start=1)]
+
+    return _boards.get((kind, limit), versions.current(versions.SCOREBOARD), build)
+
+
+def user_groups(user_id: int) -> dict:
+    """Groupes d'un joueur, par type : {"school": "ENSIBS", ...}."""
+    from core.models import UserGroup, GroupMembership
+
+    rows = (
+        db.session.query(GroupMembership.kind, UserGroup.name)
+        .join(UserGroup, UserGroup.id == GroupMembership.group_id)
+        .filter(GroupMembership.user_id == user_id)
+        .all()
+    )
+    return dict(rows)
+
+
+def clear_group_cache():
+    _boards.clear()
@@ -0,0 +1,138 @@
+# ------------------------------
+# CyberCampus CTF - Historique des soumissions d'un joueur
+# ------------------------------
+#
+# Historique paginé par clé (timestamp, id) sur l'index (user_id, timestamp,
+# id), compteurs agrégés en SQL et export CSV / NDJSON par lots de la même
+# pagination. Les titres viennent du catalogue en mémoire.
+
+from collections import namedtuple
+import csv
+from datetime import datetime
+import io
+import json
+
+from core import db
+
+
+HISTORY_PAGE_SIZE = 50
+EXPORT_BATCH_SIZE = 500
+
+FILTRES = ("correct", "incorrect")
+
+HistoryRow = namedtuple(
+    "HistoryRow",
+    "id challenge_id titre flag_soumis correct points_obtenus timestamp",
+)
+HistoryStats = namedtuple("HistoryStats", "total correct failed")
+
+EXPORT_FIELDS = ("date", "challenge_id", "challenge", "flag", "correct", "points")
+
+
+def encode_cursor(row: HistoryRow) -> str:
+    """Clé de la dernière ligne affichée, pour l'URL."""
+    return f"{row.timestamp.isoformat()},{row.id}"
+
+
+def decode_cursor(cursor: str):
+    """Inverse de encode_cursor ; None si le curseur est invalide."""
+    try:
+        ts, sub_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(ts), int(sub_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def history_stats(user_id: int) -> HistoryStats:
+    """Nombre de soumissions et de réussites, en une requête."""
+    from core.models import Submission
+
+    total, correct = (
+        db.session.query(
+            db.func.count(Submission.id),
+            db.func.coalesce(db.func.sum(db.case((Submission.correct.is_(True), 1), else_=0)), 0),
+        )
+        .filter(Submission.user_id == user_id)
+        .one()
+    )
+    return HistoryStats(total, correct, total - correct)
+
+
+def _rows(user_id: int, after=None, filtre=None, limit=HISTORY_PAGE_SIZE) -> list:
+    from core.catalog import get_catalog
+    from core.models import Submission
+
+    query = db.session.query(
+        Submission.id, Submission.challenge_id, Submission.flag_soumis,
+        Submission.correct, Submission.points_obtenus, Submission.timestamp,
+    ).filter(Submission.user_id == user_id)
+    if filtre == "correct":
+        query = query.filter(Submission.correct.is_(True))
+    elif filtre == "incorrect":
+        query = query.filter(db.or_(Submission.correct.is_(False), Submission.correct.is_(None)))
+    if after is not None:
+        ts, sub_id = after
+        query = query.filter(db.or_(
+            Submission.timestamp < ts,
+            db.and_(Submission.timestamp == ts, Submission.id < sub_id),
+        ))
+    rows = query.order_by(Submission.timestamp.desc(), Submission.id.desc()).limit(limit).all()
+
+    entries = get_catalog().entries
+    return [
+        HistoryRow(
+            sub_id, challenge_id, entries[challenge_id].titre if challenge_id in entries else "—",
+            flag_soumis, bool(correct), points or 0, timestamp,
+        )
+        for sub_id, challenge_id, flag_soumis, correct, points, timestamp in rows
+    ]
+
+
+def history_page(user_id: int, after: str = None, filtre: str = None, limit: int = HISTORY_PAGE_SIZE):
+    """Une page de l'historique (plus récentes d'abord) et le curseur de la suivante."""
+    if filtre not in FILTRES:
+        filtre = None
+    rows = _rows(user_id, decode_cursor(after) if after else None, filtre, limit + 1)
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def iter_history(user_id: int, batch: int = EXPORT_BATCH_SIZE):
+    """Tout l'historique, lot par lot (une requête par lot)."""
+    after = None
+    while True:
+        rows = _rows(user_id, after, limit=batch)
+        yield from rows
+        if len(rows) < batch:
+            return
+        after = (rows[-1].timestamp, rows[-1].id)
+
+
+def _export_record(row: HistoryRow) -> tuple:
+    return (row.timestamp.isoformat(), row.challenge_id, row.titre,
+            row.flag_soumis, row.correct, row.points_obtenus)
+
+
+def export_csv(user_id: int):
+    """Lignes CSV de l'historique complet (générateur)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(EXPORT_FIELDS)
+    for row in iter_history(user_id):
+        writer.writerow(_export_record(row))
+        if buffer.tell() >= 8192:
+            yield flush()
+    yield flush()
+
+
+def export_ndjson(user_id: int):
+    """Une ligne JSON par soumission (générateur)."""
+    for row in iter_history(user_id):
+        yield json.dumps(dict(zip(EXPORT_FIELDS, _export_record(row))), ensure_ascii=False) + "\n"
@@ -0,0 +1,94 @@
+# ------------------------------
+# CyberCampus CTF - Identité en cache (Flask-Login)
+# ------------------------------
+#
+# Instantané léger de chaque joueur (id, pseudo, rôle, email vérifié) et
+# ensemble des IP bannies, gardés par worker tant que la version "identity"
+# ne change pas (au plus IDENTITY_CACHE_TTL secondes). CachedUser charge
+# l'entité User au premier accès à un autre attribut.
+
+from collections import namedtuple
+import time
+
+from flask import current_app
+from flask_login import UserMixin
+
+from core import db, versions
+
+
+UserSnapshot = namedtuple("UserSnapshot", "id pseudo role email_verified")
+
+_users = versions.VersionedCache(max_entries=4096)
+_bans = versions.VersionedCache(max_entries=1)
+
+
+class CachedUser(UserMixin):
+    """Utilisateur connecté : instantané en cache, entité User chargée à la demande."""
+
+    __slots__ = ("_snapshot", "_user")
+
+    def __init__(self, snapshot: UserSnapshot):
+        object.__setattr__(self, "_snapshot", snapshot)
+        object.__setattr__(self, "_user", None)
+
+    id = property(lambda self: self._snapshot.id)
+    pseudo = property(lambda self: self._snapshot.pseudo)
+    role = property(lambda self: self._snapshot.role)
+    email_verified = property(lambda self: self._snapshot.email_verified)
+
+    def _entity(self):
+        if self._user is None:
+            from core.models import User
+
+            object.__setattr__(self, "_user", db.session.get(User, self._snapshot.id))
+        return self._user
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self._entity(), name)
+
+    def __setattr__(self, name, value):
+        # Écritures (profil, mot de passe) : sur l'entité de la session
+        setattr(self._entity(), name, value)
+
+
+def _version():
+    ttl = current_app.config.get("IDENTITY_CACHE_TTL", 30)
+    return versions.current(versions.IDENTITY), int(time.monotonic() // ttl) if ttl else 0
+
+
+def _snapshot(user_id: int):
+    from core.models import User
+
+    row = (
+        db.session.query(User.id, User.pseudo, User.role, User.email_verified)
+        .filter(User.id == user_id)
+        .first()
+    )
+    return UserSnapshot(row.id, row.pseudo, row.role, bool(row.email_verified)) if row else None
+
+
+def load_user(user_id: int):
+    """Utilisateur de la session, sans requête tant que le cache est valide."""
+    snapshot = _users.get(user_id, _version(), lambda: _snapshot(user_id))
+    return CachedUser(snapshot) if snapshot is not None else None
+
+
+def banned_ips() -> frozenset:
+    """IP bannies, relues quand la version change."""
+    from core.security import BannedIP
+
+    return _bans.get("bans", _version(), lambda: frozenset(
+        ip for (ip,) in db.session.query(BannedIP.ip_address)
+    ))
+
+
+def invalidate():
+    """Un compte ou un bannissement change : incrément dans la transaction courante."""
+    versions.bump(versions.IDENTITY)
+
+
+def clear_identity():
+    _users.clear()
+    _bans.clear()
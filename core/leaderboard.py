@@ -0,0 +1,160 @@
+# ------------------------------
+# CyberCampus CTF - Modèle de lecture du classement
+# ------------------------------
+#
+# Tranches du classement lues en une requête de lignes légères, dans l'ordre
+# de l'index en mémoire (core.ranking), avec une pagination par clé (points,
+# dernier solve, user_id). Fragments HTML et top JSON sont en cache par
+# version du scoreboard.
+
+from collections import namedtuple
+import json
+
+from core import db, versions
+from core.ranking import get_rank_index
+
+
+ScoreboardRow = namedtuple(
+    "ScoreboardRow",
+    "rank user_id pseudo country points solved_count last_solve_at created_at",
+)
+
+SCOREBOARD_TOP_N = 100
+
+_pages = versions.VersionedCache()
+_top_json = versions.VersionedCache(max_entries=4)
+
+
+def encode_cursor(key) -> str:
+    """Sérialise une clé de tri (points, dernier solve, user_id) pour l'URL."""
+    points, ts, user_id = key
+    return f"{points}:{ts!r}:{user_id}"
+
+
+def decode_cursor(cursor: str):
+    """Inverse de encode_cursor ; None si le curseur est invalide."""
+    try:
+        points, ts, user_id = cursor.split(":")
+        return int(points), float(ts), int(user_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _hydrate(entries) -> list:
+    """Charge les lignes d'une tranche [(rang, user_id, points)] en une requête."""
+    from core.models import User, Scoreboard, Solve
+
+    if not entries:
+        return []
+    ids = [user_id for _, user_id, _ in entries]
+    stats = (
+        db.session.query(
+            Solve.user_id.label("user_id"),
+            db.func.count(Solve.id).label("solved_count"),
+            db.func.max(Solve.solved_at).label("last_solve_at"),
+        )
+        .filter(Solve.user_id.in_(ids))
+        .group_by(Solve.user_id)
+        .subquery()
+    )
+    rows = (
+        db.session.query(
+            User.id, User.pseudo, User.country, User.created_at,
+            Scoreboard.points_total, stats.c.solved_count, stats.c.last_solve_at,
+        )
+        .join(Scoreboard, Scoreboard.user_id == User.id)
+        .outerjoin(stats, stats.c.user_id == User.id)
+        .filter(User.id.in_(ids))
+        .all()
+    )
+    by_id = {r.id: r for r in rows}
+    return [
+        ScoreboardRow(
+            rank=rank,
+            user_id=user_id,
+            pseudo=by_id[user_id].pseudo,
+            country=by_id[user_id].country,
+            points=by_id[user_id].points_total or 0,
+            solved_count=by_id[user_id].solved_count or 0,
+            last_solve_at=by_id[user_id].last_solve_at,
+            created_at=by_id[user_id].created_at,
+        )
+        for rank, user_id, _ in entries
+        if user_id in by_id
+    ]
+
+
+def scoreboard_page(after: str = None, limit: int = 100):
+    """
+    Une page du classement à partir d'un curseur (None = début).
+    Retourne (lignes, curseur de la page suivante ou None).
+    """
+    index = get_rank_index()
+    key = decode_cursor(after) if after else None
+    start = index.position_after(*key) if key else 0
+    entries = index.entries(start, limit)
+    next_cursor = None
+    if entries and start + len(entries) < len(index):
+        next_cursor = encode_cursor(index.key(entries[-1][1]))
+    return _hydrate(entries), next_cursor
+
+
+def scoreboard_around(user_id: int, radius: int = 5):
+    """Fenêtre du classement centrée sur un joueur ("aller à ma position")."""
+    index = get_rank_index()
+    rank = index.rank(user_id)
+    if rank is None:
+        return [], None
+    entries = index.entries(max(0, rank - 1 - radius), 2 * radius + 1)
+    next_cursor = None
+    if entries and entries[-1][0] < len(index):
+        next_cursor = encode_cursor(index.key(entries[-1][1]))
+    return _hydrate(entries), next_cursor
+
+
+def board_page(after: str = None, render=None, limit: int = SCOREBOARD_TOP_N) -> dict:
+    """
+    Page du classement rendue par render(lignes, curseur suivant), en cache
+    pour la version courante : {'version', 'html', 'next_cursor', 'count'}.
+    """
+    version = versions.current(versions.SCOREBOARD)
+
+    def build():
+        rows, next_cursor = scoreboard_page(after=after, limit=limit)
+        return {
+            "version": version,
+            "html": render(rows, next_cursor),
+            "next_cursor": next_cursor,
+            "count": len(rows),
+        }
+
+    return _pages.get((after or "", limit), version, build)
+
+
+def top_json(limit: int = SCOREBOARD_TOP_N) -> dict:
+    """Top du classement sérialisé en JSON, en cache pour la version courante."""
+    version = versions.current(versions.SCOREBOARD)
+
+    def build():
+        rows, _ = scoreboard_page(limit=limit)
+        body = {
+            "version": version,
+            "rows": [
+                {
+                    "rank": r.rank,
+                    "pseudo": r.pseudo,
+                    "country": r.country,
+                    "points": r.points,
+                    "solved_count": r.solved_count,
+                }
+                for r in rows
+            ],
+        }
+        return {"version": version, "json": json.dumps(body, separators=(",", ":")).encode("utf-8")}
+
+    return _top_json.get(limit, version, build)
+
+
+def clear_board_cache():
+    _pages.clear()
+    _top_json.clear()
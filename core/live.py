@@ -0,0 +1,308 @@
+# ------------------------------
+# CyberCampus CTF - Scoreboard en direct (Server-Sent Events)
+# ------------------------------
+#
+# /scoreboard/stream pousse chaque solve (score, rang avant/après, first
+# blood). Les événements sont diffusés entre workers par datagramme Unix
+# (LIVE_SOCKET_DIR) et gardés dans un buffer circulaire pour rejouer
+# Last-Event-ID. Le nombre de flux est plafonné par worker (LIVE_MAX_CLIENTS)
+# et le générateur ne touche jamais la base.
+
+from collections import deque, namedtuple
+from glob import glob
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from flask import current_app
+
+from core import versions
+
+
+LiveEvent = namedtuple("LiveEvent", "id kind data")
+
+_HAS_UNIX_SOCKETS = hasattr(socket, "AF_UNIX")
+
+
+def format_event(event: LiveEvent) -> str:
+    """Sérialise un événement au format text/event-stream."""
+    return f"id: {event.id}\nevent: {event.kind}\ndata: {event.data}\n\n"
+
+
+class LiveHub:
+    """Buffer circulaire des derniers événements + abonnés d'un worker."""
+
+    def __init__(self, size: int = 256):
+        self._events = deque(maxlen=size)
+        self._cond = threading.Condition()
+        self._clients = 0
+        # Plus grand id dont on ne garantit plus le rejeu (évincé ou antérieur au démarrage)
+        self.floor = None
+
+    def publish(self, event_id: int, kind: str, data: str):
+        """Ajoute un événement (rangé par id, sans doublon) et réveille les flux."""
+        event = LiveEvent(int(event_id), kind, data)
+        with self._cond:
+            if any(e.id == event.id for e in self._events):
+                return
+            if len(self._events) == self._events.maxlen:
+                evicted = self._events.popleft()
+                self.floor = max(self.floor or 0, evicted.id)
+            # Les événements des autres workers peuvent arriver dans le désordre
+            position = len(self._events)
+            while position and self._events[position - 1].id > event.id:
+                position -= 1
+            self._events.insert(position, event)
+            self._cond.notify_all()
+
+    def init_floor(self, value: int):
+        """Fixe le plancher de rejeu au démarrage du worker (une seule fois)."""
+        with self._cond:
+            if self.floor is None:
+                self.floor = value
+
+    def newest(self):
+        with self._cond:
+            return self._events[-1].id if self._events else self.floor
+
+    def since(self, last_id):
+        """Événements postérieurs à last_id ; None s'ils ne sont plus tous disponibles."""
+        with self._cond:
+            if self.floor is not None and last_id < self.floor:
+                return None
+            return [e for e in self._events if e.id > last_id]
+
+    def wait(self, last_id, timeout: float) -> list:
+        """Attend au plus timeout secondes un événement postérieur à last_id."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._events and self._events[-1].id > (last_id or 0), timeout
+            )
+            return [e for e in self._events if e.id > (last_id or 0)]
+
+    def acquire(self, limit: int) -> bool:
+        """Réserve une place de flux ; False si le worker est plein."""
+        with self._cond:
+            if self._clients >= limit:
+                return False
+            self._clients += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self._clients = max(0, self._clients - 1)
+
+    @property
+    def clients(self) -> int:
+        return self._clients
+
+    def clear(self):
+        with self._cond:
+            self._events.clear()
+            self.floor = None
+
+
+hub = LiveHub()
+
+
+# ------------------------------
+# Diffusion entre workers (datagrammes Unix)
+# ------------------------------
+class _Fanout:
+    """Un socket de réception par worker, nommé d'après son pid."""
+
+    def __init__(self):
+        self._pid = None
+        self._path = None
+        self._send_sock = None
+        self._lock = threading.Lock()
+
+    def start(self, directory: str):
+        if not _HAS_UNIX_SOCKETS or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            path = os.path.join(directory, f"worker-{self._pid}.sock")
+            try:
+                os.makedirs(directory, exist_ok=True)
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                recv_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                recv_sock.bind(path)
+                send_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                send_sock.setblocking(False)
+            except OSError as e:
+                # Sans socket, le direct reste limité aux solves de ce worker
+                print("⚠️ Scoreboard en direct : diffusion inter-workers désactivée :", e)
+                return
+            threading.Thread(target=self._listen, args=(recv_sock,),
+                             name="live-fanout", daemon=True).start()
+            self._path, self._send_sock = path, send_sock
+
+    @staticmethod
+    def _listen(sock):
+        while True:
+            try:
+                message = json.loads(sock.recv(65536))
+                hub.publish(message["id"], message["event"], message["data"])
+            except (ValueError, KeyError, TypeError):
+                continue
+            except OSError:
+                return
+
+    def send(self, event: LiveEvent, directory: str):
+        if self._send_sock is None:
+            return
+        message = json.dumps({"id": event.id, "event": event.kind, "data": event.data}).encode("utf-8")
+        for path in glob(os.path.join(directory, "worker-*.sock")):
+            if path == self._path:
+                continue
+            try:
+                self._send_sock.sendto(message, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker arrêté : socket orphelin
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError:
+                # File du destinataire pleine : événement perdu pour ce worker,
+                # ses pages en cache suivent quand même la version du scoreboard
+                pass
+
+
+_fanout = _Fanout()
+
+
+def _socket_dir() -> str:
+    return current_app.config.get(
+        "LIVE_SOCKET_DIR", os.path.join(tempfile.gettempdir(), "cybercampus-live")
+    )
+
+
+def _start():
+    """Initialise le hub du worker (plancher de rejeu + réception inter-workers)."""
+    if hub.floor is None:
+        hub.init_floor(versions.current(versions.SCOREBOARD))
+    _fanout.start(_socket_dir())
+
+
+# ------------------------------
+# Publication
+# ------------------------------
+def publish(event_id: int, kind: str, payload: dict):
+    """Publie un événement dans ce worker et chez les autres."""
+    hub.init_floor(int(event_id) - 1)
+    _start()
+    event = LiveEvent(int(event_id), kind, json.dumps(payload, separators=(",", ":")))
+    hub.publish(*event)
+    _fanout.send(event, _socket_dir())
+
+
+def publish_solve(version: int, user_id: int, pseudo: str, challenge_id: int, challenge: str,
+                  points: int, total: int, rank=None, previous_rank=None, first_blood=False):
+    """Événement "solve" : nouveau score et déplacement dans le classement."""
+    publish(version, "solve", {
+        "user_id": user_id,
+        "pseudo": pseudo,
+        "challenge_id": challenge_id,
+        "challenge": challenge,
+        "points": points,
+        "total": total,
+        "rank": rank,
+        "previous_rank": previous_rank,
+        "first_blood": first_blood,
+    })
+
+
+# ------------------------------
+# Abonnement
+# ------------------------------
+def max_clients(config) -> int:
+    """Flux ouverts max par worker, en laissant LIVE_THREAD_RESERVE threads libres."""
+    threads = config.get("WEB_THREADS", 32) - config.get("LIVE_THREAD_RESERVE", 8)
+    return max(0, min(config.get("LIVE_MAX_CLIENTS", threads), threads))
+
+
+class _Subscription:
+    """
+    Flux text/event-stream d'une place réservée. close() (appelé par le
+    serveur en fin de réponse) libère la place une seule fois, y compris
+    quand le générateur n'a jamais démarré (HEAD, client parti avant le
+    premier octet).
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._lock = threading.Lock()
+        self._open = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._stream)
+
+    def close(self):
+        self._stream.close()
+        with self._lock:
+            released, self._open = self._open, False
+        if released:
+            hub.release()
+
+
+def open_stream(last_event_id=None):
+    """
+    Réserve une place et retourne le flux text/event-stream,
+    ou None si le worker a atteint max_clients().
+    """
+    config = current_app.config
+    if not hub.acquire(max_clients(config)):
+        return None
+    try:
+        _start()
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_id = None
+    except Exception:
+        hub.release()
+        raise
+    return _Subscription(_stream(
+        last_id,
+        heartbeat=config.get("LIVE_HEARTBEAT", 15),
+        max_duration=config.get("LIVE_MAX_DURATION", 600),
+        retry_ms=config.get("LIVE_RETRY_MS", 3000),
+    ))
+
+
+def _stream(last_id, heartbeat: float, max_duration: float, retry_ms: int):
+    yield f"retry: {retry_ms}\n\n"
+    if last_id is None:
+        last_id = hub.newest() or 0
+    else:
+        missed = hub.since(last_id)
+        if missed is None:
+            last_id = hub.newest() or 0
+            yield format_event(LiveEvent(last_id, "reset", "{}"))
+        else:
+            for event in missed:
+                yield format_event(event)
+                last_id = event.id
+
+    # Le client se reconnecte avec Last-Event-ID à l'expiration
+    deadline = time.monotonic() + max_duration
+    while time.monotonic() < deadline:
+        events = hub.wait(last_id, heartbeat)
+        if not events:
+            yield ": ping\n\n"
+            continue
+        for event in events:
+            yield format_event(event)
+            last_id = event.id
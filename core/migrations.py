@@ -0,0 +1,205 @@
+# ------------------------------
+# CyberCampus CTF - Migrations du schéma
+# ------------------------------
+#
+# Migrations numérotées, appliquées dans l'ordre par `python migrate.py` et
+# enregistrées dans schema_migration (verrou consultatif sous Postgres).
+# Chaque index ou contrainte ajouté à une table existante a sa propre
+# migration. query_plans() et index_usage() servent au diagnostic.
+
+from collections import namedtuple
+from datetime import datetime
+import time
+
+from sqlalchemy import text
+
+from core import db
+
+
+Migration = namedtuple("Migration", "id description apply")
+IndexPlan = namedtuple("IndexPlan", "label plan")
+IndexUsage = namedtuple("IndexUsage", "table index scans tuples_read size_bytes")
+
+_ADVISORY_LOCK = 0x43434d47   # "CCMG"
+
+
+class SchemaMigration(db.Model):
+    __tablename__ = "schema_migration"
+
+    id          = db.Column(db.String(100), primary_key=True)
+    description = db.Column(db.String(300), nullable=True)
+    applied_at  = db.Column(db.DateTime, default=datetime.utcnow)
+    duration_ms = db.Column(db.Integer, nullable=True)
+
+
+# ── Migrations ────────────────────────────────────────────────────────
+
+def _create_indexes(*names):
+    """Crée les index déclarés sur les modèles (tous, ou ceux nommés) s'ils manquent."""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if not names or index.name in names:
+                index.create(db.engine, checkfirst=True)
+
+
+def _baseline():
+    # Tables manquantes, créées avec leurs index ; les tables existantes
+    # restent telles quelles (index ajoutés par les migrations suivantes)
+    db.create_all()
+
+
+def _backfills():
+    from core.models import Solve, ScoreEvent, GroupMembership
+    from core.security import SecurityRollup
+
+    Solve.backfill()
+    ScoreEvent.backfill()
+    GroupMembership.backfill()
+    SecurityRollup.backfill()
+
+
+def _hot_query_indexes():
+    _create_indexes(
+        "ix_security_event_ip_type_time",
+        "ix_security_event_type_time",
+        "ix_security_event_timestamp",
+        "ix_submission_user_challenge_correct",
+        "ix_submission_user_time",
+        "ix_scoreboard_points_total",
+    )
+
+
+def _scoreboard_unique_user():
+    """Une ligne de scoreboard par joueur (total recalculé), puis l'index unique."""
+    from core.models import Scoreboard, Solve
+    from core import versions
+
+    duplicated = (
+        db.session.query(Scoreboard.user_id)
+        .group_by(Scoreboard.user_id)
+        .having(db.func.count(Scoreboard.id) > 1)
+        .all()
+    )
+    for (user_id,) in duplicated:
+        keep = db.session.query(db.func.min(Scoreboard.id)).filter_by(user_id=user_id).scalar()
+        total = (
+            db.session.query(db.func.coalesce(db.func.sum(Solve.points_awarded), 0))
+            .filter(Solve.user_id == user_id)
+            .scalar()
+        )
+        Scoreboard.query.filter(Scoreboard.user_id == user_id, Scoreboard.id != keep) \
+            .delete(synchronize_session=False)
+        Scoreboard.query.filter_by(id=keep).update({Scoreboard.points_total: total},
+                                                   synchronize_session=False)
+    if duplicated:
+        versions.bump(versions.SCOREBOARD)
+    db.session.commit()
+    _create_indexes("uq_scoreboard_user_id")
+
+
+MIGRATIONS = (
+    Migration("0001_baseline", "Tables et index déclarés par les modèles", _baseline),
+    Migration("0002_backfills", "Solves, série de scores, groupes et agrégats de sécurité", _backfills),
+    Migration("0003_hot_query_indexes", "Index composites des requêtes fréquentes", _hot_query_indexes),
+    Migration("0004_scoreboard_unique_user", "Doublons du scoreboard fusionnés, index unique par joueur",
+              _scoreboard_unique_user),
+)
+
+
+# ── Exécution ─────────────────────────────────────────────────────────
+
+def applied_ids() -> set:
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    return {m for (m,) in db.session.query(SchemaMigration.id)}
+
+
+def pending() -> list:
+    done = applied_ids()
+    return [m for m in MIGRATIONS if m.id not in done]
+
+
+def migrate(log=print) -> list:
+    """Applique les migrations en attente, dans l'ordre ; retourne leurs id."""
+    postgres = db.engine.dialect.name == "postgresql"
+    lock = db.engine.connect() if postgres else None
+    if lock is not None:
+        lock.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _ADVISORY_LOCK})
+    try:
+        done = []
+        for migration in pending():
+            log(f"→ {migration.id} : {migration.description}")
+            started = time.perf_counter()
+            migration.apply()
+            db.session.add(SchemaMigration(
+                id=migration.id,
+                description=migration.description,
+                duration_ms=int((time.perf_counter() - started) * 1000),
+            ))
+            db.session.commit()
+            done.append(migration.id)
+        return done
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        if lock is not None:
+            lock.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _ADVISORY_LOCK})
+            lock.close()
+
+
+# ── Rapport d'utilisation des index ──────────────────────────────────
+
+def _hot_queries():
+    """Formes des requêtes fréquentes, avec des valeurs représentatives."""
+    from core.models import Submission, Scoreboard
+    from core.security import SecurityEvent
+
+    now = datetime.utcnow()
+    return (
+        ("Repli brute-force (IP, type, fenêtre)",
+         db.select(db.func.count()).select_from(SecurityEvent).where(
+             SecurityEvent.ip_address == "10.0.0.1",
+             SecurityEvent.event_type == SecurityEvent.LOGIN_FAIL,
+             SecurityEvent.timestamp >= now)),
+        ("IP suspectes (type, 5 min)",
+         db.select(SecurityEvent.ip_address, db.func.count()).where(
+             SecurityEvent.event_type == SecurityEvent.LOGIN_FAIL,
+             SecurityEvent.timestamp >= now).group_by(SecurityEvent.ip_address)),
+        ("Derniers événements de sécurité",
+         db.select(SecurityEvent.id).order_by(SecurityEvent.timestamp.desc()).limit(50)),
+        ("Soumissions réussies d'un joueur",
+         db.select(db.func.count()).select_from(Submission).where(
+             Submission.user_id == 1, Submission.correct.is_(True))),
+        ("Soumissions d'un joueur sur un challenge",
+         db.select(Submission.id).where(
+             Submission.user_id == 1, Submission.challenge_id == 1, Submission.correct.is_(True))),
+        ("Historique paginé",
+         db.select(Submission.id).where(Submission.user_id == 1)
+         .order_by(Submission.timestamp.desc(), Submission.id.desc()).limit(50)),
+        ("Top du classement",
+         db.select(Scoreboard.user_id).order_by(Scoreboard.points_total.desc()).limit(10)),
+    )
+
+
+def query_plans() -> list:
+    """Plan d'exécution (EXPLAIN) de chaque requête chaude."""
+    dialect = db.engine.dialect
+    prefix = "EXPLAIN QUERY PLAN " if dialect.name == "sqlite" else "EXPLAIN "
+    plans = []
+    for label, stmt in _hot_queries():
+        sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+        rows = db.session.execute(text(prefix + sql)).all()
+        plans.append(IndexPlan(label, "\n".join(str(row[-1]) for row in rows)))
+    return plans
+
+
+def index_usage() -> list:
+    """Compteurs d'utilisation des index (Postgres uniquement)."""
+    if db.engine.dialect.name != "postgresql":
+        return []
+    rows = db.session.execute(text(
+        "SELECT relname, indexrelname, idx_scan, idx_tup_read, "
+        "pg_relation_size(indexrelid) "
+        "FROM pg_stat_user_indexes ORDER BY idx_scan ASC, relname"
+    )).all()
+    return [IndexUsage(*row) for row in rows]
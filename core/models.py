@@ -4,8 +4,14 @@
 
 from datetime import datetime
 import hashlib
-from core import db, login_manager
+import hmac
+import math
+from core import db, login_manager, versions, live, progress, identity
+from core.ranking import rank_index, record_score, refresh_scores
+from core.catalog import verify_flag
+from core.flags import per_user_enabled, check_flag
 from flask_login import UserMixin
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash, check_password_hash
 
 
@@ -29,6 +35,7 @@ class User(UserMixin, db.Model):
     login_count = db.Column(db.Integer, default=0)   
 
     submissions = db.relationship("Submission", backref="user", lazy="dynamic")
+    solves = db.relationship("Solve", backref="user", lazy="dynamic")
     scoreboard = db.relationship("Scoreboard", backref="user", uselist=False)
 
     def set_password(self, password: str):
@@ -45,31 +52,36 @@ class User(UserMixin, db.Model):
     def getScore(self) -> int:
         if self.scoreboard:
             return self.scoreboard.points_total
-        total = 0
-        for s in self.submissions.filter_by(correct=True).all():
-            if s.challenge and s.challenge.points:
-                total += s.challenge.points
-        return total
+        return db.session.query(
+            db.func.coalesce(db.func.sum(Solve.points_awarded), 0)
+        ).filter(Solve.user_id == self.id).scalar()
+
+    def has_solved(self, challenge_id: int) -> bool:
+        """Indique si le challenge est résolu (lecture de la table solve uniquement)"""
+        return db.session.query(
+            self.solves.filter(Solve.challenge_id == challenge_id).exists()
+        ).scalar()
+
+    def get_solved_ids(self) -> set:
+        """Retourne les ids des challenges résolus"""
+        return {cid for (cid,) in db.session.query(Solve.challenge_id)
+                .filter(Solve.user_id == self.id)}
 
     def get_solved_challenges(self):
         """Retourne les challenges résolus (flag correct)"""
-        return Challenge.query.join(Submission).filter(
-            Submission.user_id == self.id,
-            Submission.correct == True
-        ).distinct().all()
+        return Challenge.query.join(Solve).filter(
+            Solve.user_id == self.id
+        ).order_by(Solve.solved_at).all()
 
     def get_in_progress_challenges(self):
         """Retourne les challenges en cours (tentés mais pas résolus)"""
-        # Challenges avec au moins une tentative incorrecte
-        attempted = db.session.query(Challenge).join(Submission).filter(
-            Submission.user_id == self.id
+        # Challenges avec au moins une tentative, sans solve
+        return Challenge.query.join(Submission).filter(
+            Submission.user_id == self.id,
+            ~Challenge.id.in_(
+                db.session.query(Solve.challenge_id).filter(Solve.user_id == self.id)
+            )
         ).distinct().all()
-        
-        # Enlève ceux qui sont déjà résolus
-        solved_ids = [c.id for c in self.get_solved_challenges()]
-        in_progress = [c for c in attempted if c.id not in solved_ids]
-        
-        return in_progress
 
     def get_not_started_challenges(self):
         """Retourne les challenges non commencés"""
@@ -98,7 +110,11 @@ class Challenge(db.Model):
     actif = db.Column(db.Boolean, default=True)
 
     submissions = db.relationship('Submission', backref='challenge', lazy=True, cascade='all, delete-orphan')
+    solves = db.relationship('Solve', backref='challenge', lazy='dynamic', cascade='all, delete-orphan')
+    score_events = db.relationship('ScoreEvent', lazy='dynamic', cascade='all, delete-orphan')
+    hint_reveals = db.relationship('HintReveal', lazy='dynamic', cascade='all, delete-orphan')
     flag = db.relationship("Flag", backref="challenge", uselist=False, cascade="all, delete-orphan")
+    scoring = db.relationship("ChallengeScoring", uselist=False, cascade="all, delete-orphan")
 
     def activer(self):
         self.actif = True
@@ -109,6 +125,71 @@ class Challenge(db.Model):
         db.session.commit()
 
 
+class ChallengeScoring(db.Model):
+    """
+    Score dynamique d'un challenge (façon CTFd) : la valeur décroît avec le
+    nombre de solves, de `initial` jusqu'à `minimum` atteint au `decay`-ième.
+    Challenge.points contient toujours la valeur courante.
+    """
+    __tablename__ = "challenge_scoring"
+
+    challenge_id = db.Column(db.Integer, db.ForeignKey("challenge.id"), primary_key=True)
+    initial = db.Column(db.Integer, nullable=False)
+    minimum = db.Column(db.Integer, nullable=False)
+    decay = db.Column(db.Integer, nullable=False)
+
+    def valeur(self, solve_count: int) -> int:
+        """Valeur du challenge pour solve_count solves (le premier solveur touche `initial`)."""
+        if self.decay <= 0:
+            return self.minimum
+        n = max(0, solve_count - 1)
+        value = (self.minimum - self.initial) / (self.decay ** 2) * n ** 2 + self.initial
+        return max(self.minimum, math.ceil(value))
+
+    def recalculer(self, challenge: "Challenge", now: datetime = None) -> list:
+        """
+        Applique la valeur courante aux seuls solveurs de ce challenge, sans
+        commit : delta sur leur scoreboard, point ajouté à leur série de score
+        puis mise à jour de leurs solves (pénalité d'indices conservée).
+        Retourne les user_id dont le score a changé.
+        """
+        now = now or datetime.utcnow()
+        value = self.valeur(challenge.solves.count())
+        challenge.points = value
+
+        expected = value - (value * db.func.coalesce(Solve.hint_penalty, 0)) // 100
+        stale = db.and_(
+            Solve.challenge_id == challenge.id,
+            db.func.coalesce(Solve.points_awarded, 0) != expected,
+        )
+        user_ids = [uid for (uid,) in db.session.query(Solve.user_id).filter(stale)]
+        if not user_ids:
+            return []
+
+        delta = expected - db.func.coalesce(Solve.points_awarded, 0)
+        db.session.query(Scoreboard).filter(Scoreboard.user_id.in_(user_ids)).update(
+            {Scoreboard.points_total: db.func.coalesce(Scoreboard.points_total, 0) + (
+                db.select(delta)
+                .where(Solve.challenge_id == challenge.id, Solve.user_id == Scoreboard.user_id)
+                .scalar_subquery()
+            )},
+            synchronize_session=False,
+        )
+        db.session.execute(
+            db.insert(ScoreEvent).from_select(
+                ["user_id", "challenge_id", "points", "total_after", "created_at"],
+                db.select(Solve.user_id, Solve.challenge_id, delta,
+                          Scoreboard.points_total, db.literal(now))
+                .join(Scoreboard, Scoreboard.user_id == Solve.user_id)
+                .where(stale),
+            )
+        )
+        db.session.query(Solve).filter(stale).update(
+            {Solve.points_awarded: expected}, synchronize_session=False,
+        )
+        return user_ids
+
+
 class Flag(db.Model):
     __tablename__ = "flag"
 
@@ -124,11 +205,17 @@ class Flag(db.Model):
         self.flag_hash = self._hash(flag_plain)
 
     def verifierFlag(self, flag_soumis: str) -> bool:
-        return self.flag_hash == self._hash(flag_soumis)
+        return hmac.compare_digest(self.flag_hash, self._hash(flag_soumis))
 
 
 class Submission(db.Model):
     __tablename__ = "submission"
+    __table_args__ = (
+        # Historique paginé par clé (core.history)
+        db.Index("ix_submission_user_time", "user_id", "timestamp", "id"),
+        # Soumissions d'un joueur par challenge / réussies (admin, statistiques)
+        db.Index("ix_submission_user_challenge_correct", "user_id", "challenge_id", "correct"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
@@ -140,60 +227,292 @@ class Submission(db.Model):
     ip_address = db.Column(db.String(45), nullable=True)
 
     def verifier(self) -> bool:
-        # Charge explicitement le challenge depuis la base
-        challenge = Challenge.query.get(self.challenge_id)
-        
-        if not challenge or not challenge.flag:
-            return False
-        
-        return challenge.flag.verifierFlag(self.flag_soumis)
+        # Flag dérivé du joueur : HMAC recalculé ; sinon hash du catalogue en mémoire
+        self.flag_owner_id = None
+        if per_user_enabled(self.challenge_id):
+            check = check_flag(self.challenge_id, self.user_id, self.flag_soumis)
+            self.flag_owner_id = check.owner_id
+            return check.valid
+        return verify_flag(self.challenge_id, self.flag_soumis)
 
-    def enregistrer(self) -> bool:
+    @property
+    def flag_partage(self) -> bool:
+        """Flag valide d'un autre joueur (après verifier())."""
+        owner = getattr(self, "flag_owner_id", None)
+        return owner is not None and owner != self.user_id
+
+    def enregistrer(self, penalty_percent: int = 0) -> bool:
+        """
+        Enregistre la soumission et attribue les points d'un premier solve,
+        en une seule transaction : insertion de la soumission, création du
+        Solve unique (user, challenge) et incrément atomique du scoreboard.
+        Deux soumissions concurrentes ne peuvent pas créditer deux fois :
+        la contrainte unique du Solve départage les workers.
+        """
         self.correct = self.verifier()
+        self.points_obtenus = 0
+        self.premier_solve = False
+        self.score_total = None
+        scoring = None
+        if self.timestamp is None:
+            self.timestamp = datetime.utcnow()
         db.session.add(self)
-        db.session.commit()
 
         if self.correct:
-            sb = Scoreboard.query.filter_by(user_id=self.user_id).first()
-            if not sb:
-                sb = Scoreboard(user_id=self.user_id, points_total=0)
-                db.session.add(sb)
-                db.session.commit()
-
-            already = Submission.query.filter_by(
-                user_id=self.user_id, challenge_id=self.challenge_id, correct=True
-            ).count()
-
-            if already <= 1:
-                challenge = Challenge.query.get(self.challenge_id)
-                if challenge:
-                    sb.points_total = (sb.points_total or 0) + (challenge.points or 0)
-                    db.session.commit()
+            challenge = db.session.get(Challenge, self.challenge_id)
+            scoring = challenge.scoring
+            if scoring:
+                # Sérialise les solves de ce challenge le temps de la transaction
+                db.session.refresh(challenge, with_for_update=True)
+                base_points = scoring.valeur(challenge.solves.count() + 1)
+            else:
+                base_points = challenge.points or 0
+            points = base_points - int(base_points * penalty_percent / 100)
+            try:
+                with db.session.begin_nested():
+                    db.session.add(Solve(
+                        user_id=self.user_id,
+                        challenge_id=self.challenge_id,
+                        submission=self,
+                        points_awarded=points,
+                        hint_penalty=penalty_percent,
+                        solved_at=self.timestamp,
+                    ))
+                self.premier_solve = True
+            except IntegrityError:
+                pass  # Déjà résolu (éventuellement par un autre worker)
+
+            if self.premier_solve:
+                self.points_obtenus = points
+                self.score_total = Scoreboard.ajouterPoints(self.user_id, points)
+                GroupScore.ajouterSolve(self.user_id, points, self.score_total)
+                db.session.add(ScoreEvent(
+                    user_id=self.user_id,
+                    challenge_id=self.challenge_id,
+                    points=points,
+                    total_after=self.score_total,
+                    created_at=self.timestamp,
+                ))
+
+        rescored = []
+        version = None
+        if self.premier_solve:
+            if scoring:
+                rescored = scoring.recalculer(challenge, self.timestamp)
+                if rescored:
+                    GroupScore.recalculer(GroupMembership.groupes_de(rescored))
+                versions.bump(versions.CATALOG)  # nouvelle valeur du challenge
+            version = versions.bump(versions.SCOREBOARD)
+            # Lu avant le commit (qui expire les objets) pour l'événement en direct
+            first_blood = Solve.query.filter_by(challenge_id=self.challenge_id).limit(2).count() == 1
+            pseudo = db.session.get(User, self.user_id).pseudo
+            titre = challenge.titre
+
+        db.session.commit()
+        progress.invalidate(self.user_id)
+
+        if self.premier_solve:
+            previous_rank = rank_index.rank(self.user_id)
+            record_score(self.user_id, self.score_total, self.timestamp, version)
+        if rescored:
+            refresh_scores(rescored, version)
+            # Les scores des autres solveurs ont changé : les clients rechargent
+            live.publish(version, "reset", {})
+        elif self.premier_solve:
+            live.publish_solve(
+                version, self.user_id, pseudo, self.challenge_id, titre,
+                points=self.points_obtenus, total=self.score_total,
+                rank=rank_index.rank(self.user_id), previous_rank=previous_rank,
+                first_blood=first_blood,
+            )
 
         return self.correct
 
 
+class Solve(db.Model):
+    """Un challenge résolu : une seule ligne par (utilisateur, challenge)."""
+    __tablename__ = "solve"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "challenge_id", name="uq_solve_user_challenge"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    challenge_id = db.Column(db.Integer, db.ForeignKey("challenge.id"), nullable=False, index=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey("submission.id"), nullable=True)
+    points_awarded = db.Column(db.Integer, default=0)
+    hint_penalty = db.Column(db.Integer, default=0)  # en %
+    solved_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    submission = db.relationship("Submission")
+
+    @staticmethod
+    def backfill() -> int:
+        """Crée les Solve manquants à partir des soumissions correctes existantes."""
+        first_correct = (
+            db.session.query(db.func.min(Submission.id))
+            .filter(Submission.correct == True)
+            .group_by(Submission.user_id, Submission.challenge_id)
+        )
+        missing = (
+            db.session.query(Submission, Challenge.points)
+            .join(Challenge, Challenge.id == Submission.challenge_id)
+            .outerjoin(Solve, db.and_(Solve.user_id == Submission.user_id,
+                                      Solve.challenge_id == Submission.challenge_id))
+            .filter(Submission.id.in_(first_correct), Solve.id.is_(None))
+            .all()
+        )
+        for sub, base_points in missing:
+            base_points = base_points or 0
+            # Les anciennes soumissions n'enregistraient les points que si une pénalité s'appliquait
+            points = sub.points_obtenus if sub.points_obtenus else base_points
+            penalty = round(100 - points * 100 / base_points) if base_points else 0
+            db.session.add(Solve(
+                user_id=sub.user_id,
+                challenge_id=sub.challenge_id,
+                submission_id=sub.id,
+                points_awarded=points,
+                hint_penalty=max(0, penalty),
+                solved_at=sub.timestamp,
+            ))
+        db.session.commit()
+        return len(missing)
+
+
+class HintReveal(db.Model):
+    """Indice révélé par un joueur : une ligne par (utilisateur, challenge, indice)."""
+    __tablename__ = "hint_reveal"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "challenge_id", "hint_index", name="uq_hint_reveal"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    challenge_id = db.Column(db.Integer, db.ForeignKey("challenge.id"), nullable=False)
+    hint_index = db.Column(db.Integer, nullable=False)
+    penalty_percent = db.Column(db.Integer, nullable=False, default=0)  # pénalité au moment de la révélation
+    revealed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def reveler(user_id: int, challenge_id: int, hint_index: int, penalty_percent: int) -> bool:
+        """Enregistre la révélation (sans commit) ; False si l'indice l'était déjà."""
+        try:
+            with db.session.begin_nested():
+                db.session.add(HintReveal(
+                    user_id=user_id,
+                    challenge_id=challenge_id,
+                    hint_index=hint_index,
+                    penalty_percent=penalty_percent,
+                ))
+            return True
+        except IntegrityError:
+            return False
+
+    @staticmethod
+    def indices(user_id: int, challenge_id: int) -> list:
+        """Indices révélés, dans l'ordre."""
+        return [idx for (idx,) in db.session.query(HintReveal.hint_index)
+                .filter_by(user_id=user_id, challenge_id=challenge_id)
+                .order_by(HintReveal.hint_index)]
+
+    @staticmethod
+    def penalite(user_id: int, challenge_id: int) -> int:
+        """Pénalité totale en % (un seul SUM)."""
+        return db.session.query(db.func.coalesce(db.func.sum(HintReveal.penalty_percent), 0)) \
+            .filter_by(user_id=user_id, challenge_id=challenge_id).scalar()
+
+
+class ScoreEvent(db.Model):
+    """Série des scores d'un joueur : une ligne ajoutée à chaque solve (graphes)."""
+    __tablename__ = "score_event"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    challenge_id = db.Column(db.Integer, db.ForeignKey("challenge.id"), nullable=True)
+    points = db.Column(db.Integer, default=0)       # points gagnés par cet événement
+    total_after = db.Column(db.Integer, default=0)  # score du joueur après l'événement
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def backfill() -> int:
+        """Reconstruit la série depuis les solves si la table est vide."""
+        if ScoreEvent.query.first() is not None:
+            return 0
+        totals = {}
+        created = 0
+        for solve in Solve.query.order_by(Solve.solved_at, Solve.id).yield_per(1000):
+            totals[solve.user_id] = totals.get(solve.user_id, 0) + (solve.points_awarded or 0)
+            db.session.add(ScoreEvent(
+                user_id=solve.user_id,
+                challenge_id=solve.challenge_id,
+                points=solve.points_awarded or 0,
+                total_after=totals[solve.user_id],
+                created_at=solve.solved_at,
+            ))
+            created += 1
+        db.session.commit()
+        return created
+
+
 class Scoreboard(db.Model):
     __tablename__ = "scoreboard"
+    __table_args__ = (
+        # Classement et top N (ORDER BY points_total DESC LIMIT n)
+        db.Index("ix_scoreboard_points_total", "points_total"),
+        # Une ligne par joueur (repli d'ajouterPoints sur conflit d'insertion)
+        db.Index("uq_scoreboard_user_id", "user_id", unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     points_total = db.Column(db.Integer, default=0)
 
+    @staticmethod
+    def ajouterPoints(user_id: int, points: int) -> int:
+        """
+        Incrément atomique (UPDATE points_total = points_total + n) sans commit ;
+        crée la ligne si besoin. Retourne le nouveau total vu par la transaction.
+        """
+        updated = Scoreboard.query.filter_by(user_id=user_id).update(
+            {Scoreboard.points_total: db.func.coalesce(Scoreboard.points_total, 0) + points},
+            synchronize_session=False,
+        )
+        if not updated:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(Scoreboard(user_id=user_id, points_total=points))
+                return points
+            except IntegrityError:
+                # Créée entre-temps par un autre worker
+                Scoreboard.query.filter_by(user_id=user_id).update(
+                    {Scoreboard.points_total: db.func.coalesce(Scoreboard.points_total, 0) + points},
+                    synchronize_session=False,
+                )
+        # Première ligne du joueur : une base non migrée peut encore avoir des
+        # doublons (migration 0004_scoreboard_unique_user)
+        return (
+            db.session.query(Scoreboard.points_total)
+            .filter_by(user_id=user_id)
+            .order_by(Scoreboard.id)
+            .limit(1)
+            .scalar()
+        )
+
     @staticmethod
     def calculerScore(user_id: int) -> int:
-        total = 0
-        subs = Submission.query.filter_by(user_id=user_id, correct=True).all()
-        for s in subs:
-            if s.challenge and s.challenge.points:
-                total += s.challenge.points
+        total, last_solve = db.session.query(
+            db.func.coalesce(db.func.sum(Solve.points_awarded), 0),
+            db.func.max(Solve.solved_at),
+        ).filter(Solve.user_id == user_id).one()
         sb = Scoreboard.query.filter_by(user_id=user_id).first()
         if not sb:
             sb = Scoreboard(user_id=user_id, points_total=total)
             db.session.add(sb)
         else:
             sb.points_total = total
+        version = versions.bump(versions.SCOREBOARD)
         db.session.commit()
+        record_score(user_id, total, last_solve, version)
         return total
 
     @staticmethod
@@ -202,6 +521,255 @@ class Scoreboard(db.Model):
             .order_by(Scoreboard.points_total.desc()).limit(limit).all()
 
 
+class UserGroup(db.Model):
+    """Groupe de joueurs pour les classements collectifs : pays, école ou équipe."""
+    __tablename__ = "user_group"
+    __table_args__ = (
+        db.UniqueConstraint("kind", "name", name="uq_user_group_kind_name"),
+    )
+
+    KINDS = ("country", "school", "team")
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    score = db.relationship("GroupScore", uselist=False, cascade="all, delete-orphan")
+    memberships = db.relationship("GroupMembership", backref="group", lazy="dynamic",
+                                  cascade="all, delete-orphan")
+
+    @staticmethod
+    def obtenir(kind: str, name: str) -> "UserGroup":
+        """Retourne le groupe (kind, name), créé avec ses agrégats à zéro si besoin."""
+        group = UserGroup.query.filter_by(kind=kind, name=name).first()
+        if group is not None:
+            return group
+        try:
+            with db.session.begin_nested():
+                group = UserGroup(kind=kind, name=name)
+                group.score = GroupScore(points_total=0, solve_count=0, member_count=0)
+                db.session.add(group)
+            return group
+        except IntegrityError:
+            # Créé entre-temps par un autre worker
+            return UserGroup.query.filter_by(kind=kind, name=name).one()
+
+
+class GroupMembership(db.Model):
+    """Appartenance d'un joueur à un groupe (un seul groupe par type)."""
+    __tablename__ = "group_membership"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "kind", name="uq_group_membership_user_kind"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    group_id = db.Column(db.Integer, db.ForeignKey("user_group.id"), nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)
+
+    @staticmethod
+    def definir(user_id: int, kind: str, name) -> bool:
+        """
+        Place le joueur dans le groupe (kind, name), ou le retire du groupe de
+        ce type si name est vide. Met à jour les agrégats et la version du
+        scoreboard, sans commit. Retourne False si rien ne change.
+        """
+        name = (name or "").strip()[:100] or None
+        current = GroupMembership.query.filter_by(user_id=user_id, kind=kind).first()
+        if current is not None and name is not None and current.group.name == name:
+            return False
+        if current is None and name is None:
+            return False
+
+        if current is not None:
+            old_group_id = current.group_id
+            db.session.delete(current)
+            db.session.flush()
+            # Le meilleur membre peut changer : recalcul du seul groupe quitté
+            GroupScore.recalculer([old_group_id])
+        if name is not None:
+            group = UserGroup.obtenir(kind, name)
+            db.session.add(GroupMembership(user_id=user_id, group_id=group.id, kind=kind))
+            db.session.flush()
+            GroupScore.ajouterMembre(group.id, user_id)
+        versions.bump(versions.SCOREBOARD)
+        return True
+
+    @staticmethod
+    def backfill() -> int:
+        """Crée les appartenances "country" manquantes à partir de User.country."""
+        missing = (
+            db.session.query(User.id, User.country)
+            .outerjoin(GroupMembership, db.and_(GroupMembership.user_id == User.id,
+                                                GroupMembership.kind == "country"))
+            .filter(User.country.isnot(None), User.country != "", GroupMembership.id.is_(None))
+            .all()
+        )
+        touched = set()
+        for user_id, country in missing:
+            group = UserGroup.obtenir("country", country)
+            db.session.add(GroupMembership(user_id=user_id, group_id=group.id, kind="country"))
+            touched.add(group.id)
+        if touched:
+            db.session.flush()
+            GroupScore.recalculer(touched)
+        db.session.commit()
+        return len(missing)
+
+    @staticmethod
+    def groupes_de(user_ids) -> list:
+        """Identifiants des groupes auxquels appartiennent ces joueurs."""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+        return [gid for (gid,) in db.session.query(GroupMembership.group_id)
+                .filter(GroupMembership.user_id.in_(user_ids)).distinct()]
+
+
+class GroupScore(db.Model):
+    """
+    Agrégats matérialisés d'un groupe (somme des points, solves, meilleur
+    membre), tenus à jour à chaque solve et changement d'appartenance.
+    """
+    __tablename__ = "group_score"
+
+    group_id = db.Column(db.Integer, db.ForeignKey("user_group.id"), primary_key=True)
+    points_total = db.Column(db.Integer, nullable=False, default=0)
+    solve_count = db.Column(db.Integer, nullable=False, default=0)
+    member_count = db.Column(db.Integer, nullable=False, default=0)
+    top_user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+    top_points = db.Column(db.Integer, nullable=True)
+
+    top_user = db.relationship("User")
+
+    @staticmethod
+    def ajouterSolve(user_id: int, points: int, total: int):
+        """Répercute un solve sur les groupes du joueur (deux UPDATE, sans commit)."""
+        groups = db.select(GroupMembership.group_id).where(GroupMembership.user_id == user_id)
+        GroupScore.query.filter(GroupScore.group_id.in_(groups)).update(
+            {
+                GroupScore.points_total: GroupScore.points_total + points,
+                GroupScore.solve_count: GroupScore.solve_count + 1,
+            },
+            synchronize_session=False,
+        )
+        GroupScore.query.filter(
+            GroupScore.group_id.in_(groups),
+            db.or_(GroupScore.top_points.is_(None), GroupScore.top_points < total,
+                   GroupScore.top_user_id == user_id),
+        ).update(
+            {GroupScore.top_user_id: user_id, GroupScore.top_points: total},
+            synchronize_session=False,
+        )
+
+    @staticmethod
+    def ajouterMembre(group_id: int, user_id: int):
+        """Ajoute le score et les solves d'un nouveau membre aux agrégats (sans commit)."""
+        total = db.session.query(Scoreboard.points_total).filter_by(user_id=user_id).scalar() or 0
+        solved = db.session.query(db.func.count(Solve.id)).filter_by(user_id=user_id).scalar()
+        GroupScore.query.filter_by(group_id=group_id).update(
+            {
+                GroupScore.member_count: GroupScore.member_count + 1,
+                GroupScore.points_total: GroupScore.points_total + total,
+                GroupScore.solve_count: GroupScore.solve_count + solved,
+            },
+            synchronize_session=False,
+        )
+        if db.session.query(Scoreboard.id).filter_by(user_id=user_id).first() is None:
+            return
+        GroupScore.query.filter(
+            GroupScore.group_id == group_id,
+            db.or_(GroupScore.top_points.is_(None), GroupScore.top_points < total),
+        ).update(
+            {GroupScore.top_user_id: user_id, GroupScore.top_points: total},
+            synchronize_session=False,
+        )
+
+    @staticmethod
+    def recalculer(group_ids=None) -> int:
+        """
+        Recalcule les agrégats de quelques groupes (ou de tous) en trois
+        requêtes groupées. Sans commit ; retourne le nombre de groupes.
+        """
+        membres = db.session.query(
+            GroupMembership.group_id,
+            db.func.count(GroupMembership.user_id),
+            db.func.coalesce(db.func.sum(Scoreboard.points_total), 0),
+        ).outerjoin(Scoreboard, Scoreboard.user_id == GroupMembership.user_id)
+        solves = db.session.query(
+            GroupMembership.group_id, db.func.count(Solve.id),
+        ).join(Solve, Solve.user_id == GroupMembership.user_id)
+        classement = db.session.query(
+            GroupMembership.group_id.label("group_id"),
+            Scoreboard.user_id.label("user_id"),
+            Scoreboard.points_total.label("points"),
+            db.func.row_number().over(
+                partition_by=GroupMembership.group_id,
+                order_by=(Scoreboard.points_total.desc(), Scoreboard.user_id),
+            ).label("position"),
+        ).join(Scoreboard, Scoreboard.user_id == GroupMembership.user_id)
+        groups = UserGroup.query
+        if group_ids is not None:
+            group_ids = list(group_ids)
+            membres = membres.filter(GroupMembership.group_id.in_(group_ids))
+            solves = solves.filter(GroupMembership.group_id.in_(group_ids))
+            classement = classement.filter(GroupMembership.group_id.in_(group_ids))
+            groups = groups.filter(UserGroup.id.in_(group_ids))
+
+        stats = {gid: (count, pts) for gid, count, pts in membres.group_by(GroupMembership.group_id)}
+        solve_counts = dict(solves.group_by(GroupMembership.group_id).all())
+        classement = classement.subquery()
+        tops = {
+            gid: (uid, pts)
+            for gid, uid, pts in db.session.query(
+                classement.c.group_id, classement.c.user_id, classement.c.points,
+            ).filter(classement.c.position == 1)
+        }
+
+        existing = GroupScore.query
+        if group_ids is not None:
+            existing = existing.filter(GroupScore.group_id.in_(group_ids))
+        existing = {gs.group_id: gs for gs in existing}
+        ids = [gid for (gid,) in groups.with_entities(UserGroup.id)]
+        for gid in ids:
+            gs = existing.get(gid) or GroupScore(group_id=gid)
+            gs.member_count, gs.points_total = stats.get(gid, (0, 0))
+            gs.solve_count = solve_counts.get(gid, 0)
+            gs.top_user_id, gs.top_points = tops.get(gid, (None, None))
+            db.session.add(gs)
+        return len(ids)
+
+
+class VersionCounter(db.Model):
+    """Compteur monotone par nom (ex. "scoreboard"), incrémenté dans la transaction qui modifie les données."""
+    __tablename__ = "version_counter"
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    @staticmethod
+    def incrementer(name: str) -> int:
+        """Incrément atomique sans commit ; retourne la nouvelle valeur vue par la transaction."""
+        updated = VersionCounter.query.filter_by(name=name).update(
+            {VersionCounter.value: VersionCounter.value + 1},
+            synchronize_session=False,
+        )
+        if not updated:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(VersionCounter(name=name, value=1))
+                return 1
+            except IntegrityError:
+                # Créé entre-temps par un autre worker
+                return VersionCounter.incrementer(name)
+        return VersionCounter.lire(name)
+
+    @staticmethod
+    def lire(name: str) -> int:
+        return db.session.query(VersionCounter.value).filter_by(name=name).scalar() or 0
+
+
 class RssFeed(db.Model):
     __tablename__ = "rssfeed"
  
@@ -239,6 +807,7 @@ class EmailVerification(db.Model):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Instantané en cache (core.identity), entité User chargée à la demande
+    return identity.load_user(int(user_id))
 
 from core.security import SecurityEvent
@@ -0,0 +1,163 @@
+# ------------------------------
+# CyberCampus CTF - Progression d'un joueur (dashboard)
+# ------------------------------
+#
+# Progression du dashboard (tentatives, dernière activité, soumissions
+# récentes) construite en une requête sur les soumissions du joueur. Le
+# résultat est gardé par worker jusqu'à la prochaine soumission du joueur
+# (invalidate, mark_submitted) ou PROGRESS_CACHE_TTL secondes.
+
+from collections import namedtuple
+import threading
+import time
+
+from flask import current_app, g, has_request_context, session
+
+from core import db, versions
+
+
+RECENT_LIMIT = 5
+
+SOLVED = "solved"
+ATTEMPTED = "attempted"
+UNTOUCHED = "untouched"
+
+ChallengeProgress = namedtuple(
+    "ChallengeProgress",
+    "id titre description points status attempts last_activity",
+)
+Activity = namedtuple("Activity", "challenge_id titre correct points_obtenus timestamp")
+
+
+class UserProgress:
+    """Progression d'un joueur : statut par challenge et activité récente."""
+
+    __slots__ = ("user_id", "challenges", "solved_count", "total_challenges", "in_progress", "recent")
+
+    def __init__(self, user_id: int, challenges, solved_count: int, total_challenges: int, recent):
+        self.user_id = user_id
+        self.challenges = challenges
+        self.solved_count = solved_count
+        self.total_challenges = total_challenges
+        self.in_progress = tuple(
+            sorted((c for c in challenges if c.status == ATTEMPTED),
+                   key=lambda c: c.last_activity, reverse=True)
+        )
+        self.recent = recent
+
+    @property
+    def percent(self) -> float:
+        if not self.total_challenges:
+            return 0
+        return self.solved_count / self.total_challenges * 100
+
+    @property
+    def solved_ids(self) -> frozenset:
+        return frozenset(c.id for c in self.challenges if c.status == SOLVED)
+
+    def get(self, challenge_id):
+        for c in self.challenges:
+            if c.id == challenge_id:
+                return c
+        return None
+
+
+_cache = versions.VersionedCache(max_entries=1024)
+_stamps = {}   # user_id -> compteur local de soumissions
+_stamps_lock = threading.Lock()
+
+
+def _build(user_id: int) -> UserProgress:
+    """Une requête : agrégats par challenge et soumissions récentes."""
+    from core.catalog import get_catalog
+    from core.models import Submission, Solve
+
+    ranked = (
+        db.session.query(
+            Submission.challenge_id.label("challenge_id"),
+            Submission.correct.label("correct"),
+            Submission.points_obtenus.label("points_obtenus"),
+            Submission.timestamp.label("timestamp"),
+            db.func.row_number().over(
+                order_by=(Submission.timestamp.desc(), Submission.id.desc())
+            ).label("rang"),
+            db.func.row_number().over(
+                partition_by=Submission.challenge_id,
+                order_by=(Submission.timestamp.desc(), Submission.id.desc()),
+            ).label("rang_challenge"),
+            db.func.count().over(partition_by=Submission.challenge_id).label("tentatives"),
+        )
+        .filter(Submission.user_id == user_id)
+        .subquery()
+    )
+    rows = (
+        db.session.query(ranked, Solve.challenge_id.isnot(None))
+        .outerjoin(Solve, db.and_(Solve.user_id == user_id,
+                                  Solve.challenge_id == ranked.c.challenge_id))
+        .filter(db.or_(ranked.c.rang <= RECENT_LIMIT, ranked.c.rang_challenge == 1))
+        .order_by(ranked.c.rang)
+        .all()
+    )
+
+    catalog = get_catalog()
+    stats = {}
+    recent = []
+    for challenge_id, correct, points, timestamp, rang, rang_challenge, tentatives, resolu in rows:
+        entry = catalog.get(challenge_id)
+        if entry is None:
+            continue
+        if rang_challenge == 1:
+            stats[challenge_id] = (tentatives, timestamp, resolu)
+        if rang <= RECENT_LIMIT:
+            recent.append(Activity(challenge_id, entry.titre, bool(correct), points, timestamp))
+
+    challenges = []
+    for entry in catalog.entries.values():
+        tentatives, last_activity, resolu = stats.get(entry.id, (0, None, False))
+        if not entry.actif and not tentatives:
+            continue
+        status = SOLVED if resolu else ATTEMPTED if tentatives else UNTOUCHED
+        challenges.append(ChallengeProgress(
+            entry.id, entry.titre, entry.description, entry.points, status, tentatives, last_activity,
+        ))
+    solved_count = sum(1 for c in challenges if c.status == SOLVED)
+    return UserProgress(user_id, tuple(challenges), solved_count, len(catalog.actifs), tuple(recent))
+
+
+def progress_version(user_id: int):
+    """Version de la progression du joueur dans ce worker (clé des caches)."""
+    ttl = current_app.config.get("PROGRESS_CACHE_TTL", 300)
+    stamp = session.get("progress_stamp") if has_request_context() else None
+    return (
+        versions.current(versions.CATALOG),
+        _stamps.get(user_id, 0),
+        stamp,
+        int(time.monotonic() // ttl) if ttl else 0,
+    )
+
+
+def get_progress(user_id: int) -> UserProgress:
+    """Progression du joueur, mémorisée pour la requête et mise en cache."""
+    memo = g.setdefault("user_progress", {}) if has_request_context() else {}
+    if user_id not in memo:
+        memo[user_id] = _cache.get(user_id, progress_version(user_id), lambda: _build(user_id))
+    return memo[user_id]
+
+
+def invalidate(user_id: int):
+    """Le joueur a soumis un flag : sa progression est reconstruite."""
+    with _stamps_lock:
+        _stamps[user_id] = _stamps.get(user_id, 0) + 1
+    if has_request_context():
+        g.pop("user_progress", None)
+
+
+def mark_submitted():
+    """Tampon de session, pour que les autres workers reconstruisent aussi."""
+    session["progress_stamp"] = time.time_ns()
+
+
+def clear_progress():
+    _cache.clear()
+    with _stamps_lock:
+        _stamps.clear()
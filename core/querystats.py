@@ -0,0 +1,194 @@
+# ------------------------------
+# CyberCampus CTF - Instrumentation des requêtes SQL
+# ------------------------------
+#
+# Compte, pour chaque requête HTTP, les requêtes SQL, le temps passé en base
+# et les formes de requêtes (SQL normalisé), attribuées au template en cours.
+# Une forme répétée QUERY_N1_THRESHOLD fois est signalée comme N+1 probable ;
+# les pires cas par endpoint sont affichés dans /admin/queries.
+
+import re
+import threading
+import time
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+HEADER = "X-Query-Stats"
+MAX_SHAPES_PER_ENDPOINT = 20
+
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|:\w+)\s*\)")
+_PARAM = re.compile(r"%\(\w+\)s|:\w+\b|\?")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """SQL normalisé : deux requêtes de même forme ne diffèrent que par leurs valeurs."""
+    shape = _IN_LIST.sub("(?)", statement)
+    shape = _PARAM.sub("?", shape)
+    shape = _LITERAL.sub("?", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+class RequestStats:
+    """Requêtes SQL d'une requête HTTP."""
+
+    __slots__ = ("count", "duration", "shapes", "templates", "_rendering")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = {}      # forme -> [nombre, durée]
+        self.templates = {}   # template -> nombre de requêtes
+        self._rendering = []
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        entry = self.shapes.setdefault(statement_shape(statement), [0, 0.0])
+        entry[0] += 1
+        entry[1] += duration
+        if self._rendering:
+            name = self._rendering[-1]
+            self.templates[name] = self.templates.get(name, 0) + 1
+
+    def suspects(self, threshold: int) -> list:
+        """Formes répétées au moins threshold fois : [(forme, nombre, durée)]."""
+        return sorted(
+            ((shape, n, t) for shape, (n, t) in self.shapes.items() if n >= threshold),
+            key=lambda s: s[1], reverse=True,
+        )
+
+    def header(self, threshold: int) -> str:
+        return f"count={self.count}; time={self.duration * 1000:.1f}ms; n+1={len(self.suspects(threshold))}"
+
+
+class EndpointStats:
+    """Agrégat par endpoint (worker courant)."""
+
+    __slots__ = ("endpoint", "requests", "queries", "max_queries", "duration", "n1_requests", "shapes",
+                 "templates")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.duration = 0.0
+        self.n1_requests = 0
+        self.shapes = {}      # forme -> plus grand nombre de répétitions observé
+        self.templates = {}   # template -> plus grand nombre de requêtes observé
+
+    @property
+    def avg_queries(self) -> float:
+        return self.queries / self.requests if self.requests else 0
+
+    @property
+    def avg_ms(self) -> float:
+        return self.duration * 1000 / self.requests if self.requests else 0
+
+    def worst_shapes(self, limit: int = 5) -> list:
+        return sorted(self.shapes.items(), key=lambda s: s[1], reverse=True)[:limit]
+
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def _current():
+    if not has_request_context():
+        return None
+    return g.get("query_stats")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Début porté par le contexte d'exécution : une requête en erreur (pas
+    # d'after_cursor_execute) ne laisse rien sur la connexion du pool
+    if context is not None:
+        context._qs_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_qs_start", None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    stats = _current()
+    if stats is not None:
+        stats.record(statement, duration)
+
+
+def _template_started(app, template, context, **extra):
+    stats = _current()
+    if stats is not None:
+        stats._rendering.append(template.name or "?")
+
+
+def _template_done(app, template, context, **extra):
+    stats = _current()
+    if stats is not None and stats._rendering:
+        stats._rendering.pop()
+
+
+def _aggregate(endpoint: str, stats: RequestStats, threshold: int):
+    suspects = stats.suspects(threshold)
+    with _endpoints_lock:
+        agg = _endpoints.get(endpoint)
+        if agg is None:
+            agg = _endpoints[endpoint] = EndpointStats(endpoint)
+        agg.requests += 1
+        agg.queries += stats.count
+        agg.max_queries = max(agg.max_queries, stats.count)
+        agg.duration += stats.duration
+        if suspects:
+            agg.n1_requests += 1
+        for shape, n, _ in suspects:
+            if shape in agg.shapes or len(agg.shapes) < MAX_SHAPES_PER_ENDPOINT:
+                agg.shapes[shape] = max(agg.shapes.get(shape, 0), n)
+        for name, n in stats.templates.items():
+            agg.templates[name] = max(agg.templates.get(name, 0), n)
+
+
+def init_app(app):
+    """Active l'instrumentation (QUERY_STATS_ENABLED)."""
+    if not app.config.get("QUERY_STATS_ENABLED", True):
+        return
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_done, app)
+
+    @app.before_request
+    def _start_query_stats():
+        g.query_stats = RequestStats()
+
+    @app.after_request
+    def _finish_query_stats(response):
+        stats = g.pop("query_stats", None)
+        if stats is None or request.endpoint is None or request.endpoint == "static":
+            return response
+        threshold = app.config.get("QUERY_N1_THRESHOLD", 5)
+        _aggregate(request.endpoint, stats, threshold)
+        if app.debug or app.config.get("QUERY_STATS_HEADER"):
+            response.headers[HEADER] = stats.header(threshold)
+        suspects = stats.suspects(threshold)
+        if suspects:
+            shape, n, _ = suspects[0]
+            app.logger.warning("N+1 probable sur %s : %d× %s", request.endpoint, n, shape[:200])
+        return response
+
+
+def endpoint_report() -> list:
+    """Endpoints du worker, ceux qui répètent le plus de requêtes d'abord."""
+    with _endpoints_lock:
+        rows = list(_endpoints.values())
+    return sorted(rows, key=lambda e: (e.n1_requests, e.max_queries), reverse=True)
+
+
+def reset():
+    with _endpoints_lock:
+        _endpoints.clear()
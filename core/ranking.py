@@ -0,0 +1,299 @@
+# ------------------------------
+# CyberCampus CTF - Index de classement en mémoire
+# ------------------------------
+#
+# Classement gardé en mémoire par worker : un arbre de Fenwick compte les
+# joueurs par score et chaque score garde un bucket trié par (dernier solve,
+# user_id) pour départager les ex-aequo. Rang en O(log n) ; reconstruction
+# quand la version du scoreboard change ou après RANK_INDEX_TTL secondes.
+
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+import threading
+import time
+
+from flask import current_app
+
+from core import db, versions
+
+
+# Un joueur sans solve passe après tous les ex-aequo qui ont résolu quelque chose
+_NEVER = float("inf")
+
+
+def _ts(value) -> float:
+    """Convertit une date de dernier solve en clé de tri."""
+    if value is None:
+        return _NEVER
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+class RankIndex:
+    """Classement incrémental : arbre de Fenwick sur les scores + buckets d'ex-aequo."""
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.RLock()
+        self._reset(capacity)
+        self.built_at = None
+        self.version = None
+
+    # ── Structure interne ─────────────────────────────────────────
+
+    def _reset(self, capacity: int):
+        self._capacity = max(1, capacity)
+        self._tree = [0] * (self._capacity + 1)
+        self._buckets = {}   # score -> [(last_solve_ts, user_id), ...] trié
+        self._entries = {}   # user_id -> (score, last_solve_ts)
+
+    def _add(self, score: int, delta: int):
+        i = score + 1
+        while i <= self._capacity:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, score: int) -> int:
+        """Nombre de joueurs ayant un score <= score."""
+        i = min(score + 1, self._capacity)
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _grow(self, score: int):
+        capacity = self._capacity
+        while score + 1 > capacity:
+            capacity *= 2
+        self._capacity = capacity
+        self._tree = [0] * (capacity + 1)
+        for s, bucket in self._buckets.items():
+            self._add(s, len(bucket))
+
+    def _find(self, q: int) -> int:
+        """Plus petit score dont le préfixe dépasse q (descente binaire)."""
+        pos = 0
+        step = 1 << self._capacity.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self._capacity and self._tree[nxt] <= q:
+                pos = nxt
+                q -= self._tree[nxt]
+            step >>= 1
+        return pos  # index 1-based pos+1 => score pos
+
+    def _count_above(self, score: int) -> int:
+        return len(self._entries) - self._prefix(score)
+
+    def _insert(self, user_id: int, score: int, ts: float):
+        if score + 1 > self._capacity:
+            self._grow(score)
+        insort(self._buckets.setdefault(score, []), (ts, user_id))
+        self._entries[user_id] = (score, ts)
+        self._add(score, 1)
+
+    def _remove(self, user_id: int):
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+        score, ts = entry
+        bucket = self._buckets[score]
+        del bucket[bisect_left(bucket, (ts, user_id))]
+        if not bucket:
+            del self._buckets[score]
+        self._add(score, -1)
+
+    def _position(self, user_id: int):
+        """Position 0-based dans le classement (0 = premier)."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        score, ts = entry
+        return self._count_above(score) + bisect_left(self._buckets[score], (ts, user_id))
+
+    def _at(self, position: int):
+        """Entrée (user_id, score) à une position 0-based."""
+        total = len(self._entries)
+        if position < 0 or position >= total:
+            return None
+        score = self._find(total - 1 - position)
+        offset = position - self._count_above(score)
+        return self._buckets[score][offset][1], score
+
+    # ── API publique ──────────────────────────────────────────────
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, user_id):
+        return user_id in self._entries
+
+    def update(self, user_id: int, points: int, last_solve_at=None):
+        """Insère ou remplace la position d'un joueur (valeur absolue)."""
+        score = max(0, int(points or 0))
+        with self._lock:
+            self._remove(user_id)
+            self._insert(user_id, score, _ts(last_solve_at))
+
+    def remove(self, user_id: int):
+        with self._lock:
+            self._remove(user_id)
+
+    def rebuild(self, rows, version=None):
+        """Reconstruit l'index depuis des tuples (user_id, points, last_solve_at)."""
+        rows = [(uid, max(0, int(pts or 0)), _ts(last)) for uid, pts, last in rows]
+        top = max((pts for _, pts, _ in rows), default=0)
+        capacity = 1024
+        while top + 1 > capacity:
+            capacity *= 2
+        with self._lock:
+            self._reset(capacity)
+            for uid, pts, last in rows:
+                if uid in self._entries:
+                    continue
+                self._insert(uid, pts, last)
+            self.built_at = time.monotonic()
+            self.version = version
+
+    def key(self, user_id: int):
+        """Clé de tri (points, dernier solve, user_id) d'un joueur classé."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+        return None if entry is None else (entry[0], entry[1], user_id)
+
+    def position_after(self, points: int, last_solve_ts: float, user_id: int) -> int:
+        """Nombre de joueurs classés devant ou sur la clé donnée (pagination par clé)."""
+        with self._lock:
+            bucket = self._buckets.get(points, [])
+            return self._count_above(points) + bisect_right(bucket, (last_solve_ts, user_id))
+
+    def entries(self, start: int, count: int) -> list:
+        """Tranche du classement : [(rang, user_id, points)] à partir d'une position 0-based."""
+        with self._lock:
+            stop = min(len(self._entries), max(0, start) + count)
+            return [(p + 1, *self._at(p)) for p in range(max(0, start), stop)]
+
+    def invalidate(self):
+        """Force une reconstruction depuis la base au prochain accès."""
+        self.built_at = None
+        self.version = None
+
+    def advance(self, version):
+        """Marque l'index à jour pour `version` s'il l'était pour la précédente."""
+        with self._lock:
+            if version is not None and self.version == version - 1:
+                self.version = version
+
+    def rank(self, user_id: int):
+        """Rang 1-based du joueur, ou None s'il n'est pas classé."""
+        with self._lock:
+            pos = self._position(user_id)
+        return None if pos is None else pos + 1
+
+    def rank_for_score(self, points: int) -> int:
+        """Rang qu'aurait un joueur non classé avec ce score."""
+        with self._lock:
+            return self._count_above(max(0, int(points or 0))) + 1
+
+    def percentile(self, user_id: int):
+        """Pourcentage des joueurs classés au même rang ou derrière."""
+        with self._lock:
+            pos = self._position(user_id)
+            total = len(self._entries)
+        if pos is None or not total:
+            return None
+        return round((total - pos) / total * 100, 1)
+
+    def neighbours(self, user_id: int, count: int = 2) -> dict:
+        """Joueurs juste au-dessus et juste en dessous : [(rang, user_id, points)]."""
+        with self._lock:
+            pos = self._position(user_id)
+            if pos is None:
+                return {"above": [], "below": []}
+            above = [(p + 1, *self._at(p)) for p in range(max(0, pos - count), pos)]
+            below = [(p + 1, *self._at(p))
+                     for p in range(pos + 1, min(len(self._entries), pos + 1 + count))]
+        return {"above": above, "below": below}
+
+    def standing(self, user_id: int, points: int = 0, count: int = 2) -> dict:
+        """Rang, percentile et voisins d'un joueur en un seul appel."""
+        with self._lock:
+            rank = self.rank(user_id)
+            if rank is None:
+                return {
+                    "rank": self.rank_for_score(points),
+                    "percentile": None,
+                    "total": len(self._entries),
+                    "above": [],
+                    "below": [],
+                }
+            return {
+                "rank": rank,
+                "percentile": self.percentile(user_id),
+                "total": len(self._entries),
+                **self.neighbours(user_id, count),
+            }
+
+
+# ------------------------------
+# Instance par worker + reconstruction depuis la base
+# ------------------------------
+rank_index = RankIndex()
+
+
+def load_rank_rows(user_ids=None):
+    """Lit (user_id, points, dernier solve) des joueurs classés (tous ou user_ids), en une requête."""
+    from core.models import Scoreboard, Solve
+
+    last_solve = (
+        db.session.query(
+            Solve.user_id.label("user_id"),
+            db.func.max(Solve.solved_at).label("last_solve"),
+        )
+        .group_by(Solve.user_id)
+    )
+    if user_ids is not None:
+        last_solve = last_solve.filter(Solve.user_id.in_(user_ids))
+    last_solve = last_solve.subquery()
+    query = (
+        db.session.query(Scoreboard.user_id, Scoreboard.points_total, last_solve.c.last_solve)
+        .outerjoin(last_solve, last_solve.c.user_id == Scoreboard.user_id)
+    )
+    if user_ids is not None:
+        query = query.filter(Scoreboard.user_id.in_(user_ids))
+    return query.all()
+
+
+def rebuild_rank_index(version=None):
+    """Reconstruit l'index du worker depuis la base (cold start)."""
+    # La version est lue avant les lignes : au pire l'index est plus récent qu'elle
+    if version is None:
+        version = versions.current(versions.SCOREBOARD)
+    rank_index.rebuild(load_rank_rows(), version)
+    return rank_index
+
+
+def get_rank_index() -> RankIndex:
+    """Retourne l'index, reconstruit s'il est vide, en retard d'une version ou trop vieux."""
+    ttl = current_app.config.get("RANK_INDEX_TTL", 60)
+    version = versions.current(versions.SCOREBOARD)
+    built_at = rank_index.built_at
+    if built_at is None or rank_index.version != version or time.monotonic() - built_at > ttl:
+        rebuild_rank_index(version)
+    return rank_index
+
+
+def record_score(user_id: int, points: int, last_solve_at=None, version=None):
+    """Répercute un nouveau score dans l'index du worker courant."""
+    if rank_index.built_at is not None:
+        rank_index.update(user_id, points, last_solve_at)
+        rank_index.advance(version)
+
+
+def refresh_scores(user_ids, version=None):
+    """Relit depuis la base le score de quelques joueurs (score dynamique)."""
+    if rank_index.built_at is not None and user_ids:
+        for user_id, points, last_solve_at in load_rank_rows(user_ids):
+            rank_index.update(user_id, points, last_solve_at)
+        rank_index.advance(version)
@@ -0,0 +1,275 @@
+# ------------------------------
+# CyberCampus CTF - Compteurs à fenêtre glissante (brute-force, spam de flags)
+# ------------------------------
+#
+# Compteurs par (IP, type) et (joueur, type) pour detect_bruteforce et
+# detect_flag_spam : anneaux de RATE_COUNTER_BUCKETS tranches dans une table
+# de hachage projetée en mémoire (RATE_COUNTER_PATH), partagée par les
+# workers et sérialisée par flock. Un fichier neuf est reconstruit depuis les
+# événements récents.
+
+import calendar
+from datetime import datetime, timedelta
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:   # Windows (dev) : pas de verrou entre processus
+    fcntl = None
+
+from flask import current_app
+
+from core import db
+
+
+_MAGIC = b"CCRATE01"
+_HEADER = struct.Struct("<8sIII")      # magic, cases, tranches, secondes par tranche
+_HEADER_SIZE = 32
+_KEY = struct.Struct("<16sq")          # empreinte de la clé, dernière tranche écrite
+_BUCKET = struct.Struct("<qI")         # numéro de tranche, compteur
+_PROBES = 16
+
+
+class RateCounters:
+    """Table de compteurs à fenêtre glissante partagée entre processus."""
+
+    def __init__(self, path=None, slots=8192, buckets=60, bucket_seconds=10, fill=None):
+        """
+        fill(add) remplit une table neuve (reconstruction depuis la base) ;
+        il s'exécute sous le verrou exclusif de création, avant l'écriture de
+        l'en-tête : les autres workers attendent la fin au lieu de compter en
+        parallèle des événements que la reconstruction relira.
+        """
+        self.path = path
+        self.slots = slots
+        self.buckets = buckets
+        self.bucket_seconds = bucket_seconds
+        self.slot_size = _KEY.size + buckets * _BUCKET.size
+        self.size = _HEADER_SIZE + slots * self.slot_size
+        self._ring = struct.Struct("<" + "qI" * buckets)
+        self.created = False
+        self.fill_error = None
+        self._lock = threading.Lock()
+        self._fd = None
+        if path:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            with self._flock(exclusive=True):
+                if not self._header_matches():
+                    os.ftruncate(self._fd, 0)
+                    os.ftruncate(self._fd, self.size)
+                    self.created = True
+                self._mm = mmap.mmap(self._fd, self.size)
+                if self.created:
+                    self._fill(fill)
+        else:
+            self._mm = mmap.mmap(-1, self.size)
+            self.created = True
+            self._fill(fill)
+
+    def _fill(self, fill):
+        if fill is not None:
+            try:
+                fill(self._add)
+            except Exception as e:
+                # Base indisponible : table vide, complétée par les nouveaux événements
+                self.fill_error = type(e).__name__
+        self._mm[:_HEADER.size] = self._header()
+
+    @property
+    def span(self) -> int:
+        """Fenêtre maximale lisible, en secondes."""
+        return self.buckets * self.bucket_seconds
+
+    def _header(self) -> bytes:
+        return _HEADER.pack(_MAGIC, self.slots, self.buckets, self.bucket_seconds)
+
+    def _header_matches(self) -> bool:
+        if os.fstat(self._fd).st_size != self.size:
+            return False
+        return os.pread(self._fd, _HEADER.size, 0) == self._header()
+
+    def _flock(self, exclusive: bool):
+        return _FileLock(self._fd, exclusive)
+
+    # ── Table de hachage ─────────────────────────────────────────────
+    def _offset(self, slot: int) -> int:
+        return _HEADER_SIZE + slot * self.slot_size
+
+    def _find(self, digest: bytes, tick: int, create: bool):
+        """Case de la clé ; à la création, première case libre ou la plus ancienne."""
+        start = int.from_bytes(digest[:8], "little") % self.slots
+        free = oldest = None
+        oldest_tick = None
+        for probe in range(_PROBES):
+            slot = (start + probe) % self.slots
+            key, last = _KEY.unpack_from(self._mm, self._offset(slot))
+            live = last > tick - self.buckets
+            if live and key == digest:
+                return slot
+            if not live:
+                if free is None:
+                    free = slot
+            elif oldest_tick is None or last < oldest_tick:
+                oldest, oldest_tick = slot, last
+        if not create:
+            return None
+        slot = free if free is not None else oldest
+        offset = self._offset(slot)
+        self._mm[offset:offset + self.slot_size] = bytes(self.slot_size)
+        _KEY.pack_into(self._mm, offset, digest, tick)
+        return slot
+
+    # ── Lecture / écriture ───────────────────────────────────────────
+    def _tick(self, now=None) -> int:
+        return int((time.time() if now is None else now) // self.bucket_seconds)
+
+    def hit(self, key: str, now=None, amount: int = 1):
+        """Ajoute amount événements à la clé, dans la tranche de now."""
+        with self._lock, self._flock(exclusive=True):
+            self._add(key, now, amount)
+
+    def _add(self, key: str, now=None, amount: int = 1):
+        """hit() sans verrou (appelant déjà sous le verrou exclusif)."""
+        digest = _digest(key)
+        tick = self._tick(now)
+        current = self._tick()
+        if tick <= current - self.buckets:
+            return   # plus vieux que l'anneau
+        offset = self._offset(self._find(digest, current, create=True))
+        bucket = offset + _KEY.size + (tick % self.buckets) * _BUCKET.size
+        stored, count = _BUCKET.unpack_from(self._mm, bucket)
+        if stored != tick:
+            count = 0
+        _BUCKET.pack_into(self._mm, bucket, tick, count + amount)
+        _, last = _KEY.unpack_from(self._mm, offset)
+        if tick > last:
+            _KEY.pack_into(self._mm, offset, digest, tick)
+
+    def count(self, key: str, seconds: int, now=None) -> int:
+        """Nombre d'événements de la clé sur les `seconds` dernières secondes."""
+        tick = self._tick(now)
+        width = min(math.ceil(seconds / self.bucket_seconds), self.buckets)
+        with self._lock, self._flock(exclusive=False):
+            slot = self._find(_digest(key), tick, create=False)
+            if slot is None:
+                return 0
+            ring = self._ring.unpack_from(self._mm, self._offset(slot) + _KEY.size)
+        return sum(n for stored, n in zip(ring[::2], ring[1::2]) if tick - width < stored <= tick)
+
+    def close(self):
+        self._mm.close()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class _FileLock:
+    """flock sur le fichier de la table (sans effet en mémoire anonyme)."""
+
+    __slots__ = ("fd", "mode")
+
+    def __init__(self, fd, exclusive):
+        self.fd = fd
+        self.mode = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) if fcntl else None
+
+    def __enter__(self):
+        if self.fd is not None and self.mode is not None:
+            fcntl.flock(self.fd, self.mode)
+
+    def __exit__(self, *exc):
+        if self.fd is not None and self.mode is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+
+def event_keys(event_type: str, ip=None, user_id=None) -> list:
+    """Clés incrémentées pour un événement : par IP et par joueur."""
+    keys = []
+    if ip:
+        keys.append(f"ip:{ip}:{event_type}")
+    if user_id:
+        keys.append(f"user:{user_id}:{event_type}")
+    return keys
+
+
+# ── Instance du processus ─────────────────────────────────────────────
+_counters = None
+_counters_lock = threading.Lock()
+
+
+def get_counters() -> RateCounters:
+    """Table du processus, ouverte (et reconstruite si neuve) au premier usage."""
+    global _counters
+    if _counters is None:
+        with _counters_lock:
+            if _counters is None:
+                cfg = current_app.config
+                path = cfg.get("RATE_COUNTER_PATH")
+                if path is None:
+                    path = os.path.join(tempfile.gettempdir(), "cybercampus-rate.bin")
+                buckets = cfg.get("RATE_COUNTER_BUCKETS", 60)
+                bucket_seconds = cfg.get("RATE_COUNTER_BUCKET_SECONDS", 10)
+                _counters = RateCounters(
+                    path=path or None,
+                    slots=cfg.get("RATE_COUNTER_SLOTS", 8192),
+                    buckets=buckets,
+                    bucket_seconds=bucket_seconds,
+                    fill=lambda add: rebuild(add, buckets * bucket_seconds),
+                )
+    return _counters
+
+
+def rebuild(add, span: int) -> int:
+    """Recompte via add(key, now) les événements des `span` dernières secondes."""
+    from core.security import SecurityEvent
+
+    since = datetime.utcnow() - timedelta(seconds=span)
+    rows = (
+        db.session.query(SecurityEvent.event_type, SecurityEvent.ip_address,
+                         SecurityEvent.user_id, SecurityEvent.timestamp)
+        .filter(SecurityEvent.timestamp >= since)
+        .yield_per(1000)
+    )
+    n = 0
+    for event_type, ip, user_id, ts in rows:
+        for key in event_keys(event_type, ip, user_id):
+            add(key, now=calendar.timegm(ts.utctimetuple()))
+        n += 1
+    return n
+
+
+def hit(event_type: str, ip=None, user_id=None):
+    """Compte un événement de sécurité (appelé par SecurityEvent.log)."""
+    counters = get_counters()
+    for key in event_keys(event_type, ip, user_id):
+        counters.hit(key)
+
+
+def count(event_types, seconds: int, ip=None, user_id=None):
+    """
+    Événements des types donnés sur la fenêtre, pour une IP ou un joueur.
+    None si la fenêtre dépasse l'anneau (l'appelant repasse par la base).
+    """
+    counters = get_counters()
+    if seconds > counters.span:
+        return None
+    kind, value = ("ip", ip) if ip else ("user", user_id)
+    return sum(counters.count(f"{kind}:{value}:{t}", seconds) for t in event_types)
+
+
+def clear_counters():
+    global _counters
+    with _counters_lock:
+        if _counters is not None:
+            _counters.close()
+        _counters = None
@@ -0,0 +1,138 @@
+# ------------------------------
+# CyberCampus CTF - Recalcul des scores en masse
+# ------------------------------
+#
+# Recalcul ensembliste des points des solves et des totaux du scoreboard
+# (points du challenge moins la pénalité d'indices du solve). plan() renvoie
+# les écarts sans rien modifier ; apply() les corrige par lots, met à jour le
+# graphe des scores et les groupes puis incrémente la version du scoreboard.
+
+from collections import namedtuple
+from datetime import datetime
+
+from core import db, versions
+from core.ranking import rank_index
+
+
+RECONCILE_BATCH_SIZE = 500
+
+SolveDiff = namedtuple("SolveDiff", "solve_id user_id challenge_id current expected")
+ScoreDiff = namedtuple("ScoreDiff", "user_id pseudo current expected")
+ReconcileReport = namedtuple("ReconcileReport", "solve_diffs score_diffs")
+
+
+def _expected_points():
+    """Expression SQL des points d'un solve (même arrondi que Submission.enregistrer)."""
+    from core.models import Challenge, Solve
+
+    base = db.func.coalesce(Challenge.points, 0)
+    penalty = db.func.coalesce(Solve.hint_penalty, 0)
+    return base - (base * penalty) // 100
+
+
+def plan() -> ReconcileReport:
+    """Calcule les écarts sans rien écrire (trois requêtes)."""
+    from core.models import Challenge, Solve, Scoreboard, User
+
+    expected = _expected_points()
+    solve_diffs = [
+        SolveDiff(*row)
+        for row in db.session.query(
+            Solve.id, Solve.user_id, Solve.challenge_id, Solve.points_awarded, expected,
+        )
+        .join(Challenge, Challenge.id == Solve.challenge_id)
+        .filter(db.func.coalesce(Solve.points_awarded, -1) != expected)
+        .order_by(Solve.id)
+        .all()
+    ]
+
+    totals = (
+        db.session.query(
+            Solve.user_id.label("user_id"),
+            db.func.sum(expected).label("expected"),
+        )
+        .join(Challenge, Challenge.id == Solve.challenge_id)
+        .group_by(Solve.user_id)
+        .subquery()
+    )
+    expected_total = db.func.coalesce(totals.c.expected, 0)
+
+    # Joueurs déjà au scoreboard dont le total diffère
+    score_diffs = [
+        ScoreDiff(*row)
+        for row in db.session.query(
+            User.id, User.pseudo, Scoreboard.points_total, expected_total,
+        )
+        .join(Scoreboard, Scoreboard.user_id == User.id)
+        .outerjoin(totals, totals.c.user_id == User.id)
+        .filter(db.func.coalesce(Scoreboard.points_total, -1) != expected_total)
+        .all()
+    ]
+    # Joueurs avec des solves mais sans ligne de scoreboard
+    score_diffs += [
+        ScoreDiff(user_id, pseudo, None, total)
+        for user_id, pseudo, total in db.session.query(
+            User.id, User.pseudo, totals.c.expected,
+        )
+        .join(totals, totals.c.user_id == User.id)
+        .outerjoin(Scoreboard, Scoreboard.user_id == User.id)
+        .filter(Scoreboard.id.is_(None))
+        .all()
+    ]
+    score_diffs.sort(key=lambda d: d.user_id)
+    return ReconcileReport(solve_diffs, score_diffs)
+
+
+def _batches(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def apply(report: ReconcileReport = None, batch_size: int = RECONCILE_BATCH_SIZE) -> ReconcileReport:
+    """Corrige les écarts par lots de batch_size lignes, un commit par lot."""
+    from core.models import Challenge, Solve, Scoreboard, ScoreEvent, GroupScore
+
+    report = report or plan()
+
+    solve_points = (
+        db.select(_expected_points())
+        .where(Challenge.id == Solve.challenge_id)
+        .scalar_subquery()
+    )
+    for batch in _batches([d.solve_id for d in report.solve_diffs], batch_size):
+        db.session.query(Solve).filter(Solve.id.in_(batch)) \
+            .update({Solve.points_awarded: solve_points}, synchronize_session=False)
+        db.session.commit()
+
+    # Les solves sont corrigés : le total d'un joueur est la somme de ses solves
+    user_total = (
+        db.select(db.func.coalesce(db.func.sum(Solve.points_awarded), 0))
+        .where(Solve.user_id == Scoreboard.user_id)
+        .scalar_subquery()
+    )
+    now = datetime.utcnow()
+    for batch in _batches(report.score_diffs, batch_size):
+        existing = [d.user_id for d in batch if d.current is not None]
+        if existing:
+            db.session.query(Scoreboard).filter(Scoreboard.user_id.in_(existing)) \
+                .update({Scoreboard.points_total: user_total}, synchronize_session=False)
+        db.session.add_all(
+            Scoreboard(user_id=d.user_id, points_total=d.expected)
+            for d in batch if d.current is None
+        )
+        # Un point par joueur modifié pour que le graphe finisse sur le bon total
+        db.session.add_all(
+            ScoreEvent(user_id=d.user_id, challenge_id=None,
+                       points=d.expected - (d.current or 0),
+                       total_after=d.expected, created_at=now)
+            for d in batch
+        )
+        db.session.commit()
+
+    if report.solve_diffs or report.score_diffs:
+        # Agrégats des classements par groupe : recalcul complet, une fois
+        GroupScore.recalculer()
+        versions.bump(versions.SCOREBOARD)
+        db.session.commit()
+        rank_index.invalidate()
+    return report
@@ -0,0 +1,155 @@
+# ------------------------------
+# CyberCampus CTF - Rétention des événements de sécurité
+# ------------------------------
+#
+# Les événements plus vieux que SECURITY_EVENT_RETENTION_DAYS jours sont
+# déplacés par lots dans SECURITY_ARCHIVE_DIR (un fichier JSON Lines gzip par
+# jour), chaque lot étant synchronisé sur disque avant sa suppression.
+# import_archive réinsère un fichier d'archive, en ignorant les ids déjà
+# présents.
+
+from collections import namedtuple
+from datetime import datetime, timedelta
+import gzip
+import json
+import os
+
+from flask import current_app
+
+from core import db
+from core.security import SecurityEvent, SecurityIPRollup, hour_of, rollup_statements
+
+
+ArchiveReport = namedtuple("ArchiveReport", "cutoff archived files pruned_rollups")
+
+ARCHIVE_BATCH_SIZE = 5000
+
+_COLUMNS = ("id", "event_type", "ip_address", "user_id", "user_agent", "path", "extra", "timestamp")
+
+
+def cutoff_date(days=None, now=None) -> datetime:
+    """Date avant laquelle les événements sont archivés (début d'heure : une heure est archivée entière)."""
+    if days is None:
+        days = current_app.config.get("SECURITY_EVENT_RETENTION_DAYS", 90)
+    return hour_of((now or datetime.utcnow()) - timedelta(days=days))
+
+
+def archive_dir() -> str:
+    return current_app.config.get("SECURITY_ARCHIVE_DIR") or os.path.join(
+        current_app.instance_path, "security-archives")
+
+
+def archive_path(day, directory=None) -> str:
+    return os.path.join(directory or archive_dir(), f"security-events-{day:%Y-%m-%d}.jsonl.gz")
+
+
+def pending_count(cutoff: datetime) -> int:
+    """Événements qui seraient archivés (simulation)."""
+    return SecurityEvent.query.filter(SecurityEvent.timestamp < cutoff).count()
+
+
+def _serialize(row) -> str:
+    data = dict(zip(_COLUMNS, row))
+    data["timestamp"] = data["timestamp"].isoformat()
+    return json.dumps(data, ensure_ascii=False)
+
+
+def archive_events(days=None, directory=None, batch_size=ARCHIVE_BATCH_SIZE, now=None) -> ArchiveReport:
+    """Déplace les événements plus vieux que la rétention vers les archives."""
+    cutoff = cutoff_date(days, now)
+    directory = directory or archive_dir()
+    os.makedirs(directory, exist_ok=True)
+    columns = [getattr(SecurityEvent, c) for c in _COLUMNS]
+    archived, files = 0, set()
+
+    while True:
+        rows = (
+            db.session.query(*columns)
+            .filter(SecurityEvent.timestamp < cutoff)
+            .order_by(SecurityEvent.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row.timestamp.date(), []).append(row)
+        for day, day_rows in by_day.items():
+            path = archive_path(day, directory)
+            # Un membre gzip par lot : le fichier reste lisible d'un bloc
+            with open(path, "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                    f.write("".join(_serialize(r) + "\n" for r in day_rows).encode())
+                raw.flush()
+                os.fsync(raw.fileno())
+            files.add(path)
+        ids = [row.id for row in rows]
+        SecurityEvent.query.filter(SecurityEvent.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        archived += len(rows)
+
+    pruned = (
+        SecurityIPRollup.query
+        .filter(SecurityIPRollup.hour < hour_of(cutoff))
+        .delete(synchronize_session=False)
+    )
+    db.session.commit()
+    return ArchiveReport(cutoff, archived, sorted(files), pruned)
+
+
+def read_archive(path: str):
+    """Événements d'un fichier d'archive (dictionnaires prêts à insérer)."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            data["timestamp"] = datetime.fromisoformat(data["timestamp"])
+            yield data
+
+
+def import_archive(path: str, batch_size=ARCHIVE_BATCH_SIZE, rollups=False) -> int:
+    """
+    Réinsère un fichier d'archive ; les id déjà présents ou répétés sont
+    ignorés et les joueurs supprimés depuis deviennent anonymes. Avec
+    rollups=True, les agrégats sont aussi incrémentés (heures dont les
+    agrégats ont été perdus) ; sinon rebuild_rollups recalcule ensuite les
+    heures réimportées.
+    """
+    from core.models import User
+
+    dialect = db.session.get_bind().dialect.name
+    imported = 0
+    batch = []
+
+    def flush():
+        ids = [r["id"] for r in batch]
+        present = {i for (i,) in db.session.query(SecurityEvent.id).filter(SecurityEvent.id.in_(ids))}
+        users = {r["user_id"] for r in batch if r["user_id"]}
+        known = {i for (i,) in db.session.query(User.id).filter(User.id.in_(users))} if users else set()
+        rows = []
+        for r in batch:
+            # Lignes déjà en base ou répétées dans le lot (archivage interrompu puis rejoué)
+            if r["id"] in present:
+                continue
+            present.add(r["id"])
+            if r["user_id"] not in known:
+                r["user_id"] = None
+            rows.append(r)
+        if rows:
+            db.session.execute(SecurityEvent.__table__.insert(), rows)
+            if rollups:
+                for stmt, params in rollup_statements(dialect, rows):
+                    db.session.execute(stmt, params)
+        db.session.commit()
+        batch.clear()
+        return len(rows)
+
+    for row in read_archive(path):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            imported += flush()
+    if batch:
+        imported += flush()
+    return imported
@@ -3,17 +3,24 @@
 # ------------------------------
 
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 import json
+import time
 
-from flask import request as flask_request
-from core import db
+from flask import current_app, request as flask_request
+from core import db, eventsink, ratecounter, versions
 
 
 # ── Modèle SecurityEvent ───────────────────────────────────────────────────
 
 class SecurityEvent(db.Model):
     __tablename__ = "security_event"
+    __table_args__ = (
+        # Repli de detect_bruteforce / detect_flag_spam, recherche par IP
+        db.Index("ix_security_event_ip_type_time", "ip_address", "event_type", "timestamp"),
+        # IP suspectes sur 5 min, tentatives de bannis (dashboard)
+        db.Index("ix_security_event_type_time", "event_type", "timestamp"),
+    )
 
     id         = db.Column(db.Integer, primary_key=True)
     event_type = db.Column(db.String(50), nullable=False)
@@ -22,7 +29,7 @@ class SecurityEvent(db.Model):
     user_agent = db.Column(db.String(300), nullable=True)
     path       = db.Column(db.String(200), nullable=True)
     extra      = db.Column(db.Text, nullable=True)  # JSON libre
-    timestamp  = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp  = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     user = db.relationship("User", backref="security_events", lazy="select")
 
@@ -32,6 +39,7 @@ class SecurityEvent(db.Model):
     REGISTER       = "register"
     FLAG_OK        = "flag_submit_ok"
     FLAG_FAIL      = "flag_submit_fail"
+    FLAG_SHARED    = "flag_shared"
     BANNED_ATTEMPT = "banned_user_attempt"
     BRUTE_SUSPECT  = "bruteforce_suspect"
     PORT_SCAN      = "port_scan_suspect"
@@ -39,25 +47,47 @@ class SecurityEvent(db.Model):
 
     @staticmethod
     def log(event_type, ip=None, user_id=None, extra=None):
-        """Enregistre un événement de sécurité."""
+        """
+        Enregistre un événement de sécurité. Par défaut l'événement est mis en
+        file et inséré par lot hors de la requête (core.eventsink) ; avec
+        SECURITY_EVENTS_SYNC il est inséré et commité immédiatement.
+        """
+        # Table des compteurs ouverte avant l'écriture : une table neuve est
+        # reconstruite depuis la base sans compter deux fois cet événement
+        try:
+            ratecounter.get_counters()
+        except Exception:
+            pass
         try:
-            ua  = flask_request.headers.get("User-Agent", "")[:300]
-            pth = flask_request.path[:200]
-            ip  = ip or flask_request.remote_addr
-            ev  = SecurityEvent(
+            row = dict(
                 event_type=event_type,
-                ip_address=ip,
+                ip_address=ip or flask_request.remote_addr,
                 user_id=user_id,
-                user_agent=ua,
-                path=pth,
+                user_agent=flask_request.headers.get("User-Agent", "")[:300],
+                path=flask_request.path[:200],
                 extra=json.dumps(extra) if extra else None,
+                timestamp=datetime.utcnow(),
             )
-            db.session.add(ev)
-            db.session.commit()
-            return ev
+            if not current_app.config.get("SECURITY_EVENTS_SYNC"):
+                eventsink.record(row)
+                ev = None
+            else:
+                ev = SecurityEvent(**row)
+                db.session.add(ev)
+                for stmt, params in rollup_statements(db.session.get_bind().dialect.name, [row]):
+                    db.session.execute(stmt, params)
+                db.session.commit()
         except Exception:
-            db.session.rollback()
+            if current_app.config.get("SECURITY_EVENTS_SYNC"):
+                db.session.rollback()
             return None
+        # Compteurs best-effort : l'événement est déjà enregistré, une panne
+        # de la table partagée ne doit pas le faire perdre
+        try:
+            ratecounter.hit(event_type, ip=row["ip_address"], user_id=user_id)
+        except Exception:
+            pass
+        return ev
 
     @staticmethod
     def get_extra(event):
@@ -70,6 +100,119 @@ class SecurityEvent(db.Model):
         return f"<SecurityEvent {self.event_type} {self.ip_address}>"
 
 
+# ── Agrégats horaires ─────────────────────────────────────────────────────
+#
+# Agrégats heure × type et heure × IP, incrémentés dans la transaction qui
+# insère les événements. Ceux par type sont conservés indéfiniment (total
+# historique), ceux par IP sont purgés avec les événements archivés
+# (core.retention).
+
+class SecurityRollup(db.Model):
+    __tablename__ = "security_rollup_hour"
+
+    hour       = db.Column(db.DateTime, primary_key=True)
+    event_type = db.Column(db.String(50), primary_key=True)
+    count      = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def backfill() -> int:
+        """Construit les agrégats depuis security_event si les tables sont vides."""
+        if SecurityRollup.query.first() is not None:
+            return 0
+        return rebuild_rollups()
+
+
+class SecurityIPRollup(db.Model):
+    __tablename__ = "security_rollup_ip"
+
+    hour       = db.Column(db.DateTime, primary_key=True)
+    ip_address = db.Column(db.String(45), primary_key=True)   # "" si inconnue
+    count      = db.Column(db.Integer, nullable=False, default=0)
+
+
+def hour_of(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_statements(dialect: str, rows) -> list:
+    """
+    (requête, paramètres) incrémentant les agrégats pour un lot d'événements :
+    un upsert par table (executemany), clés triées pour éviter les
+    interblocages entre workers. Hors Postgres / SQLite, deux requêtes
+    portables par table : insertion des clés absentes à 0, puis UPDATE.
+    """
+    by_type, by_ip = defaultdict(int), defaultdict(int)
+    for row in rows:
+        hour = hour_of(row["timestamp"])
+        by_type[(hour, row["event_type"])] += 1
+        by_ip[(hour, row["ip_address"] or "")] += 1
+
+    statements = []
+    for model, column, counts in ((SecurityRollup, "event_type", by_type),
+                                  (SecurityIPRollup, "ip_address", by_ip)):
+        table = model.__table__
+        if dialect not in ("postgresql", "sqlite"):
+            statements.extend(_portable_rollup(table, column, sorted(counts.items())))
+            continue
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        params = [{"hour": h, column: k, "count": n} for (h, k), n in sorted(counts.items())]
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["hour", column],
+            set_={"count": table.c.count + stmt.excluded["count"]},
+        )
+        statements.append((stmt, params))
+    return statements
+
+
+def _portable_rollup(table, column: str, counts) -> list:
+    """INSERT ... SELECT WHERE NOT EXISTS puis UPDATE count = count + n (SQL standard)."""
+    hour, key = db.bindparam("k_hour", type_=table.c.hour.type), db.bindparam("k_value")
+    match = db.and_(table.c.hour == hour, table.c[column] == key)
+    missing = db.select(hour, key, db.literal(0)).where(~db.exists().where(match))
+    params = [{"k_hour": h, "k_value": k, "n": n} for (h, k), n in counts]
+    return [
+        (table.insert().from_select(["hour", column, "count"], missing), params),
+        (table.update().where(match).values(count=table.c.count + db.bindparam("n")), params),
+    ]
+
+
+def rebuild_rollups(batch_size: int = 5000) -> int:
+    """
+    Recalcule les agrégats des heures qui ont encore des événements en base ;
+    les heures archivées gardent leurs agrégats par type (total historique).
+    """
+    dialect = db.session.get_bind().dialect.name
+    columns = (SecurityEvent.event_type, SecurityEvent.ip_address, SecurityEvent.timestamp)
+    cleared = set()
+
+    def flush(batch):
+        # Une heure est vidée avant l'insertion de ses premiers événements
+        hours = {hour_of(row["timestamp"]) for row in batch} - cleared
+        if hours:
+            for model in (SecurityRollup, SecurityIPRollup):
+                model.query.filter(model.hour.in_(hours)).delete(synchronize_session=False)
+            cleared.update(hours)
+        for stmt, params in rollup_statements(dialect, batch):
+            db.session.execute(stmt, params)
+
+    batch, total = [], 0
+    for event_type, ip, ts in db.session.query(*columns).yield_per(batch_size):
+        batch.append({"event_type": event_type, "ip_address": ip, "timestamp": ts})
+        if len(batch) >= batch_size:
+            flush(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        flush(batch)
+        total += len(batch)
+    db.session.commit()
+    return total
+
+
 # ── Helpers analytiques ───────────────────────────────────────────────────
 
 def get_ip_info(ip: str) -> dict:
@@ -83,156 +226,139 @@ def get_ip_info(ip: str) -> dict:
     return {"country": "External", "type": "public"}
 
 
-def detect_bruteforce(ip: str, window_minutes: int = 5, threshold: int = 10) -> bool:
-    """Détecte si une IP a fait trop de tentatives de login échouées."""
+def _count_recent(event_types, ip: str, window_minutes: int) -> int:
+    """Événements récents d'une IP : compteurs en mémoire partagée, sinon la base."""
+    try:
+        count = ratecounter.count(event_types, seconds=window_minutes * 60, ip=ip)
+    except Exception:
+        count = None
+    if count is not None:
+        return count
     since = datetime.utcnow() - timedelta(minutes=window_minutes)
-    count = SecurityEvent.query.filter(
-        SecurityEvent.event_type == SecurityEvent.LOGIN_FAIL,
+    return SecurityEvent.query.filter(
+        SecurityEvent.event_type.in_(event_types),
         SecurityEvent.ip_address == ip,
         SecurityEvent.timestamp >= since,
     ).count()
-    return count >= threshold
+
+
+def detect_bruteforce(ip: str, window_minutes: int = 5, threshold: int = 10) -> bool:
+    """Détecte si une IP a fait trop de tentatives de login échouées."""
+    return _count_recent((SecurityEvent.LOGIN_FAIL,), ip, window_minutes) >= threshold
 
 
 def detect_flag_spam(ip: str, window_minutes: int = 2, threshold: int = 20) -> bool:
     """Détecte du spam de soumissions de flags."""
-    since = datetime.utcnow() - timedelta(minutes=window_minutes)
-    count = SecurityEvent.query.filter(
-        SecurityEvent.event_type.in_([SecurityEvent.FLAG_OK, SecurityEvent.FLAG_FAIL]),
-        SecurityEvent.ip_address == ip,
-        SecurityEvent.timestamp >= since,
-    ).count()
-    return count >= threshold
+    events = (SecurityEvent.FLAG_OK, SecurityEvent.FLAG_FAIL)
+    return _count_recent(events, ip, window_minutes) >= threshold
 
 
-def get_dashboard_stats() -> dict:
-    """Calcule toutes les statistiques pour le dashboard sécurité."""
-    now   = datetime.utcnow()
-    h24   = now - timedelta(hours=24)
-    h1    = now - timedelta(hours=1)
-    min5  = now - timedelta(minutes=5)
+# ── Dashboard sécurité ────────────────────────────────────────────────────
+#
+# Les chiffres sur 24 h viennent des agrégats horaires ; seuls la dernière
+# heure, les IP suspectes et les listes d'événements lisent security_event,
+# sur des plages courtes. Le résultat est gardé SECURITY_STATS_TTL secondes
+# par worker et recalculé par un seul thread à l'expiration.
 
-    # ── Compteurs globaux ──────────────────────────────────────────
-    total_events = SecurityEvent.query.count()
-    events_24h   = SecurityEvent.query.filter(SecurityEvent.timestamp >= h24).count()
-    events_1h    = SecurityEvent.query.filter(SecurityEvent.timestamp >= h1).count()
+EventRow = namedtuple("EventRow", "id timestamp event_type ip_address user_id pseudo path extra")
 
-    # ── Connexions ─────────────────────────────────────────────────
-    logins_ok_24h   = SecurityEvent.query.filter(
-        SecurityEvent.event_type == SecurityEvent.LOGIN_OK,
-        SecurityEvent.timestamp >= h24,
-    ).count()
+_stats_cache = versions.VersionedCache(max_entries=1)
 
-    logins_fail_24h = SecurityEvent.query.filter(
-        SecurityEvent.event_type == SecurityEvent.LOGIN_FAIL,
-        SecurityEvent.timestamp >= h24,
-    ).count()
 
-    registers_24h = SecurityEvent.query.filter(
-        SecurityEvent.event_type == SecurityEvent.REGISTER,
-        SecurityEvent.timestamp >= h24,
-    ).count()
+def _event_rows(*criteria, limit: int) -> list:
+    """Derniers événements avec le pseudo de leur auteur, sans chargement paresseux."""
+    from core.models import User
 
-    # ── Flags ──────────────────────────────────────────────────────
-    flags_ok_24h   = SecurityEvent.query.filter(
-        SecurityEvent.event_type == SecurityEvent.FLAG_OK,
-        SecurityEvent.timestamp >= h24,
-    ).count()
+    rows = (
+        db.session.query(SecurityEvent.id, SecurityEvent.timestamp, SecurityEvent.event_type,
+                         SecurityEvent.ip_address, SecurityEvent.user_id, User.pseudo,
+                         SecurityEvent.path, SecurityEvent.extra)
+        .outerjoin(User, User.id == SecurityEvent.user_id)
+        .filter(*criteria)
+        .order_by(SecurityEvent.timestamp.desc())
+        .limit(limit)
+        .all()
+    )
+    return [EventRow(*row) for row in rows]
 
-    flags_fail_24h = SecurityEvent.query.filter(
-        SecurityEvent.event_type == SecurityEvent.FLAG_FAIL,
-        SecurityEvent.timestamp >= h24,
-    ).count()
 
-    # ── IPs suspectes (brute-force détecté sur 5 min) ──────────────
-    suspicious_ips = (
-        db.session.query(
-            SecurityEvent.ip_address,
-            db.func.count(SecurityEvent.id).label("count"),
-        )
-        .filter(
-            SecurityEvent.event_type == SecurityEvent.LOGIN_FAIL,
-            SecurityEvent.timestamp >= min5,
-        )
-        .group_by(SecurityEvent.ip_address)
-        .having(db.func.count(SecurityEvent.id) >= 5)
-        .order_by(db.desc("count"))
+def compute_dashboard_stats() -> dict:
+    """Calcule toutes les statistiques pour le dashboard sécurité."""
+    now   = datetime.utcnow()
+    first = hour_of(now) - timedelta(hours=23)
+    h1    = now - timedelta(hours=1)
+    min5  = now - timedelta(minutes=5)
+
+    # ── Heures × types (24 h) ──────────────────────────────────────
+    hourly_counts = [0] * 24
+    type_counts = defaultdict(int)
+    rollups = (
+        db.session.query(SecurityRollup.hour, SecurityRollup.event_type, SecurityRollup.count)
+        .filter(SecurityRollup.hour >= first)
         .all()
     )
+    for hour, event_type, n in rollups:
+        hourly_counts[int((hour - first).total_seconds() // 3600)] += n
+        type_counts[event_type] += n
+    hourly = [
+        {"label": (first + timedelta(hours=i)).strftime("%H:00"), "count": hourly_counts[i]}
+        for i in range(24)
+    ]
 
     # ── Top IPs (24h) ──────────────────────────────────────────────
-    top_ips = (
-        db.session.query(
-            SecurityEvent.ip_address,
-            db.func.count(SecurityEvent.id).label("count"),
-        )
-        .filter(SecurityEvent.timestamp >= h24)
-        .group_by(SecurityEvent.ip_address)
-        .order_by(db.desc("count"))
+    ip_total = db.func.sum(SecurityIPRollup.count)
+    top_ips = [
+        (ip or None, int(n)) for ip, n in
+        db.session.query(SecurityIPRollup.ip_address, ip_total)
+        .filter(SecurityIPRollup.hour >= first)
+        .group_by(SecurityIPRollup.ip_address)
+        .order_by(ip_total.desc(), SecurityIPRollup.ip_address)
         .limit(10)
-        .all()
-    )
+    ]
 
-    # ── Derniers événements ────────────────────────────────────────
-    recent_events = (
-        SecurityEvent.query
-        .order_by(SecurityEvent.timestamp.desc())
-        .limit(50)
-        .all()
-    )
-
-    # ── Répartition par type (24h) ─────────────────────────────────
-    type_counts_raw = (
-        db.session.query(
-            SecurityEvent.event_type,
-            db.func.count(SecurityEvent.id).label("count"),
+    # ── IPs suspectes (brute-force détecté sur 5 min) ──────────────
+    count = db.func.count(SecurityEvent.id)
+    suspicious_ips = (
+        db.session.query(SecurityEvent.ip_address, count)
+        .filter(
+            SecurityEvent.event_type == SecurityEvent.LOGIN_FAIL,
+            SecurityEvent.timestamp >= min5,
         )
-        .filter(SecurityEvent.timestamp >= h24)
-        .group_by(SecurityEvent.event_type)
-        .all()
-    )
-    type_counts = {t: c for t, c in type_counts_raw}
-
-    # ── Activité par heure (24 dernières heures) ───────────────────
-    hourly = []
-    for i in range(23, -1, -1):
-        t_start = now - timedelta(hours=i + 1)
-        t_end   = now - timedelta(hours=i)
-        cnt = SecurityEvent.query.filter(
-            SecurityEvent.timestamp >= t_start,
-            SecurityEvent.timestamp < t_end,
-        ).count()
-        hourly.append({
-            "label": (now - timedelta(hours=i)).strftime("%H:00"),
-            "count": cnt,
-        })
-
-    # ── IPs bannies (tentatives utilisateurs bannis) ───────────────
-    banned_attempts = (
-        SecurityEvent.query
-        .filter(SecurityEvent.event_type == SecurityEvent.BANNED_ATTEMPT)
-        .order_by(SecurityEvent.timestamp.desc())
-        .limit(20)
+        .group_by(SecurityEvent.ip_address)
+        .having(count >= 5)
+        .order_by(count.desc(), SecurityEvent.ip_address)
         .all()
     )
 
     return {
-        "total_events"    : total_events,
-        "events_24h"      : events_24h,
-        "events_1h"       : events_1h,
-        "logins_ok_24h"   : logins_ok_24h,
-        "logins_fail_24h" : logins_fail_24h,
-        "registers_24h"   : registers_24h,
-        "flags_ok_24h"    : flags_ok_24h,
-        "flags_fail_24h"  : flags_fail_24h,
-        "suspicious_ips"  : suspicious_ips,
+        "total_events"    : db.session.query(db.func.coalesce(db.func.sum(SecurityRollup.count), 0)).scalar(),
+        "events_24h"      : sum(hourly_counts),
+        "events_1h"       : SecurityEvent.query.filter(SecurityEvent.timestamp >= h1).count(),
+        "logins_ok_24h"   : type_counts.get(SecurityEvent.LOGIN_OK, 0),
+        "logins_fail_24h" : type_counts.get(SecurityEvent.LOGIN_FAIL, 0),
+        "registers_24h"   : type_counts.get(SecurityEvent.REGISTER, 0),
+        "flags_ok_24h"    : type_counts.get(SecurityEvent.FLAG_OK, 0),
+        "flags_fail_24h"  : type_counts.get(SecurityEvent.FLAG_FAIL, 0),
+        "suspicious_ips"  : [tuple(row) for row in suspicious_ips],
         "top_ips"         : top_ips,
-        "recent_events"   : recent_events,
-        "type_counts"     : type_counts,
+        "recent_events"   : _event_rows(limit=50),
+        "type_counts"     : dict(type_counts),
         "hourly"          : hourly,
-        "banned_attempts" : banned_attempts,
+        "banned_attempts" : _event_rows(SecurityEvent.event_type == SecurityEvent.BANNED_ATTEMPT, limit=20),
     }
 
+
+def get_dashboard_stats() -> dict:
+    """Statistiques du dashboard, recalculées au plus toutes les SECURITY_STATS_TTL secondes."""
+    ttl = current_app.config.get("SECURITY_STATS_TTL", 10)
+    if not ttl:
+        return compute_dashboard_stats()
+    return _stats_cache.get("stats", int(time.monotonic() // ttl), compute_dashboard_stats)
+
+
+def clear_dashboard_stats():
+    _stats_cache.clear()
+
 class BannedIP(db.Model):
     __tablename__ = "banned_ip"
  
@@ -0,0 +1,99 @@
+# ------------------------------
+# CyberCampus CTF - Évolution des scores (graphe du scoreboard)
+# ------------------------------
+#
+# Graphe "top 10 au fil du temps", lu dans score_event. La charge utile JSON
+# gzip est gardée par worker jusqu'au prochain changement de version du
+# scoreboard.
+
+from datetime import datetime
+import gzip
+import json
+
+from core import db, versions
+from core.ranking import get_rank_index
+
+
+TIMELINE_TOP_N      = 10
+TIMELINE_MAX_POINTS = 60
+
+_cache = versions.VersionedCache()
+
+
+def _ms(value: datetime) -> int:
+    return int(value.timestamp() * 1000)
+
+
+def downsample(points: list, max_points: int) -> list:
+    """
+    Réduit une série en escalier [(ts, total), ...] triée par date.
+    Le temps est découpé en max_points intervalles égaux ; on garde le
+    dernier total de chaque intervalle, ce qui reste exact pour un score
+    cumulé. Le premier et le dernier point sont toujours conservés.
+    """
+    if len(points) <= max_points:
+        return points
+    start, end = points[0][0], points[-1][0]
+    width = (end - start) / (max_points - 1) or 1
+    kept = {}
+    for ts, total in points:
+        kept[int((ts - start) / width)] = (ts, total)
+    series = [kept[k] for k in sorted(kept)]
+    if series[0] != points[0]:
+        series.insert(0, points[0])
+    return series
+
+
+def build_timeline(top_n: int = TIMELINE_TOP_N, max_points: int = TIMELINE_MAX_POINTS) -> dict:
+    """Séries de score des top_n joueurs actuels, en une requête."""
+    from core.models import User, ScoreEvent
+
+    top = get_rank_index().entries(0, top_n)
+    ids = [user_id for _, user_id, _ in top]
+    series = {user_id: [] for user_id in ids}
+    pseudos = {}
+    if ids:
+        rows = (
+            db.session.query(ScoreEvent.user_id, ScoreEvent.created_at,
+                             ScoreEvent.total_after, User.pseudo)
+            .join(User, User.id == ScoreEvent.user_id)
+            .filter(ScoreEvent.user_id.in_(ids))
+            .order_by(ScoreEvent.created_at, ScoreEvent.id)
+            .all()
+        )
+        for user_id, created_at, total_after, pseudo in rows:
+            series[user_id].append((_ms(created_at), total_after))
+            pseudos[user_id] = pseudo
+
+    return {
+        "generated_at": _ms(datetime.utcnow()),
+        "users": [
+            {
+                "rank": rank,
+                "pseudo": pseudos.get(user_id, ""),
+                "points": points,
+                "series": downsample(series[user_id], max_points),
+            }
+            for rank, user_id, points in top
+            if series[user_id]
+        ],
+    }
+
+
+def get_timeline_payload(top_n: int = TIMELINE_TOP_N) -> dict:
+    """Retourne {'version', 'json', 'gzip'} depuis le cache, reconstruit si le classement a changé."""
+    version = versions.current(versions.SCOREBOARD)
+
+    def build():
+        body = json.dumps(build_timeline(top_n), separators=(",", ":")).encode("utf-8")
+        return {
+            "version": version,
+            "json": body,
+            "gzip": gzip.compress(body, compresslevel=6),
+        }
+
+    return _cache.get(top_n, version, build)
+
+
+def clear_timeline_cache():
+    _cache.clear()
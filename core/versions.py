@@ -0,0 +1,100 @@
+# ------------------------------
+# CyberCampus CTF - Versions et caches invalidés par version
+# ------------------------------
+#
+# Compteurs de version (table version_counter) incrémentés dans la
+# transaction de chaque écriture : "scoreboard", "catalog" et "identity".
+# Les caches indexés par version ne touchent pas la base tant qu'elle ne
+# bouge pas ; chaque worker relit les versions au plus toutes les
+# VERSION_POLL_TTL secondes.
+
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event
+
+from core import db
+
+
+SCOREBOARD = "scoreboard"
+CATALOG = "catalog"
+IDENTITY = "identity"
+
+_seen = {}   # nom -> (version, instant de lecture)
+_seen_lock = threading.Lock()
+
+
+def bump(name: str) -> int:
+    """Incrémente la version dans la transaction courante (sans commit)."""
+    from core.models import VersionCounter
+
+    value = VersionCounter.incrementer(name)
+    db.session.info.setdefault("versions", {})[name] = value
+    return value
+
+
+def _remember(name: str, value: int):
+    with _seen_lock:
+        seen = _seen.get(name)
+        if seen is None or value >= seen[0]:
+            _seen[name] = (value, time.monotonic())
+
+
+def current(name: str) -> int:
+    """Version courante, relue en base au plus toutes les VERSION_POLL_TTL secondes."""
+    from core.models import VersionCounter
+
+    seen = _seen.get(name)
+    ttl = current_app.config.get("VERSION_POLL_TTL", 2)
+    if seen is not None and time.monotonic() - seen[1] < ttl:
+        return seen[0]
+    value = VersionCounter.lire(name)
+    _remember(name, value)
+    return value
+
+
+def forget():
+    """Oublie les versions lues (tests, changement de base)."""
+    with _seen_lock:
+        _seen.clear()
+
+
+@event.listens_for(db.session, "after_commit")
+def _after_commit(session):
+    for name, value in session.info.pop("versions", {}).items():
+        _remember(name, value)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("versions", None)
+
+
+class VersionedCache:
+    """
+    Cache par worker dont chaque entrée est valide pour une version donnée.
+    Une seule reconstruction à la fois par cache (les autres threads attendent).
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+
+    def get(self, key, version: int, build):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+            value = build()
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = (version, value)
+            return value
+
+    def clear(self):
+        self._entries.clear()
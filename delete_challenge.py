@@ -14,7 +14,7 @@ import subprocess
 import argparse
 
 from app import app
-from core import db
+from core import db, versions
 from core.models import Challenge, Flag, Submission
 
 
@@ -83,6 +83,8 @@ def delete_challenge_from_db(challenge_id=None, titre=None):
 
         try:
             db.session.delete(challenge)
+            versions.bump(versions.SCOREBOARD)
+            versions.bump(versions.CATALOG)
             db.session.commit()
 
             print("✅ Challenge supprimé avec succès")
@@ -127,6 +129,8 @@ def wipe_all_challenges():
             for challenge in challenges:
                 db.session.delete(challenge)
 
+            versions.bump(versions.SCOREBOARD)
+            versions.bump(versions.CATALOG)
             db.session.commit()
 
             print("✅ Tous les challenges ont été supprimés")
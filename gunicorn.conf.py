@@ -0,0 +1,14 @@
+# ------------------------------
+# CyberCampus CTF - Configuration Gunicorn
+# ------------------------------
+#
+# Workers à threads : chaque flux /scoreboard/stream occupe un thread, pas
+# un worker. Le nombre de threads vient de config.py (WEB_THREADS), qui en
+# déduit le plafond de flux en direct par worker (core.live.max_clients).
+
+from config import Config
+
+bind = "0.0.0.0:5000"
+worker_class = "gthread"
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
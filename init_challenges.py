@@ -1,72 +1,20 @@
 from app import app
-from core import db
+from core import db, versions
 from core.models import Challenge, Flag
+from core.content import read_bundle_file
 
+# Métadonnées et flags lus dans le bundle de contenu (content/challenges.json),
+# qui porte aussi les indices, les liens des services et les pages Apprendre
 CHALLENGES_DATA = [
     {
-        "id":1,
-        "titre": "SQL Injection - Accès Restreint",
-        "description": "Une zone d’authentification protège un espace sensible. Trouvez un moyen d’accéder au compte administrateur pour récupérer le flag.",
-        "points": 25,
-        "actif": True,
-        "flag_str": "CTF{SQL_1nj3ct10n_m4st3r}"
-    },
-    {
-        "id":2,
-        "titre": "XSS Reflected - Livre d'or",
-        "description": "Un livre d’or permet aux visiteurs de laisser un message. Interagissez avec cette fonctionnalité et trouvez comment récupérer le flag.",
-        "points": 25,
-        "actif": True,
-        "flag_str": "CTF{XSS_r3fl3ct3d_pwn3d}"
-    },
-    {
-        "id":3,
-        "titre": "Bruteforce - Coffre-fort Digital",
-        "description": "Un coffre-fort numérique protège une information confidentielle. Découvrez le bon code pour accéder au flag.",
-        "points": 175,
-        "actif": True,
-        "flag_str": "CTF{Brut3F0rc3_M4st3r_7394}"
-    },
-    {
-        "id":4,
-        "titre": "Cryptographie - Données compromises",
-        "description": "Plusieurs messages chiffrés ont été interceptés. Analysez les informations fournies et parvenez à retrouver le flag.",
-        "points": 75,
-        "actif": True,
-        "flag_str": "CTF{r41nb0w_t4bl3s_pwn3d}"
-    },
-    {
-        "id":5,
-        "titre": "OSINT - Surface d'Exposition",
-        "description": "Un site web public semble anodin, mais comme souvent, certaines informations accessibles à tous peuvent révéler davantage qu'il n’y paraît. Explorez intelligemment et retrouvez le flag.",
-        "points": 50,
-        "actif": True,
-        "flag_str": "CTF{H3m_s3cr3t_c1ty_0s1nt}"
-    },
-    {
-        "id":6,
-        "titre": "Upload - Point d’Entrée",
-        "description": "Un simple formulaire peut sembler anodin, mais certaines fonctionnalités cachent parfois plus qu’il n’y paraît. Analysez attentivement son fonctionnement et trouvez un moyen d’en tirer parti pour récupérer le flag.",
-        "points": 125,
-        "actif": True,
-        "flag_str": "CTF{Upl04d_PHP_Sh3ll_M4st3r}"
-    },
-    {
-        "id": 7,
-        "titre": "Stéganographie - Carta Obscura",
-        "description": "Un explorateur a disparu en laissant derrière lui une carte ancienne. Ses collègues affirment qu'il y avait caché un message secret. Les apparences sont trompeuses - regardez entre les lignes… et les pixels.",
-        "points": 150,
-        "actif": True,
-        "flag_str": "CTF{C4rt0_st3g4_ROT13_pwn3d}"
-    },
-    {
-        "id": 8,
-        "titre": "Reverse Engineering - LicenseGuard",
-        "description": "SecureSoft Inc. prétend que leur système de licence est inviolable. Prouve-leur qu'ils ont tort. Trouve le bon serial pour activer le logiciel et récupérer le flag caché à l’intérieur du binaire.",
-        "points": 200,
-        "actif": True,
-        "flag_str": "CTF{py1nst4ll3r_r3v3rs3_m4st3r}"
+        "id": c["id"],
+        "titre": c["titre"],
+        "description": c["description"],
+        "points": c["points"],
+        "actif": c["actif"],
+        "flag_str": c["flag"],
     }
+    for c in read_bundle_file()["challenges"]
 ]
 
 def sync_challenges():
@@ -78,7 +26,7 @@ def sync_challenges():
                 
                 if challenge:
                     print(f"🔄 Mise à jour du challenge : {data['titre']}")
-                    challenge.description = data["titre"]
+                    challenge.titre = data["titre"]
                     challenge.description = data["description"]
                     challenge.points = data["points"]
                     challenge.actif = data["actif"]
@@ -103,6 +51,10 @@ def sync_challenges():
                     new_flag.setFlag(data["flag_str"])
                     db.session.add(new_flag)
 
+            # Le nombre de challenges actifs est affiché au scoreboard,
+            # le catalogue en mémoire des workers est reconstruit
+            versions.bump(versions.SCOREBOARD)
+            versions.bump(versions.CATALOG)
             db.session.commit()
             print("✅ Synchronisation terminée !")
 
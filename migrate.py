@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Script de migration du schéma de CyberCampus CTF
+
+Fonctionnalités :
+- Appliquer les migrations en attente (par défaut)
+- Afficher les migrations appliquées et en attente (--status)
+- Afficher l'index utilisé par chaque requête fréquente et, sous
+  Postgres, les compteurs d'utilisation des index (--indexes)
+
+Lancé par le conteneur avant gunicorn ; sans risque à relancer.
+"""
+
+import sys
+import argparse
+
+from app import app
+from core import migrations
+
+
+# =========================
+# Rapports
+# =========================
+
+def print_status():
+    """Affiche l'état des migrations"""
+    done = migrations.applied_ids()
+    print("\n" + "=" * 60)
+    print("   MIGRATIONS")
+    print("=" * 60)
+    for m in migrations.MIGRATIONS:
+        mark = "✅" if m.id in done else "⏳"
+        print(f"   {mark} {m.id:<28} {m.description}")
+
+
+def print_indexes():
+    """Affiche les plans des requêtes fréquentes et l'utilisation des index"""
+    print("\n" + "=" * 60)
+    print("   REQUÊTES FRÉQUENTES")
+    print("=" * 60)
+    for plan in migrations.query_plans():
+        print(f"\n▶ {plan.label}")
+        for line in plan.plan.splitlines():
+            print(f"   {line}")
+
+    usage = migrations.index_usage()
+    if not usage:
+        print("\nℹ️  Compteurs d'utilisation disponibles sous Postgres uniquement.")
+        return
+    print("\n" + "=" * 60)
+    print("   UTILISATION DES INDEX (pg_stat_user_indexes)")
+    print("=" * 60)
+    for u in usage:
+        unused = "  ⚠️ jamais utilisé" if not u.scans else ""
+        print(f"   {u.table:<22} {u.index:<40} {u.scans:>10} scans"
+              f"  {u.size_bytes // 1024:>8} Ko{unused}")
+
+
+# =========================
+# Main
+# =========================
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Migrations CyberCampus CTF")
+
+    parser.add_argument('--status', action='store_true', help='Afficher les migrations')
+    parser.add_argument('--indexes', action='store_true', help="Rapport d'utilisation des index")
+
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.status:
+            print_status()
+            return
+        if args.indexes:
+            print_indexes()
+            return
+
+        done = migrations.migrate()
+        if done:
+            print(f"✅ {len(done)} migration(s) appliquée(s)")
+        else:
+            print("✅ Schéma à jour")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n❌ Opération annulée.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Erreur de migration : {e}")
+        sys.exit(1)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Script pour recalculer tous les scores de CyberCampus CTF
+
+Fonctionnalités :
+- Afficher les écarts entre scores enregistrés et scores attendus (par défaut)
+- Appliquer les corrections par lots (--apply)
+- Les pénalités d'indices enregistrées sur chaque solve sont conservées
+"""
+
+import sys
+import argparse
+
+from app import app
+from core import reconcile
+
+
+# =========================
+# Rapport
+# =========================
+
+def print_report(report, limit):
+    """Affiche les écarts détectés"""
+    print("\n" + "=" * 60)
+    print("   RECALCUL DES SCORES")
+    print("=" * 60)
+    print(f"Solves à corriger : {len(report.solve_diffs)}")
+    print(f"Scores à corriger : {len(report.score_diffs)}")
+    print("=" * 60)
+
+    for d in report.score_diffs[:limit]:
+        current = "—" if d.current is None else d.current
+        print(f"   {d.pseudo:<20} {current:>6} → {d.expected:<6} (user #{d.user_id})")
+
+    if len(report.score_diffs) > limit:
+        print(f"   ... et {len(report.score_diffs) - limit} autres")
+
+
+# =========================
+# Main
+# =========================
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Recalcul des scores CyberCampus CTF")
+
+    parser.add_argument('--apply', action='store_true', help='Appliquer les corrections')
+    parser.add_argument('--batch-size', type=int, default=reconcile.RECONCILE_BATCH_SIZE,
+                        help='Nombre de lignes par lot')
+    parser.add_argument('--limit', type=int, default=50, help="Nombre d'écarts affichés")
+
+    args = parser.parse_args()
+
+    with app.app_context():
+        report = reconcile.plan()
+        print_report(report, args.limit)
+
+        if not report.solve_diffs and not report.score_diffs:
+            print("\n✅ Tous les scores sont à jour")
+            return
+
+        if not args.apply:
+            print("\nℹ️  Simulation uniquement. Relancez avec --apply pour corriger.")
+            return
+
+        reconcile.apply(report, batch_size=args.batch_size)
+        print("\n✅ Scores recalculés")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n❌ Opération annulée.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Erreur inattendue : {e}")
+        sys.exit(1)
@@ -13,8 +13,8 @@ from datetime import datetime, timedelta
 sys.path.insert(0, '/app')
 
 from app import app
-from core import db
-from core.models import User, Challenge, Flag, Submission, Scoreboard, EmailVerification
+from core import db, versions
+from core.models import User, Challenge, Flag, Submission, Scoreboard, EmailVerification, Solve, ScoreEvent
 
 # ------------------------------
 # DONNÉES FICTIVES
@@ -140,6 +140,7 @@ def seed():
                 taux_reussite = 0.45
 
             points_total = 0
+            solves_user = []
 
             for challenge_id in challenges_a_faire:
                 challenge_info = CHALLENGES[challenge_id]
@@ -177,21 +178,43 @@ def seed():
                         minutes=nb_tentatives_incorrectes * random.randint(5, 45) + random.randint(10, 120)
                     )
 
+                    # Calculer les points avec pénalité
+                    penalty_points = int(base_points * penalty_percent / 100)
+                    final_points = base_points - penalty_points
+                    points_total += final_points
+
                     sub_good = Submission(
                         user_id=user.id,
                         challenge_id=challenge_id,
                         flag_soumis=flag_correct,
                         correct=True,
-                        timestamp=date_succes
+                        timestamp=date_succes,
+                        points_obtenus=final_points
                     )
                     db.session.add(sub_good)
+                    db.session.add(Solve(
+                        user_id=user.id,
+                        challenge_id=challenge_id,
+                        submission=sub_good,
+                        points_awarded=final_points,
+                        hint_penalty=penalty_percent,
+                        solved_at=date_succes
+                    ))
+                    solves_user.append((date_succes, challenge_id, final_points))
                     stats_globales["submissions"] += 1
                     stats_globales["flags_valides"] += 1
 
-                    # Calculer les points avec pénalité
-                    penalty_points = int(base_points * penalty_percent / 100)
-                    final_points = base_points - penalty_points
-                    points_total += final_points
+            # Série des scores (graphe du scoreboard), dans l'ordre chronologique
+            cumul = 0
+            for date_succes, challenge_id, final_points in sorted(solves_user):
+                cumul += final_points
+                db.session.add(ScoreEvent(
+                    user_id=user.id,
+                    challenge_id=challenge_id,
+                    points=final_points,
+                    total_after=cumul,
+                    created_at=date_succes
+                ))
 
             # Créer ou mettre à jour le scoreboard
             if points_total > 0:
@@ -212,6 +235,7 @@ def seed():
             print(f"✅ [{profil}] {pseudo} — {len(challenges_a_faire)} challenges — {points_total} pts")
 
         # Commit final
+        versions.bump(versions.SCOREBOARD)
         db.session.commit()
 
         print()
@@ -4,7 +4,8 @@ CyberCampus CTF — Fixtures de test centralisées
 Ce fichier fournit toutes les fixtures réutilisables pour la suite de tests :
 - Application Flask configurée pour les tests (SQLite en mémoire)
 - Client HTTP de test
-- Utilisateurs (normal, admin, banni)
+- Utilisateurs (normal, admin, banni) et joueurs ayant résolu un challenge
+- Comptage des requêtes SQL
 - Challenges avec flags
 - Soumissions et scoreboard
 """
@@ -12,13 +13,28 @@ Ce fichier fournit toutes les fixtures réutilisables pour la suite de tests :
 import pytest
 import os
 import sys
+from contextlib import contextmanager
+
+from sqlalchemy import event
 
 # Ajouter le répertoire racine au path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import app as flask_app
 from core import db as _db
-from core.models import User, Challenge, Flag, Submission, Scoreboard, RssFeed
+from core.models import (User, Challenge, Flag, Submission, Scoreboard, RssFeed, Solve, ScoreEvent, ChallengeScoring,
+                         UserGroup, GroupMembership, GroupScore, HintReveal)
+from core.ranking import rank_index
+from core.timeline import clear_timeline_cache
+from core.leaderboard import clear_board_cache
+from core.groups import clear_group_cache
+from core.catalog import clear_catalog
+from core.content import clear_content
+from core.progress import clear_progress
+from core.identity import clear_identity
+from core.ratecounter import clear_counters
+from core.security import SecurityEvent, SecurityRollup, SecurityIPRollup, clear_dashboard_stats
+from core import versions, live
 
 
 # ─────────────────────────────────────────────
@@ -35,6 +51,8 @@ def app():
         "SECRET_KEY": "test-secret-key-very-secure",
         "SERVER_NAME": "localhost",
         "LOGIN_DISABLED": False,
+        "SECURITY_EVENTS_SYNC": True,
+        "RATE_COUNTER_PATH": "",
     })
     with flask_app.app_context():
         _db.create_all()
@@ -48,13 +66,35 @@ def clean_db(app):
     """Nettoie la base de données entre chaque test."""
     with app.app_context():
         # Supprimer dans l'ordre pour respecter les FK
+        ScoreEvent.query.delete()
+        HintReveal.query.delete()
+        Solve.query.delete()
         Submission.query.delete()
         Scoreboard.query.delete()
         Flag.query.delete()
+        ChallengeScoring.query.delete()
         Challenge.query.delete()
         RssFeed.query.delete()
+        SecurityEvent.query.delete()
+        SecurityRollup.query.delete()
+        SecurityIPRollup.query.delete()
+        GroupMembership.query.delete()
+        GroupScore.query.delete()
+        UserGroup.query.delete()
         User.query.delete()
         _db.session.commit()
+    rank_index.invalidate()
+    clear_timeline_cache()
+    clear_board_cache()
+    clear_group_cache()
+    clear_catalog()
+    clear_content()
+    clear_progress()
+    clear_identity()
+    clear_counters()
+    clear_dashboard_stats()
+    versions.forget()
+    live.hub.clear()
     yield
 
 
@@ -111,6 +151,27 @@ def banned_user(app):
         return u
 
 
+@pytest.fixture()
+def make_solver(app):
+    """
+    Fabrique de joueurs « solver_<i> », à appeler dans un contexte d'application :
+    make_solver(i, challenge, flag=..., penalty=...) soumet aussi le flag
+    (celui du challenge SQLi par défaut) ; les autres arguments sont des
+    champs de User (country...).
+    """
+    def make(i, challenge=None, flag="CTF{SQL_1nj3ct10n_m4st3r}", penalty=0, **fields):
+        u = User(pseudo=f"solver_{i}", email=f"solver_{i}@test.fr", **fields)
+        u.set_password("Pass123!")
+        _db.session.add(u)
+        _db.session.commit()
+        if challenge is not None:
+            Submission(user_id=u.id, challenge_id=challenge.id,
+                       flag_soumis=flag).enregistrer(penalty_percent=penalty)
+        return u
+
+    return make
+
+
 # ─────────────────────────────────────────────
 # CHALLENGES & FLAGS
 # ─────────────────────────────────────────────
@@ -214,8 +275,51 @@ def auth_client(client, user):
 
 
 @pytest.fixture()
-def admin_client(client, admin_user):
-    """Client connecté en tant qu'administrateur."""
-    client.post("/login", data={"email": "admin@example.com", "password": "adminpass123"},
-                follow_redirects=True)
-    return client
\ No newline at end of file
+def session_client(client, user):
+    """Client connecté via la session Flask-Login (sans passer par le formulaire et son CAPTCHA)."""
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user.id)
+        sess["_fresh"] = True
+    return client
+
+
+@pytest.fixture()
+def admin_client(app, admin_user):
+    """Client administrateur connecté via la session (distinct de `client`, sans CAPTCHA)."""
+    admin = app.test_client()
+    with admin.session_transaction() as sess:
+        sess["_user_id"] = str(admin_user.id)
+        sess["_fresh"] = True
+    return admin
+
+
+# ─────────────────────────────────────────────
+# COMPTAGE DES REQUÊTES SQL
+# ─────────────────────────────────────────────
+
+@pytest.fixture()
+def count_queries(app):
+    """
+    Requêtes SQL exécutées dans un bloc :
+        with count_queries("submission") as statements: ...
+    Sans argument toutes les requêtes sont comptées, sinon celles qui
+    contiennent l'un des mots (insensible à la casse).
+    """
+    with app.app_context():
+        engine = _db.engine
+
+    @contextmanager
+    def counting(*words):
+        statements = []
+
+        def listener(conn, cursor, statement, *args):
+            if not words or any(w in statement.lower() for w in words):
+                statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+    return counting
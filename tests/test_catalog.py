@@ -0,0 +1,98 @@
+"""
+Tests unitaires — Catalogue des challenges en mémoire
+======================================================
+Couvre : contenu du catalogue, reconstruction sur changement de version,
+         vérification des flags, score dynamique
+"""
+
+from core.models import User, Challenge, Submission, ChallengeScoring
+from core.catalog import get_catalog, get_challenge, verify_flag
+from core import db, versions
+
+
+SQLI_FLAG = "CTF{SQL_1nj3ct10n_m4st3r}"
+
+
+class TestCatalog:
+    """Tests du catalogue versionné."""
+
+    def test_entries_and_active_list(self, app, challenge_sqli, challenge_xss, challenge_inactive):
+        """Tous les challenges sont indexés, seuls les actifs sont listés."""
+        with app.app_context():
+            catalog = get_catalog()
+            assert len(catalog) == 3
+            assert [e.id for e in catalog.actifs] == [challenge_sqli.id, challenge_xss.id]
+            entry = get_challenge(challenge_sqli.id)
+            assert (entry.titre, entry.points, entry.dynamique) == ("SQL Injection", 25, False)
+            assert get_challenge(999) is None
+
+    def test_rebuilt_only_on_version_bump(self, app, challenge_sqli):
+        """Une modification n'est visible qu'après l'incrément de la version."""
+        with app.app_context():
+            first = get_catalog()
+            c = db.session.get(Challenge, challenge_sqli.id)
+            c.actif = False
+            db.session.commit()
+            assert get_catalog() is first
+            versions.bump(versions.CATALOG)
+            db.session.commit()
+            assert get_catalog() is not first
+            assert get_catalog().actifs == ()
+
+    def test_verify_flag(self, app, challenge_sqli):
+        """Vérification par le hash du catalogue."""
+        with app.app_context():
+            assert verify_flag(challenge_sqli.id, SQLI_FLAG)
+            assert not verify_flag(challenge_sqli.id, "CTF{wrong}")
+            assert not verify_flag(999, SQLI_FLAG)
+
+    def test_wrong_flag_does_not_load_challenge(self, app, user, challenge_sqli):
+        """Un flag incorrect n'ajoute pas le challenge à la session."""
+        with app.app_context():
+            get_catalog()
+            db.session.expunge_all()
+            sub = Submission(user_id=user.id, challenge_id=challenge_sqli.id, flag_soumis="CTF{nope}")
+            assert sub.enregistrer() is False
+            assert not any(isinstance(o, Challenge) for o in db.session.identity_map.values())
+
+    def test_dynamic_solve_bumps_catalog(self, app, user, challenge_sqli):
+        """Le score dynamique met à jour les points affichés dans le catalogue."""
+        with app.app_context():
+            c = db.session.get(Challenge, challenge_sqli.id)
+            c.scoring = ChallengeScoring(initial=100, minimum=20, decay=3)
+            c.points = 100
+            versions.bump(versions.CATALOG)
+            db.session.commit()
+            assert get_challenge(c.id).points == 100
+            other = User(pseudo="dyn_other", email="dyn_other@test.fr")
+            other.set_password("Pass123!")
+            db.session.add(other)
+            db.session.commit()
+            for solver in (user.id, other.id):
+                Submission(user_id=solver, challenge_id=c.id, flag_soumis=SQLI_FLAG).enregistrer()
+            assert get_challenge(c.id).points == db.session.get(ChallengeScoring, c.id).valeur(2) < 100
+
+
+class TestChallengeList:
+    """Tests de la liste des challenges (cartes précalculées)."""
+
+    def test_solved_and_solve_counts(self, app, session_client, user, admin_user, challenge_sqli, challenge_xss):
+        with app.app_context():
+            for solver in (user.id, admin_user.id):
+                Submission(user_id=solver, challenge_id=challenge_sqli.id, flag_soumis=SQLI_FLAG).enregistrer()
+        html = session_client.get("/challenges").get_data(as_text=True)
+        assert html.count("✓ Résolu") == 1
+        assert "2 solves" in html and "0 solve<" in html
+
+    def test_cached_without_queries(self, session_client, count_queries, challenge_sqli):
+        session_client.get("/challenges")
+        with count_queries("solve", "submission") as statements:
+            resp = session_client.get("/challenges")
+        assert resp.status_code == 200
+        assert statements == []
+
+    def test_refreshed_after_solve(self, app, session_client, user, challenge_sqli):
+        assert "✓ Résolu" not in session_client.get("/challenges").get_data(as_text=True)
+        with app.app_context():
+            Submission(user_id=user.id, challenge_id=challenge_sqli.id, flag_soumis=SQLI_FLAG).enregistrer()
+        assert "✓ Résolu" in session_client.get("/challenges").get_data(as_text=True)
@@ -7,7 +7,7 @@ Couvre : vue challenge, soumission correcte/incorrecte, hints, pénalités,
 
 import pytest
 import json
-from core.models import Submission, Scoreboard, Challenge
+from core.models import Submission, Scoreboard, Challenge, HintReveal, Solve
 from core import db
 
 
@@ -135,6 +135,53 @@ class TestFlagSubmission:
             assert sb.points_total == 50
 
 
+class TestFlagSubmissionApi:
+    """Tests de l'API JSON de soumission."""
+
+    def test_api_correct_flag(self, session_client, app, user, challenge_sqli):
+        """Réponse JSON : points, nouveau score et rang."""
+        resp = session_client.post(f"/api/challenge/{challenge_sqli.id}/submit",
+                                   json={"flag": "CTF{SQL_1nj3ct10n_m4st3r}"})
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data["correct"] is True
+        assert data["first_solve"] is True
+        assert (data["points"], data["score"], data["rank"]) == (25, 25, 1)
+
+    def test_api_already_solved(self, session_client, challenge_sqli):
+        """Un second flag correct ne rapporte rien mais renvoie le score."""
+        for _ in range(2):
+            resp = session_client.post(f"/api/challenge/{challenge_sqli.id}/submit",
+                                       json={"flag": "CTF{SQL_1nj3ct10n_m4st3r}"})
+        data = resp.get_json()
+        assert (data["correct"], data["first_solve"], data["points"]) == (True, False, 0)
+        assert data["score"] == 25
+
+    def test_api_incorrect_flag(self, session_client, app, user, challenge_sqli):
+        """Un flag incorrect est enregistré, sans score."""
+        resp = session_client.post(f"/api/challenge/{challenge_sqli.id}/submit",
+                                   data={"flag": "CTF{wrong_flag}"})
+        data = resp.get_json()
+        assert data["correct"] is False
+        assert "score" not in data
+        with app.app_context():
+            assert Submission.query.filter_by(user_id=user.id, correct=False).count() == 1
+
+    def test_api_errors(self, session_client, challenge_sqli):
+        """Flag vide = 400, challenge inexistant = 404, en JSON."""
+        resp = session_client.post(f"/api/challenge/{challenge_sqli.id}/submit", json={"flag": " "})
+        assert resp.status_code == 400
+        resp = session_client.post("/api/challenge/99999/submit", json={"flag": "CTF{x}"})
+        assert resp.status_code == 404
+        assert resp.get_json()["error"]
+
+    def test_api_requires_login(self, client, challenge_sqli):
+        """Non connecté = 401 en JSON, sans redirection vers la page de login."""
+        resp = client.post(f"/api/challenge/{challenge_sqli.id}/submit", json={"flag": "CTF{x}"})
+        assert resp.status_code == 401
+        assert resp.get_json()["error"]
+
+
 class TestHints:
     """Tests du système d'indices."""
 
@@ -196,4 +243,41 @@ class TestHints:
             sb = Scoreboard.query.filter_by(user_id=user.id).first()
             # 25 points - 10% = 25 - 2 = 23 (mais la logique du code first adds 25 then adjusts)
             assert sb is not None
-            assert sb.points_total <= 25
\ No newline at end of file
+            assert sb.points_total <= 25
+
+class TestHintLedger:
+    """Tests de la table des indices révélés."""
+
+    def test_reveal_recorded_once(self, session_client, app, user, challenge_sqli):
+        """Un indice n'est enregistré qu'une fois ; la pénalité vient d'un SUM."""
+        resp = session_client.post(f"/challenge/{challenge_sqli.id}/hint/0")
+        assert resp.get_json()["total_penalty"] == 10
+        resp = session_client.post(f"/challenge/{challenge_sqli.id}/hint/0")
+        assert resp.status_code == 400
+        session_client.post(f"/challenge/{challenge_sqli.id}/hint/1")
+        with app.app_context():
+            assert HintReveal.indices(user.id, challenge_sqli.id) == [0, 1]
+            assert HintReveal.penalite(user.id, challenge_sqli.id) == 30
+
+    def test_penalty_applied_from_ledger(self, session_client, app, user, challenge_sqli):
+        """La pénalité enregistrée en base s'applique au solve, depuis un autre appareil."""
+        session_client.post(f"/challenge/{challenge_sqli.id}/hint/0")
+        other_device = app.test_client()
+        with other_device.session_transaction() as sess:
+            sess["_user_id"] = str(user.id)
+        data = other_device.post(f"/api/challenge/{challenge_sqli.id}/submit",
+                                   json={"flag": "CTF{SQL_1nj3ct10n_m4st3r}"}).get_json()
+        assert data["points"] == 25 - int(25 * 10 / 100)
+        with app.app_context():
+            assert Solve.query.filter_by(user_id=user.id).one().hint_penalty == 10
+
+    def test_legacy_session_hints_imported(self, session_client, app, user, challenge_sqli):
+        """Les indices stockés dans l'ancien cookie sont repris puis retirés du cookie."""
+        with session_client.session_transaction() as sess:
+            sess["revealed_hints"] = {f"{user.id}_{challenge_sqli.id}": [0, 1], "999_1": [0]}
+        session_client.get("/scoreboard")
+        with session_client.session_transaction() as sess:
+            assert "revealed_hints" not in sess
+        with app.app_context():
+            assert HintReveal.indices(user.id, challenge_sqli.id) == [0, 1]
+            assert HintReveal.query.count() == 2
@@ -0,0 +1,116 @@
+"""
+Tests unitaires — Bundle de contenu des challenges
+===================================================
+Couvre : compilation du fichier livré, rechargement sur changement de date
+         de modification, fichier invalide, action admin, page challenge
+"""
+
+import json
+import os
+
+import pytest
+
+from core.content import (get_bundle, get_challenge_content, reload_bundle, compile_bundle,
+                          read_bundle_file, ContentError, Hint)
+
+
+def _write(path, data, mtime):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+def _bundle(version=1, hints=None):
+    return {"version": version, "challenges": [{
+        "id": 1, "slug": "sqli", "titre": "SQLi", "points": 25, "flag": "CTF{x}",
+        "service": {"url": "/challenges/sqli/", "label": "Ouvrir"}, "learn": "sqli",
+        "hints": hints if hints is not None else [{"text": "Indice", "penalty_percent": 10}],
+    }]}
+
+
+@pytest.fixture()
+def bundle_file(app, tmp_path):
+    """Bundle temporaire relu à chaque appel (pas d'intervalle de vérification)."""
+    path = tmp_path / "challenges.json"
+    _write(path, _bundle(), 1_000_000)
+    previous = (app.config.get("CONTENT_BUNDLE_PATH"), app.config.get("CONTENT_CHECK_INTERVAL"))
+    app.config["CONTENT_BUNDLE_PATH"] = str(path)
+    app.config["CONTENT_CHECK_INTERVAL"] = 0
+    yield path
+    app.config["CONTENT_BUNDLE_PATH"], app.config["CONTENT_CHECK_INTERVAL"] = previous
+
+
+class TestContentBundle:
+    """Tests de la compilation et du rechargement."""
+
+    def test_shipped_bundle_is_valid(self, app):
+        """Le fichier livré couvre les challenges de init_challenges.py."""
+        with app.app_context():
+            bundle = get_bundle()
+            assert len(bundle) == len(read_bundle_file()["challenges"]) >= 8
+            sqli = get_challenge_content(1)
+            assert sqli.service.url == "/challenges/sqli/"
+            assert sqli.hints[0].penalty_percent == 10
+            assert all(f"learn_{c.learn}" in app.view_functions for c in bundle.challenges.values())
+
+    def test_structures_are_immutable(self, app, bundle_file):
+        with app.app_context():
+            content = get_challenge_content(1)
+            assert content.hints == (Hint("Indice", 10),)
+            assert not hasattr(content, "flag")
+            with pytest.raises(TypeError):
+                get_bundle().challenges[2] = content
+
+    def test_reloaded_on_mtime_change(self, app, bundle_file):
+        with app.app_context():
+            first = get_bundle()
+            assert get_bundle() is first
+            _write(bundle_file, _bundle(version=2, hints=[]), 1_000_100)
+            assert get_bundle().version == 2
+            assert get_challenge_content(1).hints == ()
+
+    def test_invalid_file_keeps_previous_bundle(self, app, bundle_file):
+        with app.app_context():
+            first = get_bundle()
+            bundle_file.write_text("{ pas du json", encoding="utf-8")
+            os.utime(bundle_file, (1_000_200, 1_000_200))
+            assert get_bundle() is first
+            with pytest.raises(ValueError):
+                reload_bundle()
+            assert get_bundle() is first
+
+    def test_invalid_reload_leaves_file_untouched(self, app, bundle_file):
+        with app.app_context():
+            first = get_bundle()
+            data = _bundle(version=2)
+            data["challenges"].append(dict(data["challenges"][0]))   # id en double
+            _write(bundle_file, data, 1_000_200)
+            app.config["CONTENT_CHECK_INTERVAL"] = 3600
+            with pytest.raises(ContentError):
+                reload_bundle()
+            assert os.stat(bundle_file).st_mtime == 1_000_200
+            assert get_bundle() is first
+
+    def test_invalid_penalty_rejected(self):
+        with pytest.raises(ContentError):
+            compile_bundle(_bundle(hints=[{"text": "x", "penalty_percent": 150}]))
+
+    def test_admin_reload(self, app, admin_client, bundle_file):
+        with app.app_context():
+            get_bundle()
+        _write(bundle_file, _bundle(version=3), 1_000_300)
+        app.config["CONTENT_CHECK_INTERVAL"] = 3600
+        resp = admin_client.post("/admin/challenges/content/reload")
+        assert resp.status_code == 302
+        with app.app_context():
+            assert get_bundle().version == 3
+
+
+class TestChallengePageContent:
+    """La page challenge affiche le contenu du bundle."""
+
+    def test_service_and_learn_links(self, session_client, challenge_sqli):
+        resp = session_client.get(f"/challenge/{challenge_sqli.id}")
+        html = resp.get_data(as_text=True)
+        assert resp.status_code == 200
+        assert 'href="/challenges/sqli/"' in html
+        assert "/learn/sqli" in html
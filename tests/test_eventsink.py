@@ -0,0 +1,130 @@
+"""
+Tests unitaires — Écriture différée des événements de sécurité
+===============================================================
+Couvre : insertion par lots, fichier de débordement (échec d'insertion,
+         file pleine), reprise, métriques
+"""
+
+import time
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from core.eventsink import EventSink
+from core.security import SecurityEvent, SecurityIPRollup, SecurityRollup
+
+
+def _row(i=0):
+    from datetime import datetime
+    return dict(event_type=SecurityEvent.FLAG_FAIL, ip_address="10.0.0.1", user_id=None,
+                user_agent="pytest", path="/challenge/1/submit", extra=None,
+                timestamp=datetime(2026, 1, 1, 12, 0, i % 60))
+
+
+def _create_tables(engine):
+    for model in (SecurityEvent, SecurityRollup, SecurityIPRollup):
+        model.__table__.create(engine)
+
+
+def _count(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(SecurityEvent.__table__)).scalar()
+
+
+def _wait(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+@pytest.fixture()
+def sink_config(app, tmp_path):
+    keys = ("SECURITY_EVENT_SPILL_DIR", "SECURITY_EVENT_FLUSH_MS", "SECURITY_EVENT_QUEUE_SIZE")
+    previous = {k: app.config.get(k) for k in keys}
+    app.config.update(SECURITY_EVENT_SPILL_DIR=str(tmp_path / "spill"),
+                      SECURITY_EVENT_FLUSH_MS=20, SECURITY_EVENT_QUEUE_SIZE=100)
+    yield tmp_path
+    app.config.update(previous)
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'events.db'}")
+    _create_tables(engine)
+    yield engine
+    engine.dispose()
+
+
+class TestEventSink:
+    """Tests du flusher."""
+
+    def test_batched_insert(self, app, sink_config, engine):
+        sink = EventSink()
+        sink.start(app, engine=engine)
+        try:
+            for i in range(50):
+                sink.put(_row(i))
+            assert _wait(lambda: _count(engine) == 50)
+            metrics = sink.metrics()
+            assert metrics["written"] == 50 and metrics["batches"] < 50
+            with engine.connect() as conn:
+                rollup = conn.execute(select(SecurityRollup.count)).scalars().all()
+            assert sum(rollup) == 50
+        finally:
+            sink.stop()
+
+    def test_failed_insert_spills_then_replays(self, app, sink_config, tmp_path):
+        broken = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+        sink = EventSink()
+        sink.start(app, engine=broken)
+        try:
+            for i in range(5):
+                sink.put(_row(i))
+            assert _wait(lambda: sink.metrics()["spilled"] == 5)
+            assert sink.metrics()["failures"] >= 1
+            assert sink.metrics()["last_error"] == "OperationalError"
+            _create_tables(broken)
+            assert _wait(lambda: _count(broken) == 5)
+            assert sink.metrics()["replayed"] == 5
+        finally:
+            sink.stop()
+            broken.dispose()
+
+    def test_full_queue_spills_then_replayed_on_restart(self, app, sink_config, engine):
+        sink = EventSink()
+        sink.start(app, engine=engine)
+        sink.stop()
+        # Flusher arrêté : la file (100 places) se remplit, le reste déborde
+        for i in range(120):
+            sink.put(_row(i))
+        metrics = sink.metrics()
+        assert metrics["queue_depth"] == 100
+        assert metrics["spilled"] == 20 and metrics["spill_bytes"] > 0
+        restarted = EventSink()
+        restarted.start(app, engine=engine)
+        try:
+            assert _wait(lambda: _count(engine) == 20)
+            assert restarted.metrics()["replayed"] == 20
+        finally:
+            restarted.stop()
+
+
+class TestSyncMode:
+    """En test, SecurityEvent.log écrit immédiatement dans la session."""
+
+    def test_log_sync(self, app):
+        with app.test_request_context("/login"):
+            ev = SecurityEvent.log(SecurityEvent.LOGIN_FAIL, ip="1.2.3.4")
+            assert ev is not None and ev.id is not None
+
+
+class TestLiveStats:
+    """Les métriques du flusher ne sont servies qu'aux administrateurs."""
+
+    def test_player_denied(self, session_client):
+        resp = session_client.get("/admin/security/live-stats")
+        assert resp.status_code == 302
+        assert "event_sink" not in resp.get_data(as_text=True)
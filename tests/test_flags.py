@@ -0,0 +1,83 @@
+"""
+Tests unitaires — Flags personnalisés par joueur
+=================================================
+Couvre : dérivation HMAC, vérification, détection du partage de flag,
+         soumission sur un challenge en mode flag personnalisé
+"""
+
+import pytest
+from core.models import Submission, Solve
+from core.flags import derive_flag, check_flag, per_user_enabled
+from core import db
+
+
+SQLI_FLAG = "CTF{SQL_1nj3ct10n_m4st3r}"
+
+
+@pytest.fixture()
+def per_user(app, challenge_sqli):
+    """Active les flags personnalisés pour le challenge SQLi."""
+    previous = (app.config.get("FLAG_HMAC_SECRET"), app.config.get("PER_USER_FLAG_CHALLENGES"))
+    app.config["FLAG_HMAC_SECRET"] = "test-flag-secret"
+    app.config["PER_USER_FLAG_CHALLENGES"] = frozenset({challenge_sqli.id})
+    yield challenge_sqli
+    app.config["FLAG_HMAC_SECRET"], app.config["PER_USER_FLAG_CHALLENGES"] = previous
+
+
+class TestDerivedFlags:
+    """Tests de la dérivation et de la vérification."""
+
+    def test_disabled_without_secret(self, app, challenge_sqli):
+        with app.app_context():
+            assert not per_user_enabled(challenge_sqli.id)
+
+    def test_flag_is_per_user_and_challenge(self, app, per_user):
+        with app.app_context():
+            assert per_user_enabled(per_user.id)
+            flag = derive_flag(per_user.id, 1)
+            assert flag.startswith("CTF{u1_")
+            assert flag == derive_flag(per_user.id, 1)
+            assert flag != derive_flag(per_user.id, 2)
+            assert flag != derive_flag(per_user.id + 1, 1)
+
+    def test_check_own_flag(self, app, per_user):
+        with app.app_context():
+            assert check_flag(per_user.id, 7, derive_flag(per_user.id, 7)) == (True, 7)
+
+    def test_check_detects_other_user_flag(self, app, per_user):
+        """Le flag valide d'un autre joueur est refusé mais attribué."""
+        with app.app_context():
+            assert check_flag(per_user.id, 7, derive_flag(per_user.id, 8)) == (False, 8)
+
+    def test_check_rejects_forged_flag(self, app, per_user):
+        with app.app_context():
+            forged = derive_flag(per_user.id, 8).replace("CTF{u8_", "CTF{u7_")
+            assert check_flag(per_user.id, 7, forged) == (False, None)
+            assert check_flag(per_user.id, 7, SQLI_FLAG) == (False, None)
+
+
+class TestDerivedFlagSubmission:
+    """Tests de la soumission en mode flag personnalisé."""
+
+    def test_own_flag_solves(self, app, user, per_user):
+        with app.app_context():
+            sub = Submission(user_id=user.id, challenge_id=per_user.id,
+                             flag_soumis=derive_flag(per_user.id, user.id))
+            assert sub.enregistrer() is True
+            assert not sub.flag_partage
+            assert Solve.query.filter_by(user_id=user.id).count() == 1
+
+    def test_static_flag_refused(self, app, user, per_user):
+        """Le flag commun ne suffit plus."""
+        with app.app_context():
+            sub = Submission(user_id=user.id, challenge_id=per_user.id, flag_soumis=SQLI_FLAG)
+            assert sub.enregistrer() is False
+
+    def test_shared_flag_flagged(self, app, user, admin_user, per_user):
+        with app.app_context():
+            sub = Submission(user_id=user.id, challenge_id=per_user.id,
+                             flag_soumis=derive_flag(per_user.id, admin_user.id))
+            assert sub.enregistrer() is False
+            assert sub.flag_partage
+            assert sub.flag_owner_id == admin_user.id
+            assert db.session.query(Solve).count() == 0
@@ -0,0 +1,178 @@
+"""
+Tests unitaires — Classements par groupe
+=========================================
+Couvre : agrégats au solve, arrivée / départ d'un membre, meilleur membre,
+         recalcul complet, classement servi depuis les agrégats
+"""
+
+import pytest
+from itsdangerous import URLSafeTimedSerializer
+
+from core.models import User, Submission, UserGroup, GroupMembership, GroupScore
+from core.groups import group_leaderboard
+from core import db
+
+
+SQLI_FLAG = "CTF{SQL_1nj3ct10n_m4st3r}"
+XSS_FLAG = "CTF{XSS_r3fl3ct3d_pwn3d}"
+
+
+def _solve(user, challenge, flag):
+    Submission(user_id=user.id, challenge_id=challenge.id, flag_soumis=flag).enregistrer()
+
+
+def _score(kind, name):
+    group = UserGroup.query.filter_by(kind=kind, name=name).one()
+    db.session.expire_all()
+    return db.session.get(GroupScore, group.id)
+
+
+class TestGroupAggregates:
+    """Tests des agrégats matérialisés."""
+
+    def test_solve_updates_group(self, app, challenge_sqli, challenge_xss, make_solver):
+        """Un solve ajoute ses points et un solve au groupe du joueur."""
+        with app.app_context():
+            a, b = make_solver(0), make_solver(1)
+            GroupMembership.definir(a.id, "school", "IUT Vannes")
+            GroupMembership.definir(b.id, "school", "IUT Vannes")
+            db.session.commit()
+            _solve(a, challenge_sqli, SQLI_FLAG)
+            _solve(a, challenge_xss, XSS_FLAG)
+            _solve(b, challenge_sqli, SQLI_FLAG)
+            score = _score("school", "IUT Vannes")
+            assert (score.points_total, score.solve_count, score.member_count) == (75, 3, 2)
+            assert (score.top_user_id, score.top_points) == (a.id, 50)
+
+    def test_join_adds_existing_score(self, app, challenge_sqli, make_solver):
+        """Un joueur qui rejoint un groupe y apporte son score et ses solves."""
+        with app.app_context():
+            a = make_solver(0)
+            _solve(a, challenge_sqli, SQLI_FLAG)
+            GroupMembership.definir(a.id, "team", "Rootkit")
+            db.session.commit()
+            score = _score("team", "Rootkit")
+            assert (score.points_total, score.solve_count, score.member_count) == (25, 1, 1)
+            assert score.top_user_id == a.id
+
+    def test_leave_recomputes_top_member(self, app, challenge_sqli, challenge_xss, make_solver):
+        """Au départ du meilleur membre, le suivant prend sa place."""
+        with app.app_context():
+            a, b = make_solver(0), make_solver(1)
+            for u in (a, b):
+                GroupMembership.definir(u.id, "team", "Rootkit")
+            db.session.commit()
+            _solve(a, challenge_sqli, SQLI_FLAG)
+            _solve(a, challenge_xss, XSS_FLAG)
+            _solve(b, challenge_sqli, SQLI_FLAG)
+            assert GroupMembership.definir(a.id, "team", "Autre")
+            db.session.commit()
+            score = _score("team", "Rootkit")
+            assert (score.points_total, score.member_count, score.top_user_id) == (25, 1, b.id)
+            assert _score("team", "Autre").points_total == 50
+
+    def test_same_group_is_noop(self, app, make_solver):
+        """Redéfinir le même groupe ne change rien."""
+        with app.app_context():
+            a = make_solver(0)
+            assert GroupMembership.definir(a.id, "country", "France")
+            db.session.commit()
+            assert not GroupMembership.definir(a.id, "country", "France")
+            assert GroupMembership.query.filter_by(user_id=a.id).count() == 1
+
+    def test_recalculer_matches_incremental(self, app, challenge_sqli, challenge_xss, make_solver):
+        """Le recalcul complet retrouve les agrégats tenus au fil de l'eau."""
+        with app.app_context():
+            users = [make_solver(i) for i in range(3)]
+            for u in users:
+                GroupMembership.definir(u.id, "country", "France")
+            db.session.commit()
+            _solve(users[0], challenge_sqli, SQLI_FLAG)
+            _solve(users[1], challenge_sqli, SQLI_FLAG)
+            _solve(users[1], challenge_xss, XSS_FLAG)
+            before = _score("country", "France")
+            before = (before.points_total, before.solve_count, before.member_count,
+                      before.top_user_id, before.top_points)
+            GroupScore.recalculer()
+            db.session.commit()
+            after = _score("country", "France")
+            assert (after.points_total, after.solve_count, after.member_count,
+                    after.top_user_id, after.top_points) == before
+
+    def test_backfill_countries(self, app, make_solver):
+        """Les pays déjà renseignés deviennent des appartenances."""
+        with app.app_context():
+            a = make_solver(0)
+            a.country = "Belgique"
+            db.session.commit()
+            assert GroupMembership.backfill() == 1
+            assert GroupMembership.backfill() == 0
+            assert _score("country", "Belgique").member_count == 1
+
+
+class TestGroupLeaderboard:
+    """Tests du classement par groupe."""
+
+    def test_order_and_cache(self, app, challenge_sqli, challenge_xss, make_solver):
+        """Classement par points, relu après un solve (version du scoreboard)."""
+        with app.app_context():
+            a, b = make_solver(0), make_solver(1)
+            GroupMembership.definir(a.id, "school", "ENSIBS")
+            GroupMembership.definir(b.id, "school", "EPITA")
+            db.session.commit()
+            _solve(a, challenge_sqli, SQLI_FLAG)
+            assert [r.name for r in group_leaderboard("school")] == ["ENSIBS", "EPITA"]
+            _solve(b, challenge_sqli, SQLI_FLAG)
+            _solve(b, challenge_xss, XSS_FLAG)
+            rows = group_leaderboard("school")
+            assert [(r.rank, r.name, r.points) for r in rows] == [(1, "EPITA", 50), (2, "ENSIBS", 25)]
+            assert rows[0].top_pseudo == "solver_1"
+
+    def test_groups_page(self, client, app, make_solver):
+        """La page affiche le classement du type demandé."""
+        with app.app_context():
+            a = make_solver(0)
+            GroupMembership.definir(a.id, "team", "Rootkit")
+            db.session.commit()
+        response = client.get("/scoreboard/groups?kind=team")
+        assert response.status_code == 200
+        assert "Rootkit" in response.get_data(as_text=True)
+
+
+class TestAccountDeletion:
+    """Suppression d'un compte meilleur membre, clés étrangères vérifiées (comme Postgres)."""
+
+    @pytest.fixture()
+    def foreign_keys(self, app):
+        with app.app_context():
+            db.session.execute(db.text("PRAGMA foreign_keys=ON"))
+            db.session.commit()
+        yield
+        with app.app_context():
+            db.session.execute(db.text("PRAGMA foreign_keys=OFF"))
+            db.session.commit()
+
+    def test_delete_top_member(self, app, session_client, user, challenge_sqli, challenge_xss,
+                               foreign_keys, make_solver):
+        with app.app_context():
+            me, other = db.session.get(User, user.id), make_solver(0)
+            user_id, other_id = me.id, other.id
+            GroupMembership.definir(user_id, "team", "Rootkit")
+            GroupMembership.definir(other_id, "team", "Rootkit")
+            db.session.commit()
+            _solve(me, challenge_sqli, SQLI_FLAG)
+            _solve(me, challenge_xss, XSS_FLAG)
+            _solve(other, challenge_sqli, SQLI_FLAG)
+            assert _score("team", "Rootkit").top_user_id == user_id
+            token = URLSafeTimedSerializer(app.config["SECRET_KEY"]).dumps(
+                me.email, salt="delete-account")
+
+        resp = session_client.post(f"/account/delete/confirm/{token}", data={
+            "password": "password123", "confirm_password": "password123",
+        })
+        assert resp.status_code == 302
+
+        with app.app_context():
+            assert db.session.get(User, user_id) is None
+            score = _score("team", "Rootkit")
+            assert (score.top_user_id, score.member_count, score.points_total) == (other_id, 1, 25)
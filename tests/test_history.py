@@ -0,0 +1,93 @@
+"""
+Tests unitaires — Historique des soumissions
+=============================================
+Couvre : compteurs SQL, pagination par clé, filtres, export CSV/NDJSON en flux
+"""
+
+import json
+from datetime import datetime, timedelta
+
+from core.models import Submission
+from core.history import history_page, history_stats, iter_history
+from core import db
+
+
+SQLI_FLAG = "CTF{SQL_1nj3ct10n_m4st3r}"
+
+
+def _fill(user, challenge, count, correct_every=0):
+    """count soumissions espacées d'une minute (les plus récentes en dernier)."""
+    start = datetime(2026, 1, 1)
+    for i in range(count):
+        db.session.add(Submission(
+            user_id=user.id, challenge_id=challenge.id, flag_soumis=f"CTF{{try_{i}}}",
+            correct=bool(correct_every) and i % correct_every == 0,
+            timestamp=start + timedelta(minutes=i),
+        ))
+    db.session.commit()
+
+
+class TestHistoryQueries:
+    """Tests des requêtes de l'historique."""
+
+    def test_stats(self, app, user, challenge_sqli):
+        with app.app_context():
+            _fill(user, challenge_sqli, 10, correct_every=5)
+            assert history_stats(user.id) == (10, 2, 8)
+
+    def test_keyset_pages_cover_everything_once(self, app, user, challenge_sqli):
+        with app.app_context():
+            _fill(user, challenge_sqli, 23)
+            seen, cursor = [], None
+            while True:
+                rows, cursor = history_page(user.id, after=cursor, limit=10)
+                seen.extend(r.id for r in rows)
+                if cursor is None:
+                    break
+            assert len(seen) == len(set(seen)) == 23
+            assert rows[-1].flag_soumis == "CTF{try_0}"
+
+    def test_filter_and_invalid_cursor(self, app, user, challenge_sqli):
+        with app.app_context():
+            _fill(user, challenge_sqli, 10, correct_every=5)
+            rows, cursor = history_page(user.id, filtre="correct")
+            assert [r.correct for r in rows] == [True, True] and cursor is None
+            assert len(history_page(user.id, after="n'importe quoi")[0]) == 10
+
+    def test_iter_history_batches(self, app, user, challenge_sqli):
+        with app.app_context():
+            _fill(user, challenge_sqli, 12)
+            assert len(list(iter_history(user.id, batch=5))) == 12
+
+
+class TestHistoryRoutes:
+    """Tests des routes /history."""
+
+    def test_history_page(self, app, session_client, user, challenge_sqli):
+        with app.app_context():
+            _fill(user, challenge_sqli, 60)
+        html = session_client.get("/history").get_data(as_text=True)
+        assert "Toutes (60)" in html
+        assert html.count('class="hist-item') == 50
+        assert "Plus anciennes" in html
+
+    def test_export_csv(self, app, session_client, user, challenge_sqli):
+        with app.app_context():
+            _fill(user, challenge_sqli, 3)
+        resp = session_client.get("/history/export.csv")
+        assert resp.status_code == 200
+        assert resp.is_streamed
+        lines = resp.get_data(as_text=True).strip().splitlines()
+        assert lines[0] == "date,challenge_id,challenge,flag,correct,points"
+        assert len(lines) == 4
+
+    def test_export_ndjson(self, app, session_client, user, challenge_sqli):
+        with app.app_context():
+            _fill(user, challenge_sqli, 3)
+        resp = session_client.get("/history/export.ndjson")
+        records = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+        assert [r["flag"] for r in records] == ["CTF{try_2}", "CTF{try_1}", "CTF{try_0}"]
+        assert records[0]["challenge"] == "SQL Injection"
+
+    def test_unknown_format(self, session_client):
+        assert session_client.get("/history/export.xml").status_code == 404
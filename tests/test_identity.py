@@ -0,0 +1,60 @@
+"""
+Tests unitaires — Identité en cache (Flask-Login)
+==================================================
+Couvre : /auth/check sans requête en base, chargement à la demande de
+         l'entité User, invalidation au bannissement et à la suppression
+"""
+
+from core.models import User
+from core.identity import load_user, CachedUser
+from core import db, identity
+
+
+class TestCachedUser:
+    """Tests de l'instantané."""
+
+    def test_snapshot_fields_and_lazy_entity(self, app, count_queries, user):
+        with app.app_context():
+            cached = load_user(user.id)
+            assert isinstance(cached, CachedUser)
+            with count_queries() as statements:
+                load_user(user.id).pseudo
+            assert statements == []
+            assert cached.email == "test@example.com"
+            assert cached.score == 0
+            assert cached == db.session.get(User, user.id)
+
+    def test_writes_go_to_entity(self, app, user):
+        with app.app_context():
+            cached = load_user(user.id)
+            cached.country = "France"
+            db.session.commit()
+            assert db.session.get(User, user.id).country == "France"
+
+    def test_unknown_user(self, app):
+        with app.app_context():
+            assert load_user(999) is None
+
+
+class TestAuthCheck:
+    """Tests de /auth/check."""
+
+    def test_auth_check_without_queries(self, session_client, count_queries):
+        assert session_client.get("/auth/check").status_code == 200
+        with count_queries() as statements:
+            resp = session_client.get("/auth/check")
+        assert resp.status_code == 200
+        assert statements == []
+
+    def test_admin_ban_invalidates(self, session_client, admin_client, user):
+        assert session_client.get("/auth/check").status_code == 200
+        admin_client.post(f"/admin/users/{user.id}/ban")
+        assert session_client.get("/auth/check").status_code == 403
+
+    def test_deleted_user_logged_out(self, app, session_client, user):
+        assert session_client.get("/auth/check").status_code == 200
+        with app.app_context():
+            db.session.delete(db.session.get(User, user.id))
+            identity.invalidate()
+            db.session.commit()
+        assert session_client.get("/auth/check").status_code == 401
@@ -0,0 +1,147 @@
+"""
+Tests unitaires — Scoreboard en direct (SSE)
+===============================================
+Couvre : buffer d'événements, rejeu Last-Event-ID, reset, plafond de flux,
+         publication des solves, diffusion entre workers
+"""
+
+import json
+import os
+import runpy
+import socket
+import pytest
+from core.live import LiveHub, LiveEvent, format_event
+from core import live
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestLiveHub:
+    """Tests du buffer d'événements d'un worker."""
+
+    def test_events_kept_in_id_order(self):
+        """Les événements arrivés dans le désordre sont rangés par id, sans doublon."""
+        hub = LiveHub()
+        hub.init_floor(0)
+        for event_id in (2, 1, 3, 2):
+            hub.publish(event_id, "solve", "{}")
+        assert [e.id for e in hub.since(0)] == [1, 2, 3]
+
+    def test_replay_after_last_event_id(self):
+        """Une reconnexion ne reçoit que les événements postérieurs."""
+        hub = LiveHub()
+        hub.init_floor(0)
+        for event_id in range(1, 6):
+            hub.publish(event_id, "solve", "{}")
+        assert [e.id for e in hub.since(3)] == [4, 5]
+
+    def test_reset_when_history_evicted(self):
+        """Si le buffer ne remonte pas assez loin, since() renvoie None."""
+        hub = LiveHub(size=3)
+        hub.init_floor(0)
+        for event_id in range(1, 6):
+            hub.publish(event_id, "solve", "{}")
+        assert hub.since(1) is None
+        assert [e.id for e in hub.since(2)] == [3, 4, 5]
+
+    def test_wait_times_out_without_event(self):
+        """wait() rend la main (heartbeat) sans événement."""
+        hub = LiveHub()
+        assert hub.wait(0, 0.01) == []
+
+    def test_client_cap(self):
+        """Le nombre de flux par worker est plafonné."""
+        hub = LiveHub()
+        assert hub.acquire(1)
+        assert not hub.acquire(1)
+        hub.release()
+        assert hub.acquire(1)
+
+    def test_format_event(self):
+        """Format text/event-stream avec id pour Last-Event-ID."""
+        assert format_event(LiveEvent(7, "solve", '{"a":1}')) == 'id: 7\nevent: solve\ndata: {"a":1}\n\n'
+
+
+class TestLivePublication:
+    """Tests de la publication des solves et du flux."""
+
+    def test_solve_publishes_first_blood(self, app, challenge_sqli, make_solver):
+        """Le premier solve d'un challenge est un first blood, pas le second."""
+        with app.app_context():
+            first = make_solver(0, challenge_sqli)
+            make_solver(1, challenge_sqli)
+            events = [json.loads(e.data) for e in live.hub.since(live.hub.floor)]
+            assert [e["pseudo"] for e in events] == ["solver_0", "solver_1"]
+            assert [e["first_blood"] for e in events] == [True, False]
+            assert events[0]["user_id"] == first.id
+            assert events[0]["total"] == 25
+
+    def test_stream_replays_missed_events(self, app, challenge_sqli, make_solver):
+        """Le flux rejoue les solves postérieurs au Last-Event-ID."""
+        with app.app_context():
+            make_solver(0, challenge_sqli)
+            first_id = live.hub.newest()
+            make_solver(1, challenge_sqli)
+            stream = live.open_stream(str(first_id))
+            assert next(stream).startswith("retry:")
+            replay = next(stream)
+            stream.close()
+            assert replay.startswith(f"id: {first_id + 1}\nevent: solve")
+            assert '"pseudo":"solver_1"' in replay
+            assert live.hub.clients == 0
+
+    def test_head_and_unstarted_streams_release_slot(self, client, app):
+        """HEAD ou client parti avant le premier octet : la place est rendue."""
+        for _ in range(3):
+            with client.head("/scoreboard/stream") as response:   # fermée comme par gunicorn
+                assert response.status_code == 200
+        assert live.hub.clients == 0
+        with app.app_context():
+            stream = live.open_stream()
+        assert live.hub.clients == 1
+        stream.close()
+        stream.close()
+        assert live.hub.clients == 0
+
+    def test_stream_capped(self, client, app):
+        """Au-delà de LIVE_MAX_CLIENTS, le flux répond 503."""
+        previous = app.config["LIVE_MAX_CLIENTS"]
+        app.config["LIVE_MAX_CLIENTS"] = 0
+        try:
+            response = client.get("/scoreboard/stream")
+        finally:
+            app.config["LIVE_MAX_CLIENTS"] = previous
+        assert response.status_code == 503
+        assert response.headers["Retry-After"]
+
+    def test_cap_leaves_threads_for_requests(self, app):
+        """Les flux ne peuvent pas occuper tous les threads du worker gunicorn."""
+        gunicorn_conf = runpy.run_path(os.path.join(ROOT, "gunicorn.conf.py"))
+        assert gunicorn_conf["threads"] == app.config["WEB_THREADS"]
+        assert gunicorn_conf["workers"] == app.config["WEB_WORKERS"]
+        cap = live.max_clients(app.config)
+        assert 0 < cap <= gunicorn_conf["threads"] - app.config["LIVE_THREAD_RESERVE"]
+        # Même configuré au-delà, le plafond reste sous le nombre de threads
+        assert live.max_clients({**app.config, "LIVE_MAX_CLIENTS": 100}) == cap
+
+    @pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="sockets Unix indisponibles")
+    def test_fanout_to_other_worker(self, app, challenge_sqli, tmp_path, make_solver):
+        """Le solve est envoyé par datagramme aux sockets des autres workers."""
+        directory = str(tmp_path)
+        peer = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        peer.bind(os.path.join(directory, "worker-999999.sock"))
+        peer.settimeout(2)
+        previous = app.config.get("LIVE_SOCKET_DIR")
+        app.config["LIVE_SOCKET_DIR"] = directory
+        live._fanout.__init__()
+        try:
+            with app.app_context():
+                make_solver(0, challenge_sqli)
+            message = json.loads(peer.recv(65536))
+        finally:
+            app.config["LIVE_SOCKET_DIR"] = previous
+            live._fanout.__init__()
+            peer.close()
+        assert message["event"] == "solve"
+        assert json.loads(message["data"])["pseudo"] == "solver_0"
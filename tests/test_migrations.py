@@ -0,0 +1,90 @@
+"""
+Tests unitaires — Migrations du schéma
+=======================================
+Couvre : application sur une base existante, enregistrement et
+         idempotence, index des requêtes fréquentes, doublons du scoreboard,
+         rapport des plans
+"""
+
+import pytest
+from sqlalchemy import inspect
+
+from core import db, migrations
+from core.migrations import SchemaMigration
+from core.models import Scoreboard, Submission
+
+
+@pytest.fixture()
+def fresh_history(app):
+    """Base créée par l'ancien create_all : aucune migration enregistrée."""
+    with app.app_context():
+        SchemaMigration.__table__.drop(db.engine, checkfirst=True)
+        yield
+        SchemaMigration.query.delete()
+        db.session.commit()
+
+
+def _indexes(table):
+    return {ix["name"] for ix in inspect(db.engine).get_indexes(table)}
+
+
+class TestMigrate:
+    """Tests de l'exécution."""
+
+    def test_existing_database_gets_indexes(self, app, fresh_history):
+        with app.app_context():
+            db.session.execute(db.text("DROP INDEX ix_scoreboard_points_total"))
+            db.session.execute(db.text("DROP INDEX ix_security_event_ip_type_time"))
+            db.session.execute(db.text("DROP INDEX ix_submission_user_time"))
+            db.session.commit()
+            done = migrations.migrate(log=lambda *_: None)
+            assert done == [m.id for m in migrations.MIGRATIONS]
+            assert "ix_scoreboard_points_total" in _indexes("scoreboard")
+            assert "ix_security_event_ip_type_time" in _indexes("security_event")
+            assert "ix_submission_user_challenge_correct" in _indexes("submission")
+            assert "ix_submission_user_time" in _indexes("submission")
+
+    def test_baseline_leaves_existing_tables(self, app, fresh_history):
+        with app.app_context():
+            db.session.execute(db.text("DROP INDEX ix_scoreboard_points_total"))
+            db.session.commit()
+            migrations.MIGRATIONS[0].apply()
+            assert "ix_scoreboard_points_total" not in _indexes("scoreboard")
+            migrations.migrate(log=lambda *_: None)
+            assert "ix_scoreboard_points_total" in _indexes("scoreboard")
+
+    def test_scoreboard_duplicates_merged(self, app, fresh_history, user, challenge_sqli):
+        with app.app_context():
+            Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                       flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}").enregistrer()
+            db.session.execute(db.text("DROP INDEX uq_scoreboard_user_id"))
+            db.session.add_all([Scoreboard(user_id=user.id, points_total=7),
+                                Scoreboard(user_id=user.id, points_total=3)])
+            db.session.commit()
+            migrations.migrate(log=lambda *_: None)
+            (row,) = Scoreboard.query.filter_by(user_id=user.id).all()
+            assert row.points_total == challenge_sqli.points
+            assert any(ix["name"] == "uq_scoreboard_user_id" and ix["unique"]
+                       for ix in inspect(db.engine).get_indexes("scoreboard"))
+
+    def test_rerun_is_noop(self, app, fresh_history):
+        with app.app_context():
+            migrations.migrate(log=lambda *_: None)
+            assert migrations.pending() == []
+            assert migrations.migrate(log=lambda *_: None) == []
+            assert SchemaMigration.query.count() == len(migrations.MIGRATIONS)
+
+    def test_migration_ids_unique_and_ordered(self):
+        ids = [m.id for m in migrations.MIGRATIONS]
+        assert ids == sorted(set(ids))
+
+
+class TestIndexReport:
+    """Tests du rapport d'index."""
+
+    def test_hot_queries_use_indexes(self, app):
+        with app.app_context():
+            plans = {p.label: p.plan for p in migrations.query_plans()}
+            assert "ix_security_event_ip_type_time" in plans["Repli brute-force (IP, type, fenêtre)"]
+            assert "ix_scoreboard_points_total" in plans["Top du classement"]
+            assert migrations.index_usage() == []   # SQLite : pas de compteurs
@@ -1,13 +1,13 @@
 """
 Tests unitaires — Modèles de données
 ======================================
-Couvre : User, Challenge, Flag, Submission, Scoreboard, RssFeed
+Couvre : User, Challenge, ChallengeScoring, Flag, Submission, Scoreboard, RssFeed
 """
 
 import pytest
 import hashlib
 from core import db
-from core.models import User, Challenge, Flag, Submission, Scoreboard, RssFeed
+from core.models import User, Challenge, Flag, Submission, Scoreboard, RssFeed, Solve, ChallengeScoring, ScoreEvent
 
 
 # ═══════════════════════════════════════════════
@@ -82,6 +82,31 @@ class TestUserModel:
             assert len(solved) == 1
             assert solved[0].id == challenge_sqli.id
 
+    def test_has_solved_reads_solve_table(self, app, user, challenge_sqli, challenge_xss):
+        """L'état résolu vient uniquement de la table solve, pas des soumissions."""
+        with app.app_context():
+            Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                       flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}").enregistrer()
+            # Soumission correcte orpheline (sans solve) : ignorée par les lectures
+            db.session.add(Submission(user_id=user.id, challenge_id=challenge_xss.id,
+                                      flag_soumis="x", correct=True))
+            db.session.commit()
+            u = User.query.get(user.id)
+            assert u.has_solved(challenge_sqli.id) is True
+            assert u.has_solved(challenge_xss.id) is False
+            assert u.get_solved_ids() == {challenge_sqli.id}
+
+    def test_in_progress_excludes_solved(self, app, user, challenge_sqli, challenge_xss):
+        """Un challenge résolu après des erreurs n'est plus en cours."""
+        with app.app_context():
+            for flag in ("CTF{wrong}", "CTF{SQL_1nj3ct10n_m4st3r}"):
+                Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                           flag_soumis=flag).enregistrer()
+            Submission(user_id=user.id, challenge_id=challenge_xss.id,
+                       flag_soumis="CTF{wrong}").enregistrer()
+            u = User.query.get(user.id)
+            assert [c.id for c in u.get_in_progress_challenges()] == [challenge_xss.id]
+
     def test_get_in_progress_challenges(self, app, user, challenge_sqli):
         """Challenge tenté mais non résolu = in progress."""
         with app.app_context():
@@ -159,6 +184,78 @@ class TestChallengeModel:
             assert Flag.query.filter_by(challenge_id=challenge_sqli.id).count() == 0
 
 
+# ═══════════════════════════════════════════════
+#  SCORE DYNAMIQUE
+# ═══════════════════════════════════════════════
+
+class TestChallengeScoring:
+    """Tests du score dynamique (décroissance avec les solves)."""
+
+    def _dynamic(self, challenge, initial=100, minimum=20, decay=3):
+        c = db.session.get(Challenge, challenge.id)
+        c.scoring = ChallengeScoring(initial=initial, minimum=minimum, decay=decay)
+        c.points = initial
+        db.session.commit()
+        return c
+
+    def test_valeur_decays_to_minimum(self):
+        """Le premier solveur touche la valeur initiale, puis décroissance jusqu'au minimum."""
+        scoring = ChallengeScoring(initial=100, minimum=20, decay=3)
+        assert scoring.valeur(1) == 100
+        assert scoring.valeur(2) == 92
+        assert scoring.valeur(4) == 20
+        assert scoring.valeur(50) == 20
+
+    def test_new_solve_rescores_previous_solvers(self, app, make_solver, challenge_sqli):
+        """Un nouveau solve baisse la valeur pour tous les solveurs du challenge."""
+        with app.app_context():
+            self._dynamic(challenge_sqli)
+            first = make_solver(0, challenge_sqli)
+            assert first.score == 100
+            second = make_solver(1, challenge_sqli)
+            assert first.score == 92
+            assert second.score == 92
+            assert db.session.get(Challenge, challenge_sqli.id).points == 92
+
+    def test_rescore_honours_penalty(self, app, make_solver, challenge_sqli):
+        """La pénalité d'indices reste appliquée à la nouvelle valeur."""
+        with app.app_context():
+            self._dynamic(challenge_sqli)
+            first = make_solver(0, challenge_sqli, penalty=50)
+            assert first.score == 50
+            make_solver(1, challenge_sqli)
+            assert first.score == 46
+
+    def test_other_challenges_untouched(self, app, make_solver, user, challenge_sqli, challenge_xss):
+        """Seuls les solveurs du challenge dynamique sont recalculés."""
+        with app.app_context():
+            Submission(user_id=user.id, challenge_id=challenge_xss.id,
+                       flag_soumis="CTF{XSS_r3fl3ct3d_pwn3d}").enregistrer()
+            self._dynamic(challenge_sqli)
+            make_solver(0, challenge_sqli)
+            make_solver(1, challenge_sqli)
+            assert db.session.get(User, user.id).score == 25
+
+    def test_rescore_appends_score_event(self, app, make_solver, challenge_sqli):
+        """La baisse de valeur apparaît dans la série de score du joueur."""
+        with app.app_context():
+            self._dynamic(challenge_sqli)
+            first = make_solver(0, challenge_sqli)
+            make_solver(1, challenge_sqli)
+            events = ScoreEvent.query.filter_by(user_id=first.id).order_by(ScoreEvent.id).all()
+            assert [(e.points, e.total_after) for e in events] == [(100, 100), (-8, 92)]
+
+    def test_duplicate_solve_keeps_value(self, app, make_solver, challenge_sqli):
+        """Un second flag correct du même joueur ne fait pas baisser la valeur."""
+        with app.app_context():
+            self._dynamic(challenge_sqli)
+            first = make_solver(0, challenge_sqli)
+            Submission(user_id=first.id, challenge_id=challenge_sqli.id,
+                       flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}").enregistrer()
+            assert db.session.get(Challenge, challenge_sqli.id).points == 100
+            assert first.score == 100
+
+
 # ═══════════════════════════════════════════════
 #  FLAG MODEL
 # ═══════════════════════════════════════════════
@@ -271,6 +368,68 @@ class TestSubmissionModel:
             sub = Submission(user_id=user.id, challenge_id=c.id, flag_soumis="anything")
             assert sub.verifier() is False
 
+    def test_correct_submission_creates_solve(self, app, user, challenge_sqli):
+        """Un premier flag correct crée un Solve unique avec les points attribués."""
+        with app.app_context():
+            sub = Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                             flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}")
+            sub.enregistrer()
+            assert sub.premier_solve is True
+            solve = Solve.query.filter_by(user_id=user.id, challenge_id=challenge_sqli.id).one()
+            assert solve.points_awarded == 25
+            assert solve.submission_id == sub.id
+
+    def test_penalty_applied_in_single_pass(self, app, user, challenge_sqli):
+        """La pénalité d'indices est appliquée directement, sans réajustement."""
+        with app.app_context():
+            sub = Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                             flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}")
+            sub.enregistrer(penalty_percent=30)
+            assert sub.points_obtenus == 18  # 25 - int(7.5)
+            assert sub.score_total == 18
+            solve = Solve.query.filter_by(user_id=user.id).one()
+            assert solve.hint_penalty == 30
+            assert Scoreboard.query.filter_by(user_id=user.id).one().points_total == 18
+
+    def test_duplicate_solve_keeps_submission(self, app, user, challenge_sqli):
+        """Un deuxième flag correct est journalisé mais ne crédite rien."""
+        with app.app_context():
+            Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                       flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}").enregistrer()
+            sub2 = Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                              flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}")
+            assert sub2.enregistrer() is True
+            assert sub2.premier_solve is False
+            assert sub2.points_obtenus == 0
+            assert Submission.query.filter_by(user_id=user.id, correct=True).count() == 2
+            assert Solve.query.filter_by(user_id=user.id).count() == 1
+
+    def test_concurrent_solve_rejected_by_constraint(self, app, user, challenge_sqli):
+        """Un Solve inséré par un autre worker empêche le double crédit."""
+        with app.app_context():
+            db.session.add(Solve(user_id=user.id, challenge_id=challenge_sqli.id,
+                                 points_awarded=25))
+            db.session.add(Scoreboard(user_id=user.id, points_total=25))
+            db.session.commit()
+            sub = Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                             flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}")
+            sub.enregistrer()
+            assert sub.premier_solve is False
+            assert Scoreboard.query.filter_by(user_id=user.id).one().points_total == 25
+
+    def test_solve_backfill(self, app, user, challenge_sqli):
+        """Le backfill crée un Solve par (user, challenge) depuis les soumissions correctes."""
+        with app.app_context():
+            for _ in range(2):
+                db.session.add(Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                                          flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}", correct=True))
+            db.session.commit()
+            assert Solve.backfill() == 1
+            assert Solve.backfill() == 0
+            solve = Solve.query.filter_by(user_id=user.id).one()
+            assert solve.points_awarded == 25
+            assert solve.hint_penalty == 0
+
 
 # ═══════════════════════════════════════════════
 #  SCOREBOARD MODEL
@@ -288,6 +447,33 @@ class TestScoreboardModel:
             total = Scoreboard.calculerScore(user.id)
             assert total == 25
 
+    def test_calculer_score_honours_penalty(self, app, user, challenge_sqli, challenge_xss):
+        """calculerScore somme les points réellement attribués (pénalités incluses)."""
+        with app.app_context():
+            Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                       flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}").enregistrer(penalty_percent=10)
+            Submission(user_id=user.id, challenge_id=challenge_xss.id,
+                       flag_soumis="CTF{XSS_r3fl3ct3d_pwn3d}").enregistrer()
+            assert Scoreboard.calculerScore(user.id) == 23 + 25
+
+    def test_solve_with_duplicate_rows(self, app, user, challenge_sqli):
+        """Base non migrée (doublons du scoreboard) : le solve passe quand même."""
+        with app.app_context():
+            db.session.execute(db.text("DROP INDEX uq_scoreboard_user_id"))
+            db.session.add_all([Scoreboard(user_id=user.id, points_total=0),
+                                Scoreboard(user_id=user.id, points_total=0)])
+            db.session.commit()
+            try:
+                sub = Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                                 flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}")
+                assert sub.enregistrer()
+                assert Scoreboard.ajouterPoints(user.id, 5) == 30
+            finally:
+                Scoreboard.query.delete()
+                db.session.commit()
+                db.session.execute(db.text("CREATE UNIQUE INDEX uq_scoreboard_user_id ON scoreboard (user_id)"))
+                db.session.commit()
+
     def test_afficher_classement(self, app, user, admin_user, challenge_sqli, challenge_xss):
         """Le classement est trié par points décroissants."""
         with app.app_context():
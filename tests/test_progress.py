@@ -0,0 +1,69 @@
+"""
+Tests unitaires — Progression du joueur (dashboard)
+====================================================
+Couvre : statut par challenge, tentatives, activité récente, cache jusqu'à
+         la prochaine soumission, nombre de requêtes du dashboard
+"""
+
+from core.models import Submission
+from core.progress import get_progress, SOLVED, ATTEMPTED, UNTOUCHED, RECENT_LIMIT
+
+
+SQLI_FLAG = "CTF{SQL_1nj3ct10n_m4st3r}"
+
+
+def _submit(user, challenge, flag):
+    return Submission(user_id=user.id, challenge_id=challenge.id, flag_soumis=flag).enregistrer()
+
+
+class TestUserProgress:
+    """Tests du service UserProgress."""
+
+    def test_status_per_challenge(self, app, user, challenge_sqli, challenge_xss, challenge_bruteforce):
+        with app.app_context():
+            _submit(user, challenge_sqli, "CTF{nope}")
+            _submit(user, challenge_sqli, SQLI_FLAG)
+            _submit(user, challenge_xss, "CTF{nope}")
+            progress = get_progress(user.id)
+            assert progress.get(challenge_sqli.id).status == SOLVED
+            assert progress.get(challenge_sqli.id).attempts == 2
+            assert progress.get(challenge_xss.id).status == ATTEMPTED
+            assert progress.get(challenge_bruteforce.id).status == UNTOUCHED
+            assert (progress.solved_count, progress.total_challenges) == (1, 3)
+            assert [c.id for c in progress.in_progress] == [challenge_xss.id]
+
+    def test_recent_activity(self, app, user, challenge_sqli):
+        with app.app_context():
+            for _ in range(RECENT_LIMIT + 2):
+                _submit(user, challenge_sqli, "CTF{nope}")
+            _submit(user, challenge_sqli, SQLI_FLAG)
+            recent = get_progress(user.id).recent
+            assert len(recent) == RECENT_LIMIT
+            assert recent[0].correct and recent[0].titre == "SQL Injection"
+            assert get_progress(user.id).get(challenge_sqli.id).attempts == RECENT_LIMIT + 3
+
+    def test_cached_until_next_submission(self, app, user, challenge_sqli):
+        with app.app_context():
+            first = get_progress(user.id)
+            assert get_progress(user.id) is first
+            _submit(user, challenge_sqli, SQLI_FLAG)
+            assert get_progress(user.id) is not first
+            assert get_progress(user.id).solved_count == 1
+
+
+class TestDashboardQueries:
+    """Le dashboard n'exécute qu'une requête de progression."""
+
+    def test_single_query_then_cached(self, app, session_client, count_queries, user, challenge_sqli,
+                                      challenge_xss):
+        with app.app_context():
+            _submit(user, challenge_sqli, SQLI_FLAG)
+            _submit(user, challenge_xss, "CTF{nope}")
+        session_client.get("/dashboard")
+        with count_queries("submission") as statements:
+            resp = session_client.get("/dashboard")
+        html = resp.get_data(as_text=True)
+        assert resp.status_code == 200
+        assert "1 / 2 challenges" in html
+        assert "XSS Reflected" in html
+        assert statements == []
@@ -0,0 +1,82 @@
+"""
+Tests unitaires — Instrumentation des requêtes SQL
+===================================================
+Couvre : normalisation des requêtes, détection des N+1, requêtes en erreur,
+         en-tête de debug, agrégat par endpoint et vue admin
+"""
+
+import pytest
+from flask import g, render_template_string
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from core.models import User
+from core import db, querystats
+from core.querystats import RequestStats, statement_shape
+
+
+@pytest.fixture()
+def query_header(app):
+    querystats.reset()
+    app.config["QUERY_STATS_HEADER"] = True
+    yield
+    app.config["QUERY_STATS_HEADER"] = False
+    querystats.reset()
+
+
+class TestShapes:
+    """Tests de la normalisation."""
+
+    def test_values_removed(self):
+        a = statement_shape("SELECT * FROM user WHERE id = ? AND pseudo = 'bob'")
+        b = statement_shape("SELECT *  FROM user\n WHERE id = %(id_1)s AND pseudo = 'alice'")
+        assert a == b == "SELECT * FROM user WHERE id = ? AND pseudo = ?"
+
+    def test_in_lists_collapsed(self):
+        assert statement_shape("WHERE id IN (?, ?, ?)") == statement_shape("WHERE id IN (?)")
+
+
+class TestDetection:
+    """Tests de la détection par requête HTTP."""
+
+    def test_repeated_shape_flagged(self, app, user, admin_user):
+        with app.test_request_context("/"):
+            g.query_stats = RequestStats()
+            for _ in range(3):
+                for uid in (user.id, admin_user.id):
+                    db.session.get(User, uid)
+                    db.session.expunge_all()
+            stats = g.query_stats
+            assert stats.count == 6
+            (shape, count, _), = stats.suspects(5)
+            assert count == 6 and "FROM user" in shape
+            assert stats.suspects(7) == []
+
+    def test_header_and_endpoint_report(self, app, client, query_header, challenge_sqli):
+        resp = client.get("/challenges")
+        assert resp.headers[querystats.HEADER].startswith("count=")
+        report = {e.endpoint: e for e in querystats.endpoint_report()}
+        assert report["challenges_list"].requests == 1
+        assert report["challenges_list"].queries >= 1
+
+    def test_failed_statement_leaves_no_state(self, app):
+        with app.test_request_context("/"):
+            g.query_stats = RequestStats()
+            with db.engine.connect() as conn:
+                with pytest.raises(OperationalError):
+                    conn.execute(text("SELECT * FROM missing_table"))
+                conn.execute(text("SELECT 1"))
+                assert not conn.info.get("query_start")
+            assert g.query_stats.count == 1
+
+    def test_queries_attributed_to_template(self, app, user):
+        with app.test_request_context("/"):
+            g.query_stats = RequestStats()
+            render_template_string("{{ User.query.count() }}")
+            assert g.query_stats.templates == {"?": 1}
+
+    def test_admin_view(self, admin_client, query_header):
+        admin_client.get("/challenges")
+        resp = admin_client.get("/admin/queries")
+        assert resp.status_code == 200
+        assert "challenges_list" in resp.get_data(as_text=True)
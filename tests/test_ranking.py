@@ -0,0 +1,150 @@
+"""
+Tests unitaires — Index de classement en mémoire
+===================================================
+Couvre : rang, départage des ex-aequo, percentile, voisins,
+         reconstruction depuis la base
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from core.models import User, Submission, Scoreboard
+from core.ranking import RankIndex, rebuild_rank_index, rank_index, get_rank_index
+from core import db, versions
+
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+class TestRankIndex:
+    """Tests de la structure RankIndex."""
+
+    def test_rank_by_points(self):
+        """Le joueur avec le plus de points est premier."""
+        idx = RankIndex()
+        idx.update(1, 25, T0)
+        idx.update(2, 200, T0)
+        idx.update(3, 50, T0)
+        assert idx.rank(2) == 1
+        assert idx.rank(3) == 2
+        assert idx.rank(1) == 3
+
+    def test_tie_broken_by_last_solve(self):
+        """À points égaux, le premier à avoir résolu est devant."""
+        idx = RankIndex()
+        idx.update(1, 100, T0 + timedelta(minutes=5))
+        idx.update(2, 100, T0)
+        assert idx.rank(2) == 1
+        assert idx.rank(1) == 2
+
+    def test_tie_without_solve_is_last(self):
+        """Un joueur sans date de solve passe après ses ex-aequo."""
+        idx = RankIndex()
+        idx.update(1, 0, None)
+        idx.update(2, 0, T0)
+        assert idx.rank(2) == 1
+        assert idx.rank(1) == 2
+
+    def test_update_replaces_previous_score(self):
+        """Une mise à jour remplace l'ancienne position du joueur."""
+        idx = RankIndex()
+        idx.update(1, 50, T0)
+        idx.update(2, 100, T0)
+        idx.update(1, 150, T0 + timedelta(hours=1))
+        assert len(idx) == 2
+        assert idx.rank(1) == 1
+
+    def test_remove(self):
+        """Un joueur retiré n'est plus classé."""
+        idx = RankIndex()
+        idx.update(1, 50, T0)
+        idx.update(2, 100, T0)
+        idx.remove(2)
+        assert idx.rank(2) is None
+        assert idx.rank(1) == 1
+
+    def test_rank_for_unranked_score(self):
+        """Un joueur absent est classé derrière tous ceux qui ont plus de points."""
+        idx = RankIndex()
+        idx.update(1, 50, T0)
+        idx.update(2, 100, T0)
+        assert idx.rank_for_score(0) == 3
+        assert idx.rank_for_score(75) == 2
+
+    def test_scores_beyond_initial_capacity(self):
+        """L'arbre s'agrandit pour les gros scores."""
+        idx = RankIndex(capacity=8)
+        idx.update(1, 5, T0)
+        idx.update(2, 5000, T0)
+        assert idx.rank(2) == 1
+        assert idx.rank(1) == 2
+
+    def test_percentile(self):
+        """Le premier de 4 joueurs est au 100e percentile, le dernier au 25e."""
+        idx = RankIndex()
+        for uid, pts in [(1, 10), (2, 20), (3, 30), (4, 40)]:
+            idx.update(uid, pts, T0)
+        assert idx.percentile(4) == 100.0
+        assert idx.percentile(1) == 25.0
+
+    def test_neighbours(self):
+        """Les voisins sont renvoyés dans l'ordre du classement."""
+        idx = RankIndex()
+        for uid, pts in [(1, 10), (2, 20), (3, 30), (4, 40), (5, 50)]:
+            idx.update(uid, pts, T0)
+        n = idx.neighbours(3, count=1)
+        assert n["above"] == [(2, 4, 40)]
+        assert n["below"] == [(4, 2, 20)]
+
+    def test_rank_matches_naive_sort(self):
+        """L'index donne le même ordre qu'un tri complet."""
+        idx = RankIndex(capacity=4)
+        rows = [(uid, (uid * 37) % 11 * 25, T0 + timedelta(seconds=(uid * 13) % 7))
+                for uid in range(1, 60)]
+        for row in rows:
+            idx.update(*row)
+        expected = sorted(rows, key=lambda r: (-r[1], r[2], r[0]))
+        for position, (uid, _, _) in enumerate(expected, start=1):
+            assert idx.rank(uid) == position
+
+
+class TestRankIndexRebuild:
+    """Tests de la reconstruction depuis la base."""
+
+    def test_rebuild_from_db(self, app, user, admin_user, challenge_sqli, challenge_bruteforce):
+        """La reconstruction reproduit le classement de la table scoreboard."""
+        with app.app_context():
+            Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                       flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}").enregistrer()
+            Submission(user_id=admin_user.id, challenge_id=challenge_bruteforce.id,
+                       flag_soumis="CTF{Brut3F0rc3_M4st3r_7394}").enregistrer()
+            rebuild_rank_index()
+            assert rank_index.rank(admin_user.id) == 1
+            assert rank_index.rank(user.id) == 2
+
+    def test_solve_updates_built_index(self, app, user, admin_user, challenge_sqli,
+                                       challenge_bruteforce):
+        """Un solve met à jour l'index déjà construit, sans reconstruction."""
+        with app.app_context():
+            Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                       flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}").enregistrer()
+            rebuild_rank_index()
+            Submission(user_id=admin_user.id, challenge_id=challenge_bruteforce.id,
+                       flag_soumis="CTF{Brut3F0rc3_M4st3r_7394}").enregistrer()
+            assert rank_index.rank(admin_user.id) == 1
+            assert rank_index.rank(user.id) == 2
+
+    def test_rebuilt_when_version_moves(self, app, user, admin_user, challenge_sqli,
+                                        challenge_bruteforce):
+        """Un solve d'un autre worker (version incrémentée) déclenche la reconstruction."""
+        with app.app_context():
+            Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                       flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}").enregistrer()
+            get_rank_index()
+            # Écriture d'un autre worker : scoreboard + version, sans toucher à l'index local
+            db.session.add(Scoreboard(user_id=admin_user.id, points_total=500))
+            versions.bump(versions.SCOREBOARD)
+            db.session.commit()
+            assert rank_index.rank(admin_user.id) is None
+            versions.forget()  # expiration de VERSION_POLL_TTL
+            assert get_rank_index().rank(admin_user.id) == 1
+
@@ -0,0 +1,138 @@
+"""
+Tests unitaires — Compteurs à fenêtre glissante
+================================================
+Couvre : fenêtre et expiration des tranches, partage par fichier entre
+         instances, éviction, reconstruction depuis security_event sous
+         le verrou de création, panne des compteurs,
+         detect_bruteforce / detect_flag_spam sans requête en base
+"""
+
+import fcntl
+import os
+
+import pytest
+from core import ratecounter
+from core.ratecounter import RateCounters
+from core.security import SecurityEvent, detect_bruteforce, detect_flag_spam
+
+
+NOW = 1_800_000_000
+
+
+class TestRateCounters:
+    """Tests de la table de compteurs."""
+
+    def test_sliding_window(self):
+        counters = RateCounters(slots=64, buckets=6, bucket_seconds=10)
+        for offset in (0, 15, 35, 55):
+            counters.hit("ip:1.2.3.4:login_fail", now=NOW + offset)
+        assert counters.count("ip:1.2.3.4:login_fail", 60, now=NOW + 55) == 4
+        assert counters.count("ip:1.2.3.4:login_fail", 30, now=NOW + 55) == 2
+        assert counters.count("ip:1.2.3.4:login_fail", 60, now=NOW + 75) == 2
+        assert counters.count("ip:5.6.7.8:login_fail", 60, now=NOW + 55) == 0
+
+    def test_stale_bucket_reset_on_reuse(self):
+        counters = RateCounters(slots=64, buckets=3, bucket_seconds=10)
+        counters.hit("k", now=NOW, amount=5)
+        counters.hit("k", now=NOW + 30)   # même case de l'anneau, 3 tranches plus tard
+        assert counters.count("k", 30, now=NOW + 30) == 1
+
+    def test_shared_file(self, tmp_path):
+        path = str(tmp_path / "rate.bin")
+        first = RateCounters(path=path, slots=64)
+        second = RateCounters(path=path, slots=64)
+        assert first.created and not second.created
+        first.hit("user:7:flag_fail")
+        second.hit("user:7:flag_fail")
+        assert first.count("user:7:flag_fail", 60) == 2
+        # Format différent : la table est recréée
+        assert RateCounters(path=path, slots=32).created
+        first.close()
+        second.close()
+
+    def test_fill_runs_under_creation_lock(self, tmp_path):
+        path = str(tmp_path / "rate.bin")
+        seen = []
+
+        def fill(add):
+            fd = os.open(path, os.O_RDWR)
+            try:
+                with pytest.raises(BlockingIOError):
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            finally:
+                os.close(fd)
+            add("ip:1.2.3.4:login_fail", amount=3)
+            seen.append(True)
+
+        first = RateCounters(path=path, slots=64, fill=fill)
+        second = RateCounters(path=path, slots=64, fill=fill)
+        assert seen == [True] and not second.created
+        assert second.count("ip:1.2.3.4:login_fail", 60) == 3
+        first.close()
+        second.close()
+
+    def test_failed_fill_leaves_usable_table(self, tmp_path):
+        def fill(add):
+            raise RuntimeError("db down")
+
+        counters = RateCounters(path=str(tmp_path / "rate.bin"), slots=64, fill=fill)
+        assert counters.fill_error == "RuntimeError"
+        counters.hit("k")
+        assert counters.count("k", 60) == 1
+        counters.close()
+
+    def test_oldest_key_evicted_when_full(self):
+        counters = RateCounters(slots=4, buckets=6, bucket_seconds=10)
+        for i in range(4):
+            counters.hit(f"key{i}", now=NOW + i * 10)
+        counters.hit("key4", now=NOW + 40)
+        assert counters.count("key4", 60, now=NOW + 40) == 1
+        assert counters.count("key0", 60, now=NOW + 40) == 0
+        assert counters.count("key3", 60, now=NOW + 40) == 1
+
+
+class TestDetection:
+    """detect_* lisent les compteurs alimentés par SecurityEvent.log."""
+
+    def test_bruteforce_without_queries(self, app, count_queries):
+        with app.test_request_context("/auth/login"):
+            for _ in range(9):
+                SecurityEvent.log(SecurityEvent.LOGIN_FAIL, ip="10.1.1.1")
+            with count_queries() as statements:
+                assert not detect_bruteforce("10.1.1.1")
+            assert statements == []
+            SecurityEvent.log(SecurityEvent.LOGIN_FAIL, ip="10.1.1.1")
+            assert detect_bruteforce("10.1.1.1")
+            assert not detect_bruteforce("10.1.1.2")
+
+    def test_flag_spam_counts_ok_and_fail(self, app):
+        with app.test_request_context("/challenge/1/submit"):
+            for i in range(20):
+                kind = SecurityEvent.FLAG_OK if i % 2 else SecurityEvent.FLAG_FAIL
+                SecurityEvent.log(kind, ip="10.2.2.2")
+            assert detect_flag_spam("10.2.2.2")
+
+    def test_rebuilt_from_event_table(self, app):
+        with app.test_request_context("/auth/login"):
+            for _ in range(10):
+                SecurityEvent.log(SecurityEvent.LOGIN_FAIL, ip="10.3.3.3", user_id=4)
+            ratecounter.clear_counters()
+            assert detect_bruteforce("10.3.3.3")
+            assert ratecounter.count((SecurityEvent.LOGIN_FAIL,), 300, user_id=4) == 10
+
+    def test_long_window_falls_back_to_database(self, app):
+        with app.test_request_context("/auth/login"):
+            for _ in range(3):
+                SecurityEvent.log(SecurityEvent.LOGIN_FAIL, ip="10.4.4.4")
+            assert ratecounter.count((SecurityEvent.LOGIN_FAIL,), 3600, ip="10.4.4.4") is None
+            assert detect_bruteforce("10.4.4.4", window_minutes=60, threshold=3)
+
+    def test_counter_failure_keeps_event(self, app, monkeypatch):
+        def broken():
+            raise OSError("mmap")
+
+        monkeypatch.setattr(ratecounter, "get_counters", broken)
+        with app.test_request_context("/auth/login"):
+            assert SecurityEvent.log(SecurityEvent.LOGIN_FAIL, ip="10.5.5.5") is not None
+            assert SecurityEvent.query.filter_by(ip_address="10.5.5.5").count() == 1
+            assert detect_bruteforce("10.5.5.5", threshold=1)   # repli sur la base
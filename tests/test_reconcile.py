@@ -0,0 +1,93 @@
+"""
+Tests unitaires — Recalcul des scores en masse
+=================================================
+Couvre : détection des écarts, pénalités d'indices, application par lots,
+         scoreboard manquant, index de classement
+"""
+
+import pytest
+from core.models import Submission, Scoreboard, Solve, ScoreEvent
+from core.ranking import rebuild_rank_index, rank_index
+from core import reconcile, db
+
+
+SQLI_FLAG = "CTF{SQL_1nj3ct10n_m4st3r}"
+
+
+class TestReconcile:
+    """Tests du moteur de recalcul."""
+
+    @pytest.fixture()
+    def players(self, make_solver, challenge_sqli):
+        """players(n, penalty) : n joueurs ayant résolu le challenge SQLi."""
+        return lambda n, penalty=0: [make_solver(i, challenge_sqli, penalty=penalty) for i in range(n)]
+
+    def test_no_diff_when_consistent(self, app, user, challenge_sqli):
+        """Aucun écart juste après des solves normaux."""
+        with app.app_context():
+            Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                       flag_soumis=SQLI_FLAG).enregistrer(penalty_percent=20)
+            report = reconcile.plan()
+            assert report.solve_diffs == []
+            assert report.score_diffs == []
+
+    def test_plan_detects_point_change(self, app, challenge_sqli, players):
+        """Une modification des points du challenge est détectée sans rien écrire."""
+        with app.app_context():
+            users = players(2)
+            challenge_sqli.points = 40
+            db.session.merge(challenge_sqli)
+            db.session.commit()
+            report = reconcile.plan()
+            assert len(report.solve_diffs) == 2
+            assert {(d.current, d.expected) for d in report.score_diffs} == {(25, 40)}
+            assert Scoreboard.query.filter_by(user_id=users[0].id).first().points_total == 25
+
+    def test_apply_honours_penalty(self, app, challenge_sqli, players):
+        """Le recalcul conserve la pénalité d'indices enregistrée."""
+        with app.app_context():
+            users = players(1, penalty=30)
+            challenge_sqli.points = 100
+            db.session.merge(challenge_sqli)
+            db.session.commit()
+            reconcile.apply()
+            assert Solve.query.filter_by(user_id=users[0].id).one().points_awarded == 70
+            assert users[0].score == 70
+
+    def test_apply_in_small_batches(self, app, challenge_sqli, players):
+        """Des lots plus petits que le nombre d'écarts corrigent tout."""
+        with app.app_context():
+            users = players(5)
+            challenge_sqli.points = 10
+            db.session.merge(challenge_sqli)
+            db.session.commit()
+            reconcile.apply(batch_size=2)
+            assert {u.score for u in users} == {10}
+            assert reconcile.plan() == ([], [])
+
+    def test_missing_scoreboard_created(self, app, user, challenge_sqli):
+        """Un joueur avec des solves mais sans scoreboard en obtient un."""
+        with app.app_context():
+            Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                       flag_soumis=SQLI_FLAG).enregistrer()
+            Scoreboard.query.filter_by(user_id=user.id).delete()
+            db.session.commit()
+            report = reconcile.apply()
+            assert report.score_diffs[0].current is None
+            assert Scoreboard.query.filter_by(user_id=user.id).one().points_total == 25
+
+    def test_apply_updates_timeline_and_rank_index(self, app, challenge_sqli, challenge_xss, players):
+        """Le graphe finit sur le nouveau total et l'index est reconstruit."""
+        with app.app_context():
+            users = players(2)
+            Submission(user_id=users[1].id, challenge_id=challenge_xss.id,
+                       flag_soumis="CTF{XSS_r3fl3ct3d_pwn3d}").enregistrer()
+            rebuild_rank_index()
+            challenge_sqli.points = 200
+            db.session.merge(challenge_sqli)
+            db.session.commit()
+            reconcile.apply()
+            last = ScoreEvent.query.filter_by(user_id=users[0].id) \
+                .order_by(ScoreEvent.id.desc()).first()
+            assert last.total_after == 200
+            assert rank_index.built_at is None
@@ -0,0 +1,109 @@
+"""
+Tests unitaires — Rétention des événements de sécurité
+=======================================================
+Couvre : archivage gzip par jour et par heure entière, purge des agrégats
+         par IP, conservation du total historique (recalcul compris),
+         réimportation idempotente
+"""
+
+from datetime import datetime, timedelta
+import gzip
+import os
+
+from core import db, retention
+from core.security import (SecurityEvent, SecurityIPRollup, SecurityRollup,
+                           compute_dashboard_stats, rebuild_rollups)
+
+
+NOW = datetime(2026, 6, 15, 12, 0)
+
+
+def _seed(user_id=None):
+    for days in (200, 200, 120, 10):
+        db.session.add(SecurityEvent(event_type=SecurityEvent.LOGIN_FAIL, ip_address="10.9.9.9",
+                                     user_id=user_id, timestamp=NOW - timedelta(days=days)))
+    db.session.commit()
+    rebuild_rollups()
+
+
+class TestArchive:
+    """Tests de l'archivage."""
+
+    def test_old_events_moved_to_gzip(self, app, tmp_path):
+        with app.app_context():
+            _seed()
+            report = retention.archive_events(days=90, directory=str(tmp_path), batch_size=2, now=NOW)
+            assert report.archived == 3
+            assert [os.path.basename(p) for p in report.files] == [
+                f"security-events-{(NOW - timedelta(days=200)):%Y-%m-%d}.jsonl.gz",
+                f"security-events-{(NOW - timedelta(days=120)):%Y-%m-%d}.jsonl.gz",
+            ]
+            # Deux lots pour le même jour : deux membres gzip lisibles d'un bloc
+            with gzip.open(report.files[0], "rt") as f:
+                assert len(f.readlines()) == 2
+            assert SecurityEvent.query.count() == 1
+            assert report.pruned_rollups == 2
+            assert SecurityIPRollup.query.count() == 1
+            # Le total historique reste dans les agrégats par type, même après recalcul
+            assert compute_dashboard_stats()["total_events"] == 4
+            rebuild_rollups()
+            assert compute_dashboard_stats()["total_events"] == 4
+
+    def test_cutoff_on_hour_boundary(self, app):
+        with app.app_context():
+            assert retention.cutoff_date(90, now=NOW + timedelta(minutes=35)) == NOW - timedelta(days=90)
+
+    def test_dry_run_count(self, app):
+        with app.app_context():
+            _seed()
+            assert retention.pending_count(retention.cutoff_date(90, now=NOW)) == 3
+            assert SecurityEvent.query.count() == 4
+
+
+class TestImport:
+    """Tests de la réimportation."""
+
+    def test_reimport_is_idempotent(self, app, tmp_path, user):
+        with app.app_context():
+            _seed(user_id=user.id)
+            report = retention.archive_events(days=90, directory=str(tmp_path), now=NOW)
+            db.session.delete(db.session.get(type(user), user.id))
+            db.session.commit()
+            imported = sum(retention.import_archive(p) for p in report.files)
+            assert imported == 3
+            assert SecurityEvent.query.count() == 4
+            assert SecurityEvent.query.filter(SecurityEvent.user_id.isnot(None)).count() == 0
+            assert sum(retention.import_archive(p) for p in report.files) == 0
+
+    def test_repeated_rows_imported_once(self, app, tmp_path):
+        """Lot archivé deux fois (arrêt entre fsync et suppression) : une seule insertion."""
+        with app.app_context():
+            _seed()
+            report = retention.archive_events(days=90, directory=str(tmp_path), now=NOW)
+            for path in report.files:
+                with open(path, "rb") as f:
+                    member = f.read()
+                with open(path, "ab") as f:
+                    f.write(member)
+            assert sum(retention.import_archive(p) for p in report.files) == 3
+            assert SecurityEvent.query.count() == 4
+
+    def test_rebuild_after_import(self, app, tmp_path):
+        with app.app_context():
+            _seed()
+            report = retention.archive_events(days=90, directory=str(tmp_path), now=NOW)
+            retention.import_archive(report.files[1])
+            rebuild_rollups()
+            assert db.session.query(db.func.sum(SecurityRollup.count)).scalar() == 4
+            assert SecurityIPRollup.query.count() == 2
+
+    def test_import_with_rollups(self, app, tmp_path):
+        with app.app_context():
+            _seed()
+            report = retention.archive_events(days=90, directory=str(tmp_path), now=NOW)
+            SecurityRollup.query.delete()   # agrégats perdus
+            rebuild_rollups()
+            assert db.session.query(db.func.sum(SecurityRollup.count)).scalar() == 1
+            for path in report.files:
+                retention.import_archive(path, rollups=True)
+            assert db.session.query(db.func.sum(SecurityRollup.count)).scalar() == 4
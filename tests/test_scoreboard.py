@@ -5,7 +5,10 @@ Couvre : calcul de score, classement, position utilisateur, cumul multi-challeng
 """
 
 import pytest
-from core.models import User, Submission, Scoreboard, Challenge, Flag
+from core.models import User, Submission, Scoreboard, Challenge, Flag, ScoreEvent
+from core.leaderboard import scoreboard_page, scoreboard_around, board_page
+from core import versions
+from core.timeline import downsample, get_timeline_payload
 from core import db
 
 
@@ -148,4 +151,144 @@ class TestScoreboardEdgeCases:
                 sub.enregistrer()
 
             classement = Scoreboard.afficherClassement(limit=100)
-            assert len(classement) == 15
\ No newline at end of file
+            assert len(classement) == 15
+
+class TestScoreboardReadModel:
+    """Tests des lignes légères et de la pagination par curseur."""
+
+    @pytest.fixture()
+    def players(self, make_solver, challenge_sqli):
+        """players(n) : n joueurs de France, pénalité croissante (classés dans l'ordre)."""
+        return lambda n: [make_solver(i, challenge_sqli, penalty=i, country="France") for i in range(n)]
+
+    def test_rows_are_lightweight(self, app, players):
+        """Chaque ligne porte rang, pseudo, pays, points et nombre de solves."""
+        with app.app_context():
+            players(2)
+            rows, next_cursor = scoreboard_page(limit=10)
+            assert [r.rank for r in rows] == [1, 2]
+            assert rows[0].pseudo == "solver_0"
+            assert rows[0].country == "France"
+            assert rows[0].points == 25
+            assert rows[0].solved_count == 1
+            assert rows[0].last_solve_at is not None
+            assert next_cursor is None
+
+    def test_keyset_pagination(self, app, players):
+        """Les pages successives couvrent tout le classement sans doublon."""
+        with app.app_context():
+            players(7)
+            seen, cursor = [], None
+            while True:
+                rows, cursor = scoreboard_page(after=cursor, limit=3)
+                seen.extend(r.rank for r in rows)
+                if not cursor:
+                    break
+            assert seen == list(range(1, 8))
+
+    def test_invalid_cursor_starts_at_top(self, app, players):
+        """Un curseur invalide renvoie la première page."""
+        with app.app_context():
+            players(2)
+            rows, _ = scoreboard_page(after="garbage", limit=10)
+            assert rows[0].rank == 1
+
+    def test_around_user(self, app, players):
+        """La fenêtre "ma position" est centrée sur le joueur."""
+        with app.app_context():
+            users = players(9)
+            rows, _ = scoreboard_around(users[4].id, radius=2)
+            assert [r.rank for r in rows] == [3, 4, 5, 6, 7]
+            assert rows[2].user_id == users[4].id
+
+
+class TestScoreTimeline:
+    """Tests de l'historique des scores (graphe du top 10)."""
+
+    def test_solve_appends_score_event(self, app, user, challenge_sqli, challenge_xss):
+        """Chaque solve ajoute un point avec le total cumulé."""
+        with app.app_context():
+            Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                       flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}").enregistrer()
+            Submission(user_id=user.id, challenge_id=challenge_xss.id,
+                       flag_soumis="CTF{XSS_r3fl3ct3d_pwn3d}").enregistrer()
+            events = ScoreEvent.query.filter_by(user_id=user.id).order_by(ScoreEvent.id).all()
+            assert [e.total_after for e in events] == [25, 50]
+
+    def test_duplicate_solve_adds_no_event(self, app, user, challenge_sqli):
+        """Un second flag correct n'ajoute pas de point au graphe."""
+        with app.app_context():
+            for _ in range(2):
+                Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                           flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}").enregistrer()
+            assert ScoreEvent.query.filter_by(user_id=user.id).count() == 1
+
+    def test_payload_cached_until_next_solve(self, app, user, challenge_sqli, challenge_xss):
+        """La charge utile est réutilisée tant qu'aucun solve n'a eu lieu."""
+        with app.app_context():
+            Submission(user_id=user.id, challenge_id=challenge_sqli.id,
+                       flag_soumis="CTF{SQL_1nj3ct10n_m4st3r}").enregistrer()
+            first = get_timeline_payload()
+            assert get_timeline_payload() is first
+            Submission(user_id=user.id, challenge_id=challenge_xss.id,
+                       flag_soumis="CTF{XSS_r3fl3ct3d_pwn3d}").enregistrer()
+            second = get_timeline_payload()
+            assert second is not first
+            assert b'"points":50' in second["json"]
+
+    def test_downsample_keeps_last_total(self):
+        """Le sous-échantillonnage garde les extrémités et le total final."""
+        points = [(t, t * 10) for t in range(1000)]
+        series = downsample(points, 50)
+        assert len(series) <= 51
+        assert series[0] == points[0]
+        assert series[-1] == points[-1]
+
+
+class TestScoreboardCache:
+    """Tests du cache du scoreboard indexé par version."""
+
+    def _solve(self, user, challenge, flag="CTF{SQL_1nj3ct10n_m4st3r}"):
+        Submission(user_id=user.id, challenge_id=challenge.id, flag_soumis=flag).enregistrer()
+
+    def test_solve_bumps_version(self, app, user, challenge_sqli):
+        """Un premier solve incrémente la version, un doublon non."""
+        with app.app_context():
+            before = versions.current(versions.SCOREBOARD)
+            self._solve(user, challenge_sqli)
+            assert versions.current(versions.SCOREBOARD) == before + 1
+            self._solve(user, challenge_sqli)
+            assert versions.current(versions.SCOREBOARD) == before + 1
+
+    def test_board_cached_until_solve(self, app, user, admin_user, challenge_sqli):
+        """La page rendue est réutilisée tant que la version ne change pas."""
+        calls = []
+
+        def render(rows, next_cursor):
+            calls.append(len(rows))
+            return f"{len(rows)} lignes"
+
+        with app.app_context():
+            self._solve(user, challenge_sqli)
+            assert board_page(render=render)["html"] == "1 lignes"
+            assert board_page(render=render)["html"] == "1 lignes"
+            assert calls == [1]
+            self._solve(admin_user, challenge_sqli)
+            assert board_page(render=render)["html"] == "2 lignes"
+            assert calls == [1, 2]
+
+    def test_top_json_etag(self, client, app, user, challenge_sqli, challenge_xss):
+        """Le JSON du top renvoie 304 tant que la version n'a pas changé."""
+        with app.app_context():
+            self._solve(user, challenge_sqli)
+        first = client.get("/scoreboard/top.json")
+        assert first.status_code == 200
+        assert first.get_json()["rows"][0]["points"] == 25
+        etag = first.headers["ETag"]
+        assert client.get("/scoreboard/top.json",
+                          headers={"If-None-Match": etag}).status_code == 304
+        with app.app_context():
+            self._solve(user, challenge_xss, "CTF{XSS_r3fl3ct3d_pwn3d}")
+        second = client.get("/scoreboard/top.json", headers={"If-None-Match": etag})
+        assert second.status_code == 200
+        assert second.get_json()["rows"][0]["points"] == 50
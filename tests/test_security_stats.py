@@ -0,0 +1,112 @@
+"""
+Tests unitaires — Statistiques du dashboard sécurité
+=====================================================
+Couvre : agrégats horaires (types, IP) alimentés à l'écriture, upsert
+         portable hors Postgres / SQLite, IP suspectes, requêtes bornées,
+         cache à durée limitée, page admin
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from core import db
+from core.security import (SecurityEvent, SecurityRollup, SecurityIPRollup, compute_dashboard_stats,
+                           get_dashboard_stats, hour_of, rebuild_rollups, rollup_statements)
+
+
+def _event(event_type, ip, age, user_id=None):
+    db.session.add(SecurityEvent(event_type=event_type, ip_address=ip, user_id=user_id,
+                                 timestamp=datetime.utcnow() - age))
+
+
+def _hour_index(age):
+    """Position dans stats["hourly"] (24 heures pleines, la dernière en cours)."""
+    now = datetime.utcnow()
+    return 23 - int((hour_of(now) - hour_of(now - age)).total_seconds() // 3600)
+
+
+@pytest.fixture()
+def events(app, user):
+    with app.app_context():
+        for _ in range(6):
+            _event(SecurityEvent.LOGIN_FAIL, "10.0.0.1", timedelta(minutes=1))
+        _event(SecurityEvent.LOGIN_OK, "10.0.0.2", timedelta(minutes=30), user_id=user.id)
+        _event(SecurityEvent.FLAG_FAIL, "10.0.0.2", timedelta(hours=3, minutes=10))
+        _event(SecurityEvent.FLAG_OK, "10.0.0.3", timedelta(hours=22, minutes=30))
+        _event(SecurityEvent.BANNED_ATTEMPT, "10.0.0.4", timedelta(hours=30))
+        db.session.commit()
+        rebuild_rollups()
+
+
+class TestDashboardStats:
+    """Tests de l'agrégation."""
+
+    def test_counters(self, app, events):
+        with app.app_context():
+            stats = compute_dashboard_stats()
+            assert stats["total_events"] == 10
+            assert stats["events_24h"] == 9
+            assert stats["events_1h"] == 7
+            assert stats["logins_fail_24h"] == 6
+            assert stats["logins_ok_24h"] == 1
+            assert stats["flags_ok_24h"] == stats["flags_fail_24h"] == 1
+            assert stats["type_counts"] == {"login_fail": 6, "login_success": 1,
+                                            "flag_submit_fail": 1, "flag_submit_ok": 1}
+            assert stats["suspicious_ips"] == [("10.0.0.1", 6)]
+            assert stats["top_ips"][:2] == [("10.0.0.1", 6), ("10.0.0.2", 2)]
+
+    def test_hourly_buckets(self, app, events):
+        with app.app_context():
+            hourly = compute_dashboard_stats()["hourly"]
+            counts = [h["count"] for h in hourly]
+            assert len(counts) == 24 and sum(counts) == 9
+            assert hourly[-1]["label"] == datetime.utcnow().strftime("%H:00")
+            assert counts[_hour_index(timedelta(hours=3, minutes=10))] == 1
+            assert counts[_hour_index(timedelta(hours=22, minutes=30))] == 1
+            assert counts[_hour_index(timedelta(minutes=1))] >= 6
+
+    def test_event_lists_with_pseudo(self, app, events, user):
+        with app.app_context():
+            stats = compute_dashboard_stats()
+            assert len(stats["recent_events"]) == 10
+            (login,) = [e for e in stats["recent_events"] if e.event_type == SecurityEvent.LOGIN_OK]
+            assert login.pseudo == "testuser"
+            assert [e.ip_address for e in stats["banned_attempts"]] == ["10.0.0.4"]
+
+    def test_logged_events_update_rollups(self, app):
+        with app.test_request_context("/auth/login"):
+            for _ in range(3):
+                SecurityEvent.log(SecurityEvent.LOGIN_FAIL, ip="10.5.5.5")
+            (rollup,) = SecurityRollup.query.all()
+            assert (rollup.event_type, rollup.count) == (SecurityEvent.LOGIN_FAIL, 3)
+            assert compute_dashboard_stats()["top_ips"] == [("10.5.5.5", 3)]
+
+    @pytest.mark.parametrize("dialect", ["sqlite", "mysql"])
+    def test_rollup_statements(self, app, dialect):
+        now = datetime.utcnow()
+        rows = [{"event_type": SecurityEvent.LOGIN_FAIL, "ip_address": "10.6.6.6", "timestamp": now}] * 2
+        with app.app_context():
+            for _ in range(2):   # deuxième lot : clés existantes
+                for stmt, params in rollup_statements(dialect, rows):
+                    db.session.execute(stmt, params)
+            db.session.commit()
+            assert db.session.get(SecurityRollup, (hour_of(now), SecurityEvent.LOGIN_FAIL)).count == 4
+            assert db.session.get(SecurityIPRollup, (hour_of(now), "10.6.6.6")).count == 4
+
+    def test_bounded_queries_then_cached(self, app, count_queries, events):
+        with app.app_context(), count_queries() as statements:
+            first = get_dashboard_stats()
+            assert len(statements) == 7
+            assert not any("GROUP BY" in s and "FROM security_event" in s and "HAVING" not in s
+                           for s in statements)
+            _event(SecurityEvent.LOGIN_FAIL, "10.0.0.9", timedelta(0))
+            db.session.commit()
+            statements.clear()
+            assert get_dashboard_stats() is first
+            assert statements == []
+
+    def test_admin_page(self, admin_client, events):
+        resp = admin_client.get("/admin/security")
+        assert resp.status_code == 200
+        assert "testuser" in resp.get_data(as_text=True)
@@ -100,6 +100,7 @@ function typeLabel(t) {
     flag_submit_ok:     '🚩 Flag validé',
     flag_submit_fail:   '🚩 Flag échoué',
     bruteforce_suspect: '🚨 Brute-force',
+    flag_shared:        '🤝 Flag partagé',
     banned_user_attempt:'🔨 Banni tenté',
     rate_limit_hit:     '⏱️ Rate limit',
   };
@@ -107,7 +108,7 @@ function typeLabel(t) {
 }
 
 function riskColor(type) {
-  if (['login_fail', 'bruteforce_suspect', 'banned_user_attempt'].includes(type)) return C.red;
+  if (['login_fail', 'bruteforce_suspect', 'banned_user_attempt', 'flag_shared'].includes(type)) return C.red;
   if (['flag_submit_fail', 'rate_limit_hit'].includes(type)) return C.orange;
   if (['login_success', 'flag_submit_ok'].includes(type)) return C.accent;
   return C.blue;